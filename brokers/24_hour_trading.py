@@ -1,5 +1,6 @@
 import random
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pyexpat import ExpatError
 from typing import Any, Optional, Union, cast
@@ -15,19 +16,21 @@ from brokers import BASE_PATH
 from brokers import (
     BASE_PATH,
     # Robinhood,
-    Robinhood2,
     Fidelity,
     ETrade,
     Schwab,
     Vanguard,
     IBKR,
 )
+from brokers.robinhood2 import Robinhood2
 from utils.broker import Broker, OptionOrder, StockOrder
 from utils.market_data import MarketData
+from utils.memory import MemoryWatchdog
 from utils.program_manager import ProgramManager, SYM_LIST_LEN, SYM_LIST
 from utils.TwentyFourHourManager import TwentyFourHourManager
 from utils.report.post_processing import PostProcessing
 from utils.report.report import ActionType, BrokerNames
+from utils.selenium_helper import BROWSERS
 from utils.util import (
     format_list_of_orders,
     parse_option_list,
@@ -50,6 +53,24 @@ FRAC_BROKERS = ["FD"]
 # OPTN_BROKERS = ["TD", "RH", "E2", "FD", "SB", "VD"]
 OPTN_BROKERS = ["RH", "E2", "FD", "SB", "IF", "VD"]
 
+# trade_all_symbols_times = ["12:30", "12:50", "13:10", "14:10", "15:10", "16:10", "16:50",
+#                            "17:10", "18:10", "19:10", "20:10", "21:10", "22:10", "23:10",
+#                            "00:10", "00:40", "01:10", "02:10", "03:10", "04:10", "04:50",
+#                            "05:10","06:10", "06:40", "07:00"]
+
+# adding 6:20 AM EST as a time to investigate RH missing all the 6:10 AM trades
+TRADE_ALL_SYMBOLS_TIMES = ["12:30", "13:10", "14:10", "15:10", "16:10", "17:10",
+                           "18:10", "19:10", "20:10", "21:10", "22:10", "23:10",
+                           "00:10", "01:10", "02:10", "03:05", "03:10", "03:50", "04:10",
+                           "05:10","06:10", "06:40", "07:00"]
+
+# seconds before the next slot after which a broker stops starting new symbols
+SLOT_MARGIN = 5
+# how often process and browser memory is sampled
+MEMORY_CHECK_MINUTES = 5
+# seconds a browser restart (relaunch and session restore) needs before the next slot
+RECYCLE_MARGIN = 120
+
 TWENTY_FOUR_REPORT_COLUMNS = [
     'Date', 'Program Submitted', 'Broker Executed', 'Symbol', 'Action', 'Size', 'Broker', 'Price', 'Spread', 'Ask Price', 'Bid_Price', 'Limit_Price'
     ]
@@ -77,6 +98,15 @@ class TwentyFourHourTrading:
             # Vanguard(report_file, BrokerNames.VD, option_report_file),          # Vanguard only for options
         ]
 
+        # one worker per broker so a slot's symbols run concurrently across brokers
+        self._workers = {
+            broker.name(): ThreadPoolExecutor(1, thread_name_prefix=broker.name())
+            for broker in self._brokers
+            if not broker.MAIN_THREAD_ONLY
+        }
+        self._running: dict[str, Future] = {}
+        self._watchdog = MemoryWatchdog()
+
         self.create_report_file()
 
         # Old groups when we were using 6:
@@ -203,17 +233,6 @@ class TwentyFourHourTrading:
     def _schedule(self) -> None:
         logger.info("Scheduling Times")
 
-        # trade_all_symbols_times = ["12:30", "12:50", "13:10", "14:10", "15:10", "16:10", "16:50",
-        #                            "17:10", "18:10", "19:10", "20:10", "21:10", "22:10", "23:10",
-        #                            "00:10", "00:40", "01:10", "02:10", "03:10", "04:10", "04:50",
-        #                            "05:10","06:10", "06:40", "07:00"]
-        
-        # adding 6:20 AM EST as a time to investigate RH missing all the 6:10 AM trades
-        trade_all_symbols_times = ["12:30", "13:10", "14:10", "15:10", "16:10", "17:10", 
-                                   "18:10", "19:10", "20:10", "21:10", "22:10", "23:10",
-                                "00:10", "01:10", "02:10", "03:05", "03:10", "03:50", "04:10",
-                                "05:10","06:10", "06:40", "07:00"]
-        
     #     group_assignments = 
     #     [6, 6, 7, 8, 9, 1,
     #                         1, 2, 3, 4, 5, 6, 7,
@@ -222,7 +241,7 @@ class TwentyFourHourTrading:
     # ]
 
         # schedule trades that sell all symbols
-        for i, time in enumerate(trade_all_symbols_times):
+        for i, time in enumerate(TRADE_ALL_SYMBOLS_TIMES):
             schedule.every().day.at(time).do(self.trade_symbols_across_brokers, sym_list=self._symbol_list, index=i)
 
         # self._brokers[0].buy_and_sell_immediately("MA")
@@ -233,6 +252,7 @@ class TwentyFourHourTrading:
         schedule.every().day.at("00:01").do(self.create_report_file)
         # schedule.every().day.at("07:00").do(self.sell_leftover_positions_across_brokers)
         schedule.every().day.at("12:29:45").do(self.shift_groups)          # at 12:25, shift the group assignments
+        schedule.every(MEMORY_CHECK_MINUTES).minutes.do(self.check_memory)
 
         logger.info("Done scheduling")
 
@@ -273,17 +293,26 @@ class TwentyFourHourTrading:
         # then execute those trades
         # will have to modify our functions slightly
 
-        # execute trades
-        for sym in curr_sym_list:
-            for broker in random.sample(self._brokers, len(self._brokers)):
-                try:
-                    broker.buy_and_sell_immediately(sym)
-                    # broker.buy_and_sell_immediately('AMZN')
-                except Exception as e:
-                    logger.error(f"Error trading {sym} on {broker._broker_name}")
-                    # add line to add rejected order to report here ?
-                    logger.error(e)
-                    
+        # execute trades, each broker works through the group on its own worker
+        deadline = self._slot_deadline()
+        main_thread_brokers = []
+        for broker in random.sample(self._brokers, len(self._brokers)):
+            if broker.MAIN_THREAD_ONLY:
+                main_thread_brokers.append(broker)
+                continue
+            running = self._running.get(broker.name())
+            if running and not running.done():
+                logger.error(
+                    f"{broker.name()} is still trading the previous group, skipping {curr_sym_list}"
+                )
+                continue
+            future = self._workers[broker.name()].submit(
+                self._trade_symbols, broker, curr_sym_list, deadline
+            )
+            self._running[broker.name()] = future
+
+        for broker in main_thread_brokers:
+            self._trade_symbols(broker, curr_sym_list, deadline)
 
         # Added this line just in case order gets immediately filled on ibkr
         # try:
@@ -292,8 +321,54 @@ class TwentyFourHourTrading:
         #     logger.error(f"Error selling leftovers on IBKR")
 
 
+    '''
+    Buys and sells each symbol on one broker, stops starting new symbols once the
+    next slot is about to begin
+    '''
+    def _trade_symbols(self, broker: Broker, sym_list: list[str], deadline: float) -> None:
+        for i, sym in enumerate(sym_list):
+            if time.time() >= deadline:
+                logger.error(
+                    f"{broker.name()} ran out of time before the next slot, skipped {sym_list[i:]}"
+                )
+                return
+            try:
+                broker.buy_and_sell_immediately(sym)
+                # broker.buy_and_sell_immediately('AMZN')
+            except Exception as e:
+                logger.error(f"Error trading {sym} on {broker._broker_name}")
+                # add line to add rejected order to report here ?
+                logger.error(e)
+
         # logger message
-        logger.info("DONE BUYING AND SELLING")
+        logger.info(f"DONE BUYING AND SELLING on {broker.name()}")
+
+
+    '''
+    Logs process and browser memory, browsers over the limit are only restarted between
+    slots when no broker is trading and the restart finishes before the next slot
+    '''
+    def check_memory(self) -> None:
+        trading = any(not future.done() for future in self._running.values())
+        can_recycle = (
+            not trading and self._slot_deadline() - time.time() > RECYCLE_MARGIN
+        )
+        self._watchdog.check(BROWSERS, can_recycle)
+
+
+    '''
+    Timestamp of the next scheduled slot minus SLOT_MARGIN
+    '''
+    def _slot_deadline(self) -> float:
+        now = datetime.now()
+        slots = []
+        for slot in TRADE_ALL_SYMBOLS_TIMES:
+            hour, minute = map(int, slot.split(":"))
+            start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if start <= now:
+                start += timedelta(days=1)
+            slots.append(start)
+        return min(slots).timestamp() - SLOT_MARGIN
 
 
     '''
@@ -30,6 +30,10 @@ ETRADE2_CONSUMER_SECRET = os.getenv("ETRADE2_CONSUMER_SECRET", "")
 ETRADE2_LOGIN = os.getenv("ETRADE2_LOGIN", "")
 ETRADE2_PASSWORD = os.getenv("ETRADE2_PASSWORD", "")
 ETRADE2_ACCOUNT_ID_KEY = os.getenv("ETRADE2_ACCOUNT_ID_KEY", "")
+# access tokens of both accounts, reused until they expire at midnight US Eastern
+ETRADE_TOKEN_PATH = os.getenv(
+    "ETRADE_TOKEN_PATH", str(BASE_PATH / ".etrade_tokens.json")
+)
 
 SCHWAB_LOGIN = os.getenv("SCHWAB_LOGIN", "")
 SCHWAB_PASSWORD = os.getenv("SCHWAB_PASSWORD", "")
@@ -47,10 +51,24 @@ IBKR_PASSWORD = os.getenv("IBKR_PASSWORD", "")
 VANGUARD_LOGIN = os.getenv("VANGUARD_LOGIN", "")
 VANGUARD_PASSWORD = os.getenv("VANGUARD_PASSWORD", "")
 
+# point the api brokers at another host, e.g. the fake servers in tests/fake_brokers
+ETRADE_BASE_URL = os.getenv("ETRADE_BASE_URL", "")
+SCHWAB_BASE_URL = os.getenv("SCHWAB_BASE_URL", "")
+RH_BASE_URL = os.getenv("RH_BASE_URL", "")
+# pre / post trade Schwab quotes from the level one stream instead of REST, set to 1
+SCHWAB_STREAM_QUOTES = os.getenv("SCHWAB_STREAM_QUOTES", "0") == "1"
+
+# eager page loads with images, fonts and trackers blocked, set to 1 (pages load
+# fully by default, the allowlists aren't verified against every broker ui)
+LIGHTWEIGHT_BROWSER = os.getenv("LIGHTWEIGHT_BROWSER", "0") == "1"
+# Fidelity splits from the activity page's api responses instead of its html, set to 1
+# (the response schema isn't verified against real captures yet)
+FIDELITY_CAPTURE_ACTIVITY = os.getenv("FIDELITY_CAPTURE_ACTIVITY", "0") == "1"
+
 from .td_ameritrade import TDAmeritrade
 from .robinhood import Robinhood
 from .etrade import ETrade
-from .schwab2 import Schwab
+from .schwab2 import AsyncSchwab, Schwab
 from .fidelity import Fidelity
-from .ibkr import IBKR
+from .ibkr import IBKR, AsyncIBKR
 from .vangaurd import Vanguard
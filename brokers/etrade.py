@@ -1,9 +1,10 @@
 from collections import namedtuple
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from pyexpat import ExpatError
 from random import randint
 from typing import Any, Optional, Union, cast
+from zoneinfo import ZoneInfo
 
 import pandas as pd
 import pyetrade  # type: ignore[import-untyped]
@@ -22,8 +23,12 @@ from brokers import (
     ETRADE_LOGIN,
     ETRADE_PASSWORD,
     ETRADE_ACCOUNT_ID_KEY,
+    ETRADE_BASE_URL,
+    ETRADE_TOKEN_PATH,
 )
-from utils.broker import Broker, OptionOrder, StockOrder
+from utils.base_url import rewrite_url
+from utils.connections import WARM_UP_SYMBOL, pool_sessions
+from utils.broker import Broker, OptionOrder, StagedOrder, StockOrder
 from utils.report.report import (
     NULL_OPTION_DATA,
     OptionReportEntry,
@@ -36,7 +41,22 @@ from utils.report.report import (
     OptionData,
 )
 from utils.selenium_helper import CustomChromeInstance
-from utils.util import parse_option_string, repeat_on_fail
+from utils.token_cache import TokenCache
+from utils.retry import ORDER_LOOKUP_RETRY, QUOTE_RETRY, retry
+from utils.util import parse_option_string
+
+
+# access tokens stop working at midnight US Eastern and go idle after two hours
+# without a request, renewing reactivates an idle token
+ETRADE_TIMEZONE = ZoneInfo("America/New_York")
+
+
+def token_expiry(issued: datetime) -> datetime:
+    """midnight US Eastern after an access token was issued"""
+    issued = issued.astimezone(ETRADE_TIMEZONE)
+    return (issued + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
 
 
 _ETradeOrderInfo = namedtuple(
@@ -46,14 +66,22 @@ _ETradeOrderInfo = namedtuple(
 
 
 class ETrade(Broker):
+    SESSION_REFRESH_INTERVAL = 60 * 60
+    # tokens end every midnight ET, a longer window would warn every afternoon
+    REAUTH_WARNING = timedelta(hours=1)
+
     def __init__(
         self,
         report_file: Path,
         broker_name: BrokerNames,
         option_report_file: Optional[Path] = None,
+        base_url: str = ETRADE_BASE_URL,
+        token_path: str = ETRADE_TOKEN_PATH,
     ):
         super().__init__(report_file, broker_name, option_report_file)
         self._broker_name = broker_name
+        self._base_url = base_url
+        self._token_cache = TokenCache(Path(token_path))
         self._consumer_key = (
             ETRADE_CONSUMER_KEY
             if broker_name == BrokerNames.ET
@@ -81,6 +109,12 @@ class ETrade(Broker):
         add an input statement on line 53 and then check the XPATH and change if needed.
         :return:
         """
+        if self._base_url:
+            # local stand-in server, it does not check the oauth signature
+            self._create_clients({"oauth_token": "local", "oauth_token_secret": "local"})
+            return
+        if self._resume_session():
+            return
         # chrome_inst = CustomChromeInstance.createInstance()
         tokens = {}
         try:
@@ -116,31 +150,94 @@ class ETrade(Broker):
             print(oauth.get_request_token())  # Use the printed URL
             verifier_code = input("Enter verification code: ")
             tokens = oauth.get_access_token(verifier_code)
-        finally:
-            self._market = pyetrade.ETradeMarket(
-                self._consumer_key,
-                self._consumer_secret,
-                tokens["oauth_token"],
-                tokens["oauth_token_secret"],
-                dev=False,
-            )
+        # chrome_inst.quit()
+        # only reached once get_access_token succeeded, a failed login raises its own
+        # error instead of one about the missing tokens
+        self._create_clients(tokens)
+        self._token_cache.save(
+            self.name(),
+            {
+                "consumer_key": self._consumer_key,
+                "oauth_token": tokens["oauth_token"],
+                "oauth_token_secret": tokens["oauth_token_secret"],
+                "issued": self._tokens_issued.isoformat(),
+            },
+        )
 
-            self._orders = pyetrade.ETradeOrder(
-                self._consumer_key,
-                self._consumer_secret,
-                tokens["oauth_token"],
-                tokens["oauth_token_secret"],
-                dev=False,
-            )
-            self._accounts = pyetrade.ETradeAccounts(
+    def _resume_session(self) -> bool:
+        """
+        logs in with the cached access token if it hasn't expired yet, renewing it
+        in case it went idle. False when the interactive login is needed
+        """
+        cached = self._token_cache.load(self.name())
+        if not cached or cached.get("consumer_key") != self._consumer_key:
+            return False
+        issued = datetime.fromisoformat(cached["issued"])
+        if token_expiry(issued) <= datetime.now(ETRADE_TIMEZONE):
+            logger.info(f"{self.name()} cached token expired, logging in again")
+            self._token_cache.clear(self.name())
+            return False
+        self._create_clients(cached, issued)
+        try:
+            self.refresh_session()
+        except Exception as e:
+            logger.error(f"{self.name()} cached token rejected: {e}")
+            self._token_cache.clear(self.name())
+            return False
+        logger.info(f"{self.name()} logged in with the cached token")
+        return True
+
+    def _create_clients(self, tokens: dict, issued: Optional[datetime] = None) -> None:
+        self._tokens = tokens
+        self._tokens_issued = issued or datetime.now(ETRADE_TIMEZONE)
+        self._market = pyetrade.ETradeMarket(
+            self._consumer_key,
+            self._consumer_secret,
+            tokens["oauth_token"],
+            tokens["oauth_token_secret"],
+            dev=False,
+        )
+
+        self._orders = pyetrade.ETradeOrder(
+            self._consumer_key,
+            self._consumer_secret,
+            tokens["oauth_token"],
+            tokens["oauth_token_secret"],
+            dev=False,
+        )
+        self._accounts = pyetrade.ETradeAccounts(
+            self._consumer_key,
+            self._consumer_secret,
+            tokens["oauth_token"],
+            tokens["oauth_token_secret"],
+            dev=False,
+        )
+        if self._base_url:
+            for api in [self._market, self._orders, self._accounts]:
+                api.base_url = rewrite_url(api.base_url, self._base_url)
+        # the three clients have their own oauth sessions but share connections
+        apis = [self._market, self._orders, self._accounts]
+        pool_sessions(api.session for api in apis)
+
+    def warm_up(self) -> None:
+        self._market.get_quote([WARM_UP_SYMBOL], resp_format="json")
+
+    def refresh_session(self) -> None:
+        if not self._base_url:
+            pyetrade.ETradeAccessManager(
                 self._consumer_key,
                 self._consumer_secret,
-                tokens["oauth_token"],
-                tokens["oauth_token_secret"],
-                dev=False,
-            )
-            # chrome_inst.quit()
+                self._tokens["oauth_token"],
+                self._tokens["oauth_token_secret"],
+            ).renew_access_token()
+        self.warm_up()
+
+    def session_expires(self) -> Optional[datetime]:
+        if self._base_url:
+            return None
+        return token_expiry(self._tokens_issued)
 
+    @retry(QUOTE_RETRY)
     def _get_stock_data(self, sym: str) -> StockData:
         quote = self._market.get_quote([sym], resp_format="json")["QuoteResponse"][
             "QuoteData"
@@ -244,7 +341,7 @@ class ETrade(Broker):
 
         return splits_df, (splits_df.shape[0] > 1)
 
-    @repeat_on_fail()
+    @retry(ORDER_LOOKUP_RETRY)
     def _get_latest_order(self, orderID: str) -> _ETradeOrderInfo:
         """
         ETrade API: https://apisb.etrade.com/docs/api/order/api-order-v1.html#/definitions/OrdersResponse
@@ -267,12 +364,35 @@ class ETrade(Broker):
             order_data["placedTime"], quantity, price, dollar_amt, orderId
         )
 
-    def buy(self, order: StockOrder) -> None:
+    def stage(
+        self, order: Union[StockOrder, OptionOrder], action: ActionType
+    ) -> StagedOrder:
+        """
+        previews stock orders ahead of time, commit only has to place the preview
+        """
+        if action not in (ActionType.BUY, ActionType.SELL):
+            return super().stage(order, action)
+        kwargs = self._order_kwargs(cast(StockOrder, order), action)
+        # pyetrade adds the built instrument to the kwargs it is given
+        res = self._orders.preview_equity_order(**dict(kwargs))
+        kwargs["previewId"] = res["PreviewOrderResponse"]["PreviewIds"]["previewId"]
+        return StagedOrder(order, action, {"kwargs": kwargs})
+
+    def commit(self, staged: StagedOrder) -> None:
+        if "kwargs" not in staged.data:
+            return super().commit(staged)
+        order = cast(StockOrder, staged.order)
+        if staged.action == ActionType.BUY:
+            self.buy(order, staged)
+        else:
+            self.sell(order, staged)
+
+    def buy(self, order: StockOrder, staged: Optional[StagedOrder] = None) -> None:
         pre_stock_data = self._get_stock_data(order.sym)
         program_submitted = self._get_current_time()
 
         ### BUY ###
-        orderID = self._market_buy(order)
+        orderID = self._market_buy(order, staged)
 
         ### POST BUY INFO ###
         program_executed = self._get_current_time()
@@ -288,12 +408,12 @@ class ETrade(Broker):
             orderID=orderID,
         )
 
-    def sell(self, order: StockOrder) -> None:
+    def sell(self, order: StockOrder, staged: Optional[StagedOrder] = None) -> None:
         pre_stock_data = self._get_stock_data(order.sym)
         program_submitted = self._get_current_time()
 
         ### SELL ###
-        orderID = self._market_sell(order)
+        orderID = self._market_sell(order, staged)
 
         ### POST SELL INFO ###
         program_executed = self._get_current_time()
@@ -359,11 +479,17 @@ class ETrade(Broker):
             orderID=orderID,
         )
 
-    def _market_buy(self, order: StockOrder) -> str:
-        return self._order_stock_helper(order, ActionType.BUY, OrderType.MARKET)
+    def _market_buy(
+        self, order: StockOrder, staged: Optional[StagedOrder] = None
+    ) -> str:
+        return self._order_stock_helper(order, ActionType.BUY, OrderType.MARKET, staged)
 
-    def _market_sell(self, order: StockOrder) -> str:
-        return self._order_stock_helper(order, ActionType.SELL, OrderType.MARKET)
+    def _market_sell(
+        self, order: StockOrder, staged: Optional[StagedOrder] = None
+    ) -> str:
+        return self._order_stock_helper(
+            order, ActionType.SELL, OrderType.MARKET, staged
+        )
 
     def _limit_buy(self, order: StockOrder) -> Any:
         return NotImplementedError
@@ -372,22 +498,34 @@ class ETrade(Broker):
         return NotImplementedError
 
     def _order_stock_helper(
-        self, order: StockOrder, action_type: ActionType, order_type: OrderType
+        self,
+        order: StockOrder,
+        action_type: ActionType,
+        order_type: OrderType,
+        staged: Optional[StagedOrder] = None,
     ) -> str:
         # TODO: implement LIMIT orders
-        order_action = "BUY" if action_type == ActionType.BUY else "SELL"
-        res = self._orders.place_equity_order(
-            accountIdKey=self._account_id,
-            symbol=order.sym,
-            orderAction=order_action,
-            clientOrderId=str(randint(100000, 999999)),
-            priceType="MARKET",
-            quantity=int(order.quantity),
-            orderTerm="GOOD_FOR_DAY",
-            marketSession="REGULAR",
-        )
+        if staged:
+            # previewed in stage, placing is a single round trip
+            kwargs = dict(staged.data["kwargs"])
+        else:
+            kwargs = self._order_kwargs(order, action_type)
+        res = self._orders.place_equity_order(**kwargs)
         return cast(str, res["PlaceOrderResponse"]["OrderIds"]["orderId"])
 
+    def _order_kwargs(self, order: StockOrder, action_type: ActionType) -> dict:
+        # the preview and the place have to match, including the client order id
+        return {
+            "accountIdKey": self._account_id,
+            "symbol": order.sym,
+            "orderAction": "BUY" if action_type == ActionType.BUY else "SELL",
+            "clientOrderId": str(randint(100000, 999999)),
+            "priceType": "MARKET",
+            "quantity": int(order.quantity),
+            "orderTerm": "GOOD_FOR_DAY",
+            "marketSession": "REGULAR",
+        }
+
     def _buy_call_option(self, order: OptionOrder) -> str:
         return self._option_helper(order, ActionType.OPEN)
 
@@ -1,18 +1,31 @@
+from contextlib import contextmanager
 from pathlib import Path
-import time
+import re
 from datetime import datetime
-from io import StringIO
-from typing import Any, Optional, Union, cast
+from typing import Any, Iterator, Optional, Union, cast
 
 import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup
-from selenium.common import NoSuchElementException
+from loguru import logger
+from lxml import etree
+from lxml import html as lxml_html
+from selenium.common import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
 from selenium.webdriver import Keys
 from selenium.webdriver.common.by import By
-
-from brokers import FIDELITY_LOGIN, FIDELITY_PASSWORD, BASE_PATH
-from utils.broker import Broker, OptionOrder, StockOrder
+from selenium.webdriver.support import expected_conditions as EC
+
+from brokers import (
+    FIDELITY_CAPTURE_ACTIVITY,
+    FIDELITY_LOGIN,
+    FIDELITY_PASSWORD,
+    BASE_PATH,
+    LIGHTWEIGHT_BROWSER,
+)
+from utils.broker import Broker, OptionOrder, StagedOrder, StockOrder
 from utils.market_data import MarketData
 from utils.report.report import (
     BrokerNames,
@@ -24,11 +37,73 @@ from utils.report.report import (
     StockData,
     OptionData,
 )
-from utils.selenium_helper import CustomChromeInstance
+from utils.selenium_helper import BrowserPool, CustomChromeInstance
+from utils.tracing import trace_methods
 from utils.util import convert_date
 
+BID_XPATH = '//*[@id="quote-panel"]/div/div[2]/div[1]/div/span/span'
+# seconds to wait for the quote panel to drop the previous symbol's bid, a new symbol
+# can have the same bid so the wait then settles for a stable one
+QUOTE_CHANGE_TIMEOUT = 3
+# the same for a symbol that is quoted again (ex: the post quote), whose bid often
+# hasn't moved since the last quote
+QUOTE_REFRESH_TIMEOUT = 1
+LAST_PRICE_XPATH = (
+    '//*[@id="ett-more-quote-info"]/div/div/div/div/div[2]/div[1]/div[2]/span'
+)
+LOGIN_URL = "https://digital.fidelity.com/prgw/digital/login/full-page"
+TRADE_TICKET_URL = (
+    "https://digital.fidelity.com/ftgw/digital/trade-equity/index/orderEntry"
+)
+ACTIVITY_URL = "https://digital.fidelity.com/ftgw/digital/portfolio/activity"
+# api calls the activity page makes for the order history and execution details
+ACTIVITY_API_PATTERN = r"digital\.fidelity\.com/ftgw/digital/.*(activit|order)"
+SPLITS_COLUMNS = [
+    "Date",
+    "Broker Executed",
+    "Price",
+    "Size",
+    "Dollar Amt",
+    "Identifier",
+    "Split",
+    "Symbol",
+    "Action",
+    "Strike",
+    "Expiration",
+    "Option Type",
+]
+# activity rows, matched on the whole class attribute like BeautifulSoup's class_
+ACTIVITY_ROWS = etree.XPath(
+    '//*[normalize-space(@class)='
+    '"pvd-grid__grid pvd-grid__grid--default-column-span-12"]'
+)
+ROW_TEXT = etree.XPath(".//text()[not(ancestor::script) and not(ancestor::style)]")
+# the table selection and row layout of pd.read_html's lxml parser
+ACTIVITY_TABLES = etree.XPath(
+    "//table[.//text()[re:test(., '.+')]]",
+    namespaces={"re": "http://exslt.org/regular-expressions"},
+)
+TABLE_STYLES = etree.XPath(".//style")
+STYLED = etree.XPath(".//*[@style]")
+TABLE_HEADER_ROWS = etree.XPath(".//thead/tr")
+TABLE_BODY_ROWS = etree.XPath(".//tbody//tr")
+TABLE_ROOT_ROWS = etree.XPath("./tr")
+TABLE_FOOTER_ROWS = etree.XPath(".//tfoot//tr")
+TABLE_CELLS = etree.XPath("./td|./th")
+WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+# the order ticket buttons are svg icons
+ALLOWED_URLS = ["*.svg"]
+# a browser per order category, the first one is the primary that logs in
+SESSION_CATEGORIES = ["STOCKS", "FRACTIONALS", "OPTIONS"]
+ERROR_MODAL_XPATH = "/html/body/div[3]/ap122489-ett-component/div/pvd3-modal[1]/s-root/div/div[2]/div/button"
+
+
+def _hidden(elem: lxml_html.HtmlElement) -> bool:
+    return "display:none" in elem.get("style", "").replace(" ", "")
+
 
 #
+@trace_methods("selenium")
 class Fidelity(Broker):
 
     def __init__(
@@ -38,42 +113,125 @@ class Fidelity(Broker):
         option_report_file: Optional[Path] = None,
     ):
         super().__init__(report_file, broker_name, option_report_file)
-        self._chrome_inst = CustomChromeInstance()
-        self._chrome_inst.open(
-            "https://digital.fidelity.com/prgw/digital/login/full-page"
+        self._pool = BrowserPool(self._create_browser, SESSION_CATEGORIES)
+        # each browser has a single order ticket, so one order is staged per browser
+        self._staged_tickets: dict[str, StagedOrder] = {}
+        # symbol each browser's quote panel shows
+        self._quoted_symbols: dict[str, str] = {}
+
+    def _create_browser(self, category: str) -> CustomChromeInstance:
+        primary = category == SESSION_CATEGORIES[0]
+        return CustomChromeInstance(
+            name=self.name(),
+            profile=self.name() if primary else f"{self.name()}_{category}",
+            lightweight=LIGHTWEIGHT_BROWSER,
+            allowlist=ALLOWED_URLS,
+            cookies_from=self.name(),
         )
 
+    def _activity_browser(self) -> Optional[CustomChromeInstance]:
+        """
+        a browser that logs the network only for the activity page visit, so the
+        trading browsers don't keep a performance log all day. None when it can't
+        start or pick up the primary's login
+        """
+        self._pool.primary.save_cookies()
+        try:
+            browser = CustomChromeInstance(
+                name=self.name(),
+                profile=f"{self.name()}_ACTIVITY",
+                lightweight=LIGHTWEIGHT_BROWSER,
+                allowlist=ALLOWED_URLS,
+                capture_network=True,
+                cookies_from=self.name(),
+            )
+        except (WebDriverException, OSError) as e:
+            logger.error(f"FD: unable to start the activity browser: {e}")
+            return None
+        try:
+            if browser.resume_session(
+                TRADE_TICKET_URL, By.ID, "eq-ticket-dest-symbol"
+            ):
+                return browser
+        except WebDriverException as e:
+            logger.error(f"FD: activity browser couldn't resume the session: {e}")
+        browser.quit()
+        return None
+
+    @property
+    def _chrome_inst(self) -> CustomChromeInstance:
+        return self._pool.current()
+
+    @property
+    def _staged_ticket(self) -> Optional[StagedOrder]:
+        return self._staged_tickets.get(self._pool.category())
+
+    @_staged_ticket.setter
+    def _staged_ticket(self, staged: Optional[StagedOrder]) -> None:
+        if staged:
+            self._staged_tickets[self._pool.category()] = staged
+        else:
+            self._staged_tickets.pop(self._pool.category(), None)
+
+    @contextmanager
+    def session(self, category: str) -> Iterator[None]:
+        with self._pool.session(category):
+            yield
+
     def login(self) -> None:
+        self._login_primary()
+        # the other browsers pick up the primary's login through its saved cookies
+        self._pool.primary.save_cookies()
+        for category in SESSION_CATEGORIES[1:]:
+            with self._pool.session(category) as browser:
+                if not browser.resume_session(
+                    TRADE_TICKET_URL, By.ID, "eq-ticket-dest-symbol"
+                ):
+                    logger.warning(f"FD: {category} shares the primary browser")
+                    self._pool.share(category)
+
+    def _login_primary(self) -> None:
+        if self._chrome_inst.resume_session(
+            TRADE_TICKET_URL, By.ID, "eq-ticket-dest-symbol"
+        ):
+            return
+        self._chrome_inst.open(LOGIN_URL, "login_page")
         login_input_elem = self._chrome_inst.find(
             By.XPATH, '//*[@id="dom-username-input"]'
         )
         self._chrome_inst.sendKeyboardInput(login_input_elem, FIDELITY_LOGIN)
-        time.sleep(1)
-        password_input_elem = self._chrome_inst.find(
+        password_input_elem = self._chrome_inst.wait_clickable(
             By.XPATH, '//*[@id="dom-pswd-input"]'
         )
         self._chrome_inst.sendKeyboardInput(password_input_elem, FIDELITY_PASSWORD)
-        time.sleep(1)
-        login_button = self._chrome_inst.find(By.XPATH, '//*[@id="dom-login-button"]')
-        login_button.click()
-        time.sleep(5)  # will have to play with time depending on your internet speeds
-        self._chrome_inst.open(
-            "https://digital.fidelity.com/ftgw/digital/trade-equity/index/orderEntry"
+        login_button = self._chrome_inst.wait_clickable(
+            By.XPATH, '//*[@id="dom-login-button"]'
         )
+        login_page = self._chrome_inst.url
+        login_button.click()
+        # opening the ticket before the login form has redirected aborts the login
+        if not self._chrome_inst.wait_url_change(login_page, timeout=30, step="login"):
+            logger.warning("FD: login page hasn't redirected")
+        self._chrome_inst.open(TRADE_TICKET_URL, "trade_ticket")
         input("Finished logging in? (Enter/n) ")
+        self._chrome_inst.save_cookies()
 
-    def _get_stock_data(self, sym: str) -> StockData:
+    def _get_stock_data(self, sym: str, from_ticket: bool = False) -> StockData:
+        """
+        types the symbol into the ticket and reads the quote panel, `from_ticket` reads
+        the quote of an already filled ticket without touching it
+        """
         symbol_elem = self._chrome_inst.waitForElementToLoad(
             By.ID, "eq-ticket-dest-symbol"
         )
-        self._chrome_inst.sendKeyboardInput(symbol_elem, sym)
-        symbol_elem.send_keys(Keys.RETURN)
-
-        time.sleep(1)
-
-        bid_price = self._chrome_inst.find(
-            By.XPATH, '//*[@id="quote-panel"]/div/div[2]/div[1]/div/span/span'
-        ).text.replace(",", "")
+        if not from_ticket:
+            self._staged_ticket = None
+            bid_price = self._quote_symbol(symbol_elem, sym)
+        else:
+            bid_price = self._chrome_inst.wait_text_stable(
+                By.XPATH, BID_XPATH, step="quote"
+            )
+        bid_price = bid_price.replace(",", "")
 
         ask_price = self._chrome_inst.find(
             By.XPATH, '//*[@id="quote-panel"]/div/div[2]/div[2]/div/span/span'
@@ -83,28 +241,47 @@ class Fidelity(Broker):
             By.XPATH, '//*[@id="quote-panel"]/div/div[2]/div[3]/div/span'
         ).text.replace(",", "")
         try:
-            quote = self._chrome_inst.find(
-                By.XPATH,
-                '//*[@id="ett-more-quote-info"]/div/div/div/div/div[2]/div[1]/div[2]/span',
-            ).text
+            quote = self._chrome_inst.find(By.XPATH, LAST_PRICE_XPATH).text
         except NoSuchElementException:
             self._chrome_inst.find(By.ID, "ett-more-less-quote-link").click()
-            time.sleep(0.5)
-            quote = self._chrome_inst.find(
-                By.XPATH,
-                '//*[@id="ett-more-quote-info"]/div/div/div/div/div[2]/div[1]/div[2]/span',
+            quote = self._chrome_inst.wait_visible(
+                By.XPATH, LAST_PRICE_XPATH, step="more_quote_info"
             ).text
         quote = quote.replace(",", "")
-        symbol_elem.send_keys(Keys.BACKSPACE * 5)
+        if not from_ticket:
+            symbol_elem.send_keys(Keys.BACKSPACE * 5)
         return StockData(
             float(ask_price), float(bid_price), float(quote[1:]), float(volume)
         )
 
-    def buy(self, order: StockOrder) -> None:
-        pre_stock_data = self._get_stock_data(order.sym)
+    def stage(
+        self, order: Union[StockOrder, OptionOrder], action: ActionType
+    ) -> StagedOrder:
+        """
+        fills and previews the stock ticket, commit only has to click place
+        """
+        if action not in (ActionType.BUY, ActionType.SELL) or self._staged_ticket:
+            return super().stage(order, action)
+        order = cast(StockOrder, order)
+        self._prepare_order(order.sym, order.quantity, action, OrderType.MARKET)
+        self._staged_ticket = StagedOrder(order, action, {"ticket": True})
+        return self._staged_ticket
+
+    def commit(self, staged: StagedOrder) -> None:
+        if staged is not self._staged_ticket:
+            # never staged or the ticket was reused by another order since
+            return super().commit(staged)
+        order = cast(StockOrder, staged.order)
+        if staged.action == ActionType.BUY:
+            self.buy(order, staged)
+        else:
+            self.sell(order, staged)
+
+    def buy(self, order: StockOrder, staged: Optional[StagedOrder] = None) -> None:
+        pre_stock_data = self._get_stock_data(order.sym, from_ticket=bool(staged))
         program_submitted = self._get_current_time()
         try:
-            self._market_buy(order)
+            self._market_buy(order, staged)
         except Exception as e:
             raise e
         program_executed = self._get_current_time()
@@ -120,11 +297,11 @@ class Fidelity(Broker):
             quantity=order.quantity,
         )
 
-    def sell(self, order: StockOrder) -> None:
-        pre_stock_data = self._get_stock_data(order.sym)
+    def sell(self, order: StockOrder, staged: Optional[StagedOrder] = None) -> None:
+        pre_stock_data = self._get_stock_data(order.sym, from_ticket=bool(staged))
         program_submitted = self._get_current_time()
         try:
-            self._market_sell(order)
+            self._market_sell(order, staged)
         except Exception as e:
             raise e
         program_executed = self._get_current_time()
@@ -190,10 +367,18 @@ class Fidelity(Broker):
 
         self._change_order_type(ActionType.BUY)  # change UI back to stock trading
 
-    def _market_buy(self, order: StockOrder) -> None:
+    def _market_buy(
+        self, order: StockOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        if staged:
+            return self._place_staged_order()
         self._perform_order(order.sym, order.quantity, ActionType.BUY, OrderType.MARKET)
 
-    def _market_sell(self, order: StockOrder) -> None:
+    def _market_sell(
+        self, order: StockOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        if staged:
+            return self._place_staged_order()
         self._perform_order(
             order.sym, order.quantity, ActionType.SELL, OrderType.MARKET
         )
@@ -260,24 +445,24 @@ class Fidelity(Broker):
         self._place_another_option_order()
 
     def _change_order_type(self, actionType: ActionType) -> None:
+        self._staged_ticket = None
         if actionType == ActionType.OPEN or actionType == ActionType.CLOSE:
             self._chrome_inst.open(
-                "https://digital.fidelity.com/ftgw/digital/trade-options?ACCOUNT=X30124290&&FULL_BANNER=Y&TIME_IN_FORCE=D&ORDER_TYPE=O&CURRENT_PAGE=TradeOption&DEST_TRADE=Y"
+                "https://digital.fidelity.com/ftgw/digital/trade-options?ACCOUNT=X30124290&&FULL_BANNER=Y&TIME_IN_FORCE=D&ORDER_TYPE=O&CURRENT_PAGE=TradeOption&DEST_TRADE=Y",
+                "option_ticket",
             )
         else:
-            self._chrome_inst.open(
-                "https://digital.fidelity.com/ftgw/digital/trade-equity/index/orderEntry"
-            )
-        time.sleep(2)
+            self._chrome_inst.open(TRADE_TICKET_URL, "trade_ticket")
+        self._chrome_inst.wait_network_idle(step="order_page")
 
     def _choose_option_symbol(self, sym: str) -> None:
         symbol = self._chrome_inst.find(By.XPATH, '//*[@id="symbol_search_label"]')
         symbol.click()
-        time.sleep(1)
-        symbol = self._chrome_inst.find(By.XPATH, '//*[@id="symbol_search"]')
+        symbol = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="symbol_search"]')
         self._chrome_inst.sendKeyboardInput(symbol, sym)
         symbol.send_keys(Keys.RETURN)
-        time.sleep(1)
+        # the option chain for the symbol is loaded into the dropdowns
+        self._chrome_inst.wait_dom_quiet(step="option_symbol")
 
     def _choose_option_action(self, action_type: ActionType) -> None:
         action = self._chrome_inst.find(By.XPATH, '//*[@id="action_dropdown"]/span[5]')
@@ -312,24 +497,33 @@ class Fidelity(Broker):
     def _set_option_expiration(self, expiration_date: str) -> None:
         dropdown = self._chrome_inst.find(By.XPATH, '//*[@id="exp_dropdown"]')
         dropdown.click()
-        time.sleep(1)
         date = convert_date(expiration_date, "%b %d, %Y")
-        expiration_entry = self._chrome_inst.find(
-            By.XPATH,
-            f'//*[@id="init-form"]/div[2]/trade-option-init/div/div[3]/div/div[4]/div/div/button/span[contains(text(), "{date}")]',
+        expiration_entry = self._chrome_inst.wait_until(
+            EC.presence_of_element_located(
+                (
+                    By.XPATH,
+                    f'//*[@id="init-form"]/div[2]/trade-option-init/div/div[3]/div/div[4]/div/div/button/span[contains(text(), "{date}")]',
+                )
+            ),
+            "option_expiration_dropdown",
         )
         self._chrome_inst.scroll_to_element(expiration_entry)
         expiration_entry.click()
-        time.sleep(2)
+        # strikes for the chosen expiration are loaded
+        self._chrome_inst.wait_dom_quiet(step="option_expiration")
 
     def _set_strike_price(self, strike: str) -> None:
         dropdown = self._chrome_inst.find(By.XPATH, '//*[@id="strike_dropdown"]')
         dropdown.click()
-        time.sleep(1)
         formatted_strike = "{0:,.2f}".format(float(strike))
-        strike_entry = self._chrome_inst.find(
-            By.XPATH,
-            f'//*[@id="init-form"]/div[2]/trade-option-init/div/div[3]/div/div[5]/div/div/button[contains(text(), "{formatted_strike}")]',
+        strike_entry = self._chrome_inst.wait_until(
+            EC.presence_of_element_located(
+                (
+                    By.XPATH,
+                    f'//*[@id="init-form"]/div[2]/trade-option-init/div/div[3]/div/div[5]/div/div/button[contains(text(), "{formatted_strike}")]',
+                )
+            ),
+            "option_strike_dropdown",
         )
         self._chrome_inst.scroll_to_element(strike_entry)
         strike_entry.click()
@@ -353,43 +547,89 @@ class Fidelity(Broker):
         cash.click()
 
     def _preview_option_order(self) -> None:
-        time.sleep(1)
-        preview = self._chrome_inst.find(By.XPATH, '//*[@id="previewButton"]')
+        preview = self._chrome_inst.wait_clickable(
+            By.XPATH, '//*[@id="previewButton"]', step="option_preview_button"
+        )
         preview.click()
-        time.sleep(2)
 
     def _place_option_order(self) -> None:
-        place_order = self._chrome_inst.find(By.XPATH, '//*[@id="dest-place-button"]')
+        place_order = self._chrome_inst.wait_clickable(
+            By.XPATH, '//*[@id="dest-place-button"]', step="option_preview"
+        )
         place_order.click()
-        time.sleep(1)
 
     def _place_another_option_order(self) -> None:
-        another = self._chrome_inst.find(By.XPATH, '//*[@id="place-new-order"]')
+        another = self._chrome_inst.wait_clickable(
+            By.XPATH, '//*[@id="place-new-order"]', step="option_place"
+        )
         another.click()
 
     def _perform_order(
         self, sym: str, amount: float, action: ActionType, order_type: OrderType
     ) -> None:
+        self._prepare_order(sym, amount, action, order_type)
+        self._place_order()
+        self._place_new_order()
+
+    def _place_staged_order(self) -> None:
+        self._staged_ticket = None
+        self._place_order()
+        self._place_new_order()
+
+    def _prepare_order(
+        self, sym: str, amount: float, action: ActionType, order_type: OrderType
+    ) -> None:
+        # whatever was staged on the ticket is overwritten
+        self._staged_ticket = None
         self._choose_stock(sym)
         self._set_action(action)
         self._set_amount(amount)
         self._set_order_type(order_type)
         self._preview_order()
-        time.sleep(2)
+        # preview either enables the place button or pops up the error modal
+        self._chrome_inst.wait_until(
+            EC.any_of(
+                EC.element_to_be_clickable((By.ID, "placeOrderBtn")),
+                EC.visibility_of_element_located((By.XPATH, ERROR_MODAL_XPATH)),
+            ),
+            "preview",
+        )
         self._check_error_msg(sym, amount, action)
-        time.sleep(1)
-        self._place_order()
-        self._place_new_order()
 
     def _choose_stock(self, sym: str) -> None:
         symbol_elem = self._chrome_inst.waitForElementToLoad(
             By.ID, "eq-ticket-dest-symbol"
         )
         symbol_elem.send_keys(Keys.BACKSPACE * 5)
+        self._quote_symbol(symbol_elem, sym)
+
+    def _quote_symbol(self, symbol_elem: Any, sym: str) -> str:
+        """
+        submits `sym` in the ticket and returns its bid once the quote panel has dropped
+        the bid it showed before the submit
+        """
+        previous_bid = None
+        try:
+            previous_bid = self._chrome_inst.find(By.XPATH, BID_XPATH).text
+        except NoSuchElementException:
+            pass
+        requoted = self._quoted_symbols.get(self._pool.category()) == sym
         self._chrome_inst.sendKeyboardInput(symbol_elem, sym)
         symbol_elem.send_keys(Keys.RETURN)
-
-        time.sleep(2)
+        self._quoted_symbols[self._pool.category()] = sym
+
+        if previous_bid:
+            try:
+                return self._chrome_inst.wait_text_stable(
+                    By.XPATH,
+                    BID_XPATH,
+                    timeout=QUOTE_REFRESH_TIMEOUT if requoted else QUOTE_CHANGE_TIMEOUT,
+                    step="quote",
+                    changed_from=previous_bid,
+                )
+            except TimeoutException:
+                logger.info(f"{self.name()} {sym} bid is unchanged at {previous_bid}")
+        return self._chrome_inst.wait_text_stable(By.XPATH, BID_XPATH, step="quote")
 
     def _set_action(self, action: ActionType) -> None:
         if action == ActionType.BUY:
@@ -413,25 +653,18 @@ class Fidelity(Broker):
         preview_btn.click()
 
     def _place_order(self) -> None:
-        place_order_btn = self._chrome_inst.waitForElementToLoad(By.ID, "placeOrderBtn")
+        place_order_btn = self._chrome_inst.wait_clickable(By.ID, "placeOrderBtn")
         place_order_btn.click()
 
     def _place_new_order(self) -> None:
-        place_new_order_btn = self._chrome_inst.waitForElementToLoad(
-            By.ID, "eq-ticket__enter-new-order"
+        place_new_order_btn = self._chrome_inst.wait_clickable(
+            By.ID, "eq-ticket__enter-new-order", step="place"
         )
         place_new_order_btn.click()
 
     def _check_error_msg(self, sym: str, amount: float, action: ActionType) -> None:
         try:
-            self._chrome_inst.find(
-                By.XPATH,
-                "/html/body/div[3]/ap122489-ett-component/div/pvd3-modal[1]/s-root/div/div[2]/div/button",
-            )
-            elem = self._chrome_inst.find(
-                By.XPATH,
-                "/html/body/div[3]/ap122489-ett-component/div/pvd3-modal[1]/s-root/div/div[2]/div/button",
-            )
+            elem = self._chrome_inst.find(By.XPATH, ERROR_MODAL_XPATH)
             if elem.is_displayed():
                 elem.click()
                 raise ValueError(f"Fidelity {action.value} Error: {sym} - {amount}")
@@ -520,7 +753,8 @@ class Fidelity(Broker):
         :return: list of (symbol, amount)
         """
         self._chrome_inst.open(
-            "https://digital.fidelity.com/ftgw/digital/portfolio/positions"
+            "https://digital.fidelity.com/ftgw/digital/portfolio/positions",
+            "positions_page",
         )
         # time.sleep(4)  # depends on internet speed but min 2 seconds for animation
         input("Finished loading positions? (Enter/n) ")
@@ -528,13 +762,12 @@ class Fidelity(Broker):
             By.XPATH,
             '//*[@id="posweb-grid_top-presetviews_refresh_settings_share"]/div[2]/div[4]/button',
         )
-        download_csv_positions.click()
-        time.sleep(5)  # wait for file to download
-
-        file = (
-            BASE_PATH
-            / f'data/Portfolio_Positions_{datetime.now().strftime("%b-%d-%Y")}.csv'
+        download = self._chrome_inst.expect_download(
+            f'Portfolio_Positions_{datetime.now().strftime("%b-%d-%Y")}*.csv',
+            step="positions_download",
         )
+        download_csv_positions.click()
+        file = download.result()
 
         positions: list[StockOrder] = []
         option_positions: list[OptionOrder] = []
@@ -568,10 +801,8 @@ class Fidelity(Broker):
                 )
             else:
                 positions.append(StockOrder(row["Symbol"], row["Quantity"]))
-        self._chrome_inst.open(
-            "https://digital.fidelity.com/ftgw/digital/trade-equity/index/orderEntry"
-        )
-        time.sleep(3)
+        self._chrome_inst.open(TRADE_TICKET_URL, "trade_ticket")
+        self._chrome_inst.wait_clickable(By.ID, "eq-ticket-dest-symbol")
 
         import os
 
@@ -583,6 +814,10 @@ class Fidelity(Broker):
         """
         gets the information from the https://digital.fidelity.com/ftgw/digital/portfolio/activity
         and stores it into a csv file to be used in the report generation
+
+        with FIDELITY_CAPTURE_ACTIVITY the orders are built from the api responses the
+        page loads, when none were captured (or capture is off) every row is expanded
+        and the page html is scraped instead
         :return:
         """
 
@@ -590,12 +825,43 @@ class Fidelity(Broker):
             with open(filename, "w") as file:
                 file.write(content)
 
-        self._chrome_inst.open(
-            "https://digital.fidelity.com/ftgw/digital/portfolio/activity"
-        )
-        _ = input("Fidelity (load more results)?")
+        capture = self._activity_browser() if FIDELITY_CAPTURE_ACTIVITY else None
+        browser = capture or self._chrome_inst
+        try:
+            browser.open(ACTIVITY_URL, "activity_page")
+            _ = input("Fidelity (load more results)?")
+            if capture is not None:
+                df = self._captured_activity(capture)
+                if not df.empty:
+                    date = datetime.now().strftime("%m_%d")
+                    df.to_csv(
+                        BASE_PATH / f"data/fidelity/fd_splits_{date}.csv", index=False
+                    )
+                    return df
+            return self._scrape_activity(browser)
+        finally:
+            if capture is not None:
+                capture.quit()
 
-        unopened = self._chrome_inst.get_page_source()
+    def _captured_activity(self, browser: CustomChromeInstance) -> pd.DataFrame:
+        """
+        the splits from the captured activity responses, empty when there are none or
+        they don't match the schema parse_activity_payloads expects
+        """
+        try:
+            df = self.parse_activity_payloads(
+                browser.captured_json(ACTIVITY_API_PATTERN)
+            )
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning(f"Unexpected Fidelity activity response ({e!r})")
+            return pd.DataFrame(columns=SPLITS_COLUMNS)
+        if df.empty:
+            logger.warning("No Fidelity activity responses captured")
+        return df
+
+    def _scrape_activity(self, browser: CustomChromeInstance) -> pd.DataFrame:
+        logger.info("Scraping the Fidelity activity page")
+        unopened = browser.get_page_source()
         try:  # super sus
 
             def get_xpath(row: int) -> str:
@@ -603,14 +869,14 @@ class Fidelity(Broker):
 
             x = 1
             while True:
-                more_info = self._chrome_inst.find(By.XPATH, get_xpath(x))
+                more_info = browser.find(By.XPATH, get_xpath(x))
                 more_info.click()
                 x += 1
         except Exception as e:
             # done opening all the tabs
             pass
 
-        opened = self._chrome_inst.get_page_source()
+        opened = browser.get_page_source()
         # input("Finished downloading as PDF")
         # save_string_to_file(unopened, "unopened.html")
         # save_string_to_file(opened, "opened.html")
@@ -640,69 +906,163 @@ class Fidelity(Broker):
         return new_df
 
     @staticmethod
-    def _create_row(
-        sym: str,
-        action: str,
-        strike: Optional[str] = None,
-        expiration: Optional[str] = None,
-        option_type: Optional[str] = None,
-    ) -> pd.Series:
-        return pd.Series(
-            [sym, action, strike, expiration, option_type],
-            index=["Symbol", "Action", "Strike", "Expiration", "Option Type"],
+    def _find_orders(payload: Any) -> Iterator[dict]:
+        """
+        orders anywhere in an activity response: objects with an order id, symbol,
+        action and a list of executions
+        """
+        if isinstance(payload, dict):
+            keys = ("orderId", "symbol", "action")
+            if all(key in payload for key in keys) and isinstance(
+                payload.get("executions"), list
+            ):
+                yield payload
+                return
+            payload = list(payload.values())
+        if isinstance(payload, list):
+            for value in payload:
+                yield from Fidelity._find_orders(value)
+
+    @staticmethod
+    def _execution_time(value: Union[int, float, str]) -> pd.Timestamp:
+        """epoch millis or an ISO timestamp (ET when it has no offset) in PT"""
+        if isinstance(value, (int, float)):
+            timestamp = pd.Timestamp(value, unit="ms", tz="UTC")
+        else:
+            timestamp = pd.Timestamp(value)
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.tz_localize("US/Eastern")
+        return timestamp.tz_convert("US/Pacific")
+
+    @staticmethod
+    def parse_activity_payloads(payloads: list[Any]) -> pd.DataFrame:
+        """
+        builds the same splits frame as parse_trade_data from the captured activity
+        responses, an order is expected to look like
+        {"orderId", "symbol", "action", "option": {"strike", "expiration", "type"},
+         "executions": [{"dateTime", "price", "quantity", "amount"}]}
+        """
+        rows = []
+        seen = set()
+        identifier = 0
+        for payload in payloads:
+            for order in Fidelity._find_orders(payload):
+                key = order["orderId"]
+                action = str(order.get("action", "")).capitalize()
+                if key in seen or action not in ("Buy", "Sell"):
+                    continue
+                seen.add(key)
+                option = order.get("option") or {}
+                expiration = option.get("expiration")
+                split = len(order["executions"]) > 1
+                for execution in order["executions"]:
+                    executed = Fidelity._execution_time(execution["dateTime"])
+                    price = float(execution["price"])
+                    size = float(execution["quantity"])
+                    amount = float(execution.get("amount", price * size))
+                    rows.append(
+                        [
+                            executed.strftime("%m/%d/%Y"),
+                            executed,
+                            f"{price:,.4f}",
+                            size,
+                            f"{abs(amount):,.2f}",
+                            identifier,
+                            split,
+                            order["symbol"],
+                            action,
+                            option.get("strike"),
+                            (
+                                pd.Timestamp(expiration).strftime("%b-%d-%Y")
+                                if expiration
+                                else None
+                            ),
+                            str(option["type"]).capitalize() if option else None,
+                        ]
+                    )
+                identifier += 1
+
+        df = pd.DataFrame(rows, columns=SPLITS_COLUMNS)
+        # oldest first, like the reversed activity page
+        df = df.sort_values("Broker Executed", kind="stable", ignore_index=True)
+        df["Broker Executed"] = df["Broker Executed"].map(
+            lambda executed: executed.strftime("%I:%M:%S")
         )
+        return df
 
     @staticmethod
     def _handle_unopened_data(unopened_html: str) -> pd.DataFrame:
-        unopened_df = pd.DataFrame()
-        soup = BeautifulSoup(unopened_html, "html.parser")
-        class_to_find = "pvd-grid__grid pvd-grid__grid--default-column-span-12"
-        data = soup.find_all(class_=class_to_find)
+        rows = []
         keywords = {"Contract", "Contracts"}
-        for row in data:
-            text = row.get_text(strip=True).split()
+        for row in ACTIVITY_ROWS(lxml_html.fromstring(unopened_html)):
+            # same tokens as BeautifulSoup's get_text(strip=True).split()
+            text = "".join(part.strip() for part in ROW_TEXT(row)).split()
             if text[3] not in keywords:
-                row_info = Fidelity._create_row(text[4], text[0])
+                rows.append([text[4], text[0], None, None, None])
             else:
-                row_info = Fidelity._create_row(
-                    text[4],
-                    text[0],
-                    strike=text[8],
-                    expiration=f"{text[5]}-{text[6]}-{text[7]}",
-                    option_type=text[9],
+                rows.append(
+                    [
+                        text[4],
+                        text[0],
+                        text[8],
+                        f"{text[5]}-{text[6]}-{text[7]}",
+                        text[9],
+                    ]
                 )
-            unopened_df = pd.concat(
-                [unopened_df, row_info.to_frame().T], ignore_index=True
-            )
 
+        unopened_df = pd.DataFrame(
+            rows,
+            columns=["Symbol", "Action", "Strike", "Expiration", "Option Type"],
+            dtype=object,
+        )
         unopened_df = unopened_df[
             (unopened_df["Action"] == "Buy") | (unopened_df["Action"] == "Sell")
         ]
 
         return unopened_df
 
+    @staticmethod
+    def _table_rows(table: lxml_html.HtmlElement) -> list[list[Any]]:
+        """
+        body and footer rows of a table the way pd.read_html reads them: header rows
+        (<thead> or leading all <th> rows) skipped, colspan cells repeated, whitespace
+        collapsed and empty cells as NaN (rowspan is not expanded)
+        """
+        header = TABLE_HEADER_ROWS(table)
+        body = TABLE_BODY_ROWS(table) + TABLE_ROOT_ROWS(table)
+        if not header:
+            while body and all(cell.tag == "th" for cell in TABLE_CELLS(body[0])):
+                body.pop(0)
+        rows = []
+        for tr in body + TABLE_FOOTER_ROWS(table):
+            texts: list[Any] = []
+            for cell in TABLE_CELLS(tr):
+                text = WHITESPACE.sub(" ", cell.text_content().strip())
+                texts.extend([text or np.nan] * int(cell.get("colspan", 1) or 1))
+            rows.append(texts)
+        width = max((len(row) for row in rows), default=0)
+        return [row + [np.nan] * (width - len(row)) for row in rows]
+
     @staticmethod
     def _handle_opened_data(opened: str) -> pd.DataFrame:
-        df = pd.read_html(StringIO(opened))
+        document = lxml_html.fromstring(opened)
 
-        # get the data from the individual split dfs and put them into a list
+        # get the rows of the individual split tables (without the total row) into
+        # one list, the table index identifies the order
         data = []
-        for idx, temp in enumerate(df):
-            splits = temp.iloc[:-1].to_numpy()
-            length = splits.shape[0]
-            identifier = np.empty((length, 1))
-            identifier.fill(idx)
-            updated = np.hstack((splits, identifier))
-            data.append(updated)
-
-        # combine all the rows into one
-        res = data[0]
-        for x in data[1:]:
-            res = np.append(res, x, axis=0)
+        tables = [table for table in ACTIVITY_TABLES(document) if not _hidden(table)]
+        for idx, table in enumerate(tables):
+            for elem in TABLE_STYLES(table):
+                elem.drop_tree()
+            for elem in STYLED(table):
+                if _hidden(elem):
+                    elem.drop_tree()
+            for row in Fidelity._table_rows(table)[:-1]:
+                data.append(row + [idx])
 
         # create a df with split info
         splits_df = pd.DataFrame(
-            res,
+            data,
             columns=[
                 "Date",
                 "Broker Executed",
@@ -712,6 +1072,12 @@ class Fidelity(Broker):
                 "Identifier",
             ],
         )
+        try:  # read_html infers the quantities as numbers
+            splits_df["Size"] = pd.to_numeric(
+                splits_df["Size"].replace(",", "", regex=True)
+            )
+        except ValueError:
+            pass
 
         splits_df["Split"] = splits_df["Identifier"].duplicated(keep=False)
 
@@ -27,7 +27,8 @@ from ib_async.order import MarketOrder, LimitOrder
 # import robin_stocks.robinhood as rh
 
 from brokers import BASE_PATH, IBKR_LOGIN, IBKR_PASSWORD
-from utils.broker import Broker, StockOrder, OptionOrder
+from utils.async_broker import AsyncBroker
+from utils.broker import REPORT_LOCK, Broker, StagedOrder, StockOrder, OptionOrder
 # from utils.market_data import MarketData
 from utils.report.report import (
     NULL_STOCK_DATA,
@@ -45,6 +46,16 @@ from utils.selenium_helper import CustomChromeInstance
 from utils.util import repeat
 from zoneinfo import ZoneInfo
 
+# TWS / IB Gateway api, port 7497 for paper trading
+TWS_HOST = "127.0.0.1"
+TWS_PORT = 7496
+TWS_CLIENT_ID = 1
+# seconds waited for an option ticker's greeks before reporting without them
+GREEKS_TIMEOUT = 5
+# seconds for a market option order to show up in ib.executions()
+EXECUTION_WAIT = 4
+
+
 class BuyOrderCancelledException(Exception):
     def __init__(self, message):
         super().__init__(message)  # Pass message to the base Exception class
@@ -58,6 +69,9 @@ class IBKR(Broker):
     IBKR IS VERY SCARY - DAMN!
     """
 
+    # ib_async runs on the event loop of the thread that connected
+    MAIN_THREAD_ONLY = True
+
     def __init__(
         self,
         report_file: Path,
@@ -79,8 +93,7 @@ class IBKR(Broker):
         # self._chrome_inst.open("https://ndcdyn.interactivebrokers.com/sso/Login")
 
     def login(self) -> None:
-        self.ib.connect('127.0.0.1', port=7496, clientId=1)   # FOR NORMAL TRADING
-        # self.ib.connect('127.0.0.1', port=7497, clientId=1)     # FOR PAPER TRADING
+        self.ib.connect(TWS_HOST, port=TWS_PORT, clientId=TWS_CLIENT_ID)
         if self.ib.isConnected():
             print("Successfully connected to TWS.")
             pass
@@ -154,7 +167,43 @@ class IBKR(Broker):
         # )
         pass
 
-    def buy_option(self, order: OptionOrder) -> Any:
+    def stage(
+        self, order: Union[StockOrder, OptionOrder], action: ActionType
+    ) -> StagedOrder:
+        '''
+        Qualifies the option contract ahead of time so commit only places the order
+        '''
+        if action not in (ActionType.OPEN, ActionType.CLOSE):
+            return super().stage(order, action)
+        order = cast(OptionOrder, order)
+        if order.option_type != OptionType.CALL:
+            return super().stage(order, action)
+        contract = self._call_contract(order)
+        self.ib.qualifyContracts(contract)
+        return StagedOrder(order, action, {"contract": contract})
+
+    def commit(self, staged: StagedOrder) -> None:
+        if "contract" not in staged.data:
+            return super().commit(staged)
+        order = cast(OptionOrder, staged.order)
+        if staged.action == ActionType.OPEN:
+            self.buy_option(order, staged)
+        else:
+            self.sell_option(order, staged)
+
+    def _call_contract(self, order: OptionOrder) -> Option:
+        expiration_date = order.expiration.replace('-', '')
+        return Option(
+            symbol=order.sym,
+            lastTradeDateOrContractMonth=expiration_date,
+            strike=order.strike,
+            right='CALL',
+            exchange='SMART',  # Use SMART for automatic best execution
+        )
+
+    def buy_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> Any:
         '''
         IMPLEMENT THIS BAD BOY
         '''
@@ -164,7 +213,7 @@ class IBKR(Broker):
 
         ### BUY OPTION ###
         if order.option_type == OptionType.CALL:
-            self._buy_call_option(order)
+            self._buy_call_option(order, staged)
         else:
             # not implemented yet
             self._buy_put_option(order)
@@ -184,21 +233,11 @@ class IBKR(Broker):
             orderID=None,           # adding in order id in save option report function
         )
     
-    def _buy_call_option(self, order: OptionOrder) -> Any:
-        expiration_date = order.expiration.replace('-', '')
-
-
-        contract = Option(
-            symbol=order.sym,
-            lastTradeDateOrContractMonth=expiration_date,
-            strike=order.strike,
-            right='CALL',  
-            exchange='SMART',  # Use SMART for automatic best execution
-
-            # may not need these two
-            # multiplier='',    
-            # currency='USD',        
-        )
+    def _buy_call_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> Any:
+        # qualified in stage, otherwise ib resolves the contract on placeOrder
+        contract = staged.data["contract"] if staged else self._call_contract(order)
 
         order = MarketOrder('BUY', order.quantity)
         trade = self.ib.placeOrder(contract, order)
@@ -210,7 +249,9 @@ class IBKR(Broker):
 
 
 
-    def sell_option(self, order: OptionOrder) -> Any:
+    def sell_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> Any:
         '''
         IMPLEMENT THIS BAD BOY
         '''
@@ -221,7 +262,7 @@ class IBKR(Broker):
         ### SELL ###
         if order.option_type == OptionType.CALL:
             # orderID = self._sell_call_option(order)
-            self._sell_call_option(order)
+            self._sell_call_option(order, staged)
         else:
             # not implemented
             orderID = self._sell_put_option(order)
@@ -241,20 +282,10 @@ class IBKR(Broker):
             orderID=None,
         )
     
-    def _sell_call_option(self, order: OptionOrder) -> Any:
-        expiration_date = order.expiration.replace('-', '')
-
-        contract = Option(
-            symbol=order.sym,
-            lastTradeDateOrContractMonth=expiration_date,
-            strike=order.strike,
-            right='CALL',  
-            exchange='SMART',  # Use SMART for automatic best execution
-
-            # may not need these two
-            # multiplier='',      # ASK PROFESSOR WHAT MULITPLIER WOULD BE
-            # currency='USD',        
-        )
+    def _sell_call_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> Any:
+        contract = staged.data["contract"] if staged else self._call_contract(order)
 
         order = MarketOrder('SELL', order.quantity)
 
@@ -460,6 +491,19 @@ class IBKR(Broker):
             self._go_back(action_type)
 
     def _get_option_data(self, order: OptionOrder) -> Any:
+        ticker = self._option_ticker(order)
+
+        total_time = 0
+        while not ticker.modelGreeks:
+            if total_time == GREEKS_TIMEOUT:
+                print("Unable to get IBKR ticker data")
+                break
+            self.ib.sleep(1)
+            total_time += 1
+
+        return self._ticker_option_data(ticker)
+
+    def _option_ticker(self, order: OptionOrder) -> Any:
         expiration_date = order.expiration.replace('-', '')
         contract = Option(
             symbol=order.sym,
@@ -473,17 +517,9 @@ class IBKR(Broker):
             # currency='USD',        
         )
 
-        ticker = self.ib.reqMktData(contract, genericTickList="100")
+        return self.ib.reqMktData(contract, genericTickList="100")
 
-        total_time = 0
-        while not ticker.modelGreeks:
-            if total_time == 5:
-                print("Unable to get IBKR ticker data")
-                break
-            self.ib.sleep(1)
-            total_time += 1
-   
-        
+    def _ticker_option_data(self, ticker: Any) -> OptionData:
         # need to get smth with all of this:
         return OptionData(
             ticker.ask,           
@@ -594,7 +630,27 @@ class IBKR(Broker):
         **kwargs: str,
     ) -> Any:
         executions = self.ib.executions()
-        self.ib.sleep(4)
+        self.ib.sleep(EXECUTION_WAIT)
+        self._report_option_execution(
+            executions,
+            order,
+            action_type,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+    def _report_option_execution(
+        self,
+        executions: list,
+        order: OptionOrder,
+        action_type: ActionType,
+        program_submitted: str,
+        program_executed: str,
+        pre_stock_data: OptionData,
+        post_stock_data: OptionData,
+    ) -> None:
         price, order_time, order_id = None, None, None
         try:
             
@@ -888,7 +944,7 @@ class IBKR(Broker):
 
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}_2026.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
         
@@ -952,7 +1008,7 @@ class IBKR(Broker):
         # write to report file
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
 
@@ -990,7 +1046,7 @@ class IBKR(Broker):
         # write to report file
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
 
@@ -1165,6 +1221,137 @@ class IBKR(Broker):
 
 
 
+class AsyncIBKR(AsyncBroker):
+    """
+    IBKR on ib_async's coroutines instead of the blocking ib.sleep / ib.connect, so
+    waiting on greeks or executions no longer holds up the other brokers. Connects the
+    wrapped IBKR's IB, whose staging and 24 hour helpers keep working
+    """
+
+    def __init__(self, broker: IBKR) -> None:
+        self._broker = broker
+        self.ib = broker.ib
+
+    def name(self) -> str:
+        return self._broker.name()
+
+    async def login(self) -> None:
+        await self.ib.connectAsync(TWS_HOST, TWS_PORT, clientId=TWS_CLIENT_ID)
+        logger.info(f"Connected to TWS: {self.ib.isConnected()}")
+
+    async def _get_stock_data(self, sym: str) -> StockData:
+        return NULL_STOCK_DATA
+
+    async def buy(self, order: StockOrder) -> None:
+        # stocks aren't traded on IBKR, see IBKR.buy
+        pass
+
+    async def sell(self, order: StockOrder) -> None:
+        pass
+
+    async def commit(self, staged: StagedOrder) -> None:
+        if "contract" not in staged.data:
+            return await super().commit(staged)
+        order = cast(OptionOrder, staged.order)
+        if staged.action == ActionType.OPEN:
+            await self.buy_option(order, staged)
+        else:
+            await self.sell_option(order, staged)
+
+    async def _get_option_data(self, order: OptionOrder) -> OptionData:
+        ticker = self._broker._option_ticker(order)
+        for _ in range(GREEKS_TIMEOUT):
+            if ticker.modelGreeks:
+                break
+            await asyncio.sleep(1)
+        else:
+            logger.warning("Unable to get IBKR ticker data")
+        return self._broker._ticker_option_data(ticker)
+
+    async def buy_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        pre_stock_data = await self._get_option_data(order)
+        program_submitted = self._broker._get_current_time()
+
+        if order.option_type == OptionType.CALL:
+            await self._buy_call_option(order, staged)
+        else:
+            logger.error("IBKR put options are not implemented")
+        logger.info("Bought IBKR option")
+
+        program_executed = self._broker._get_current_time()
+        post_stock_data = await self._get_option_data(order)
+        await self._save_option_report(
+            order,
+            ActionType.BUY,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+    async def sell_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        pre_stock_data = await self._get_option_data(order)
+        program_submitted = self._broker._get_current_time()
+
+        if order.option_type == OptionType.CALL:
+            await self._sell_call_option(order, staged)
+        else:
+            logger.error("IBKR put options are not implemented")
+        logger.info("Sold IBKR option")
+
+        program_executed = self._broker._get_current_time()
+        post_stock_data = await self._get_option_data(order)
+        await self._save_option_report(
+            order,
+            ActionType.SELL,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+    async def _buy_call_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        # placeOrder only queues the request, it doesn't wait on TWS
+        contract = (
+            staged.data["contract"] if staged else self._broker._call_contract(order)
+        )
+        self.ib.placeOrder(contract, MarketOrder("BUY", order.quantity))
+
+    async def _sell_call_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        contract = (
+            staged.data["contract"] if staged else self._broker._call_contract(order)
+        )
+        self.ib.placeOrder(contract, MarketOrder("SELL", order.quantity))
+
+    async def _save_option_report(
+        self,
+        order: OptionOrder,
+        action_type: ActionType,
+        program_submitted: str,
+        program_executed: str,
+        pre_stock_data: OptionData,
+        post_stock_data: OptionData,
+    ) -> None:
+        await asyncio.sleep(EXECUTION_WAIT)
+        self._broker._report_option_execution(
+            self.ib.executions(),
+            order,
+            action_type,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+
 if __name__ == "__main__":
 
     a = IBKR(Path("temp.csv"), BrokerNames.IF)
@@ -11,8 +11,17 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from loguru import logger
 
-from brokers import BASE_PATH, RH_LOGIN, RH_PASSWORD, RH_LOGIN2, RH_PASSWORD2
-from utils.broker import Broker, StockOrder, OptionOrder
+from brokers import (
+    BASE_PATH,
+    RH_BASE_URL,
+    RH_LOGIN,
+    RH_PASSWORD,
+    RH_LOGIN2,
+    RH_PASSWORD2,
+)
+from utils.base_url import RedirectAdapter
+from utils.connections import POOL_KWARGS, WARM_UP_SYMBOL, pool_sessions
+from utils.broker import REPORT_LOCK, Broker, StockOrder, OptionOrder
 from pytz import utc, timezone
 from utils.report.report import (
     OptionReportEntry,
@@ -25,6 +34,8 @@ from utils.report.report import (
     OptionData,
     TwentyFourReportEntry
 )
+from utils.rate_limit import RATE_LIMITER, Priority
+from utils.retry import ORDER_LOOKUP_RETRY, RetryableError, retry
 from utils.util import parse_option_string
 
 
@@ -460,16 +471,33 @@ class Robinhood(Broker):
         report_file: Path,
         broker_name: BrokerNames,
         option_report_file: Optional[Path] = None,
+        base_url: str = RH_BASE_URL,
     ):
         super().__init__(report_file, broker_name, option_report_file)
+        self._base_url = base_url
 
     def login(self) -> None:
         """
         if changing the login credentials go to your (HOME_DIR)/.tokens and delete the robinhood.pickle file
         :return: None
         """
+        if self._base_url:
+            Robinhood.use_base_url(self._base_url)
+            return
         Robinhood.login_custom(account="RH")
 
+    @staticmethod
+    def use_base_url(base_url: str) -> None:
+        """
+        sends every robin_stocks request to `base_url` (e.g. a local stand-in server)
+        and marks the session as logged in
+        """
+        pool_sessions([rh.globals.SESSION])
+        rh.globals.SESSION.mount(
+            "https://api.robinhood.com/", RedirectAdapter(base_url, **POOL_KWARGS)
+        )
+        rh.helper.set_login_state(True)
+
     @staticmethod
     def login_custom(account: str = "RH") -> None:
         account = account.upper()
@@ -477,6 +505,8 @@ class Robinhood(Broker):
         username = RH_LOGIN if account == "RH" else RH_LOGIN2
         password = RH_PASSWORD if account == "RH" else RH_PASSWORD2
         time_logged_in = 60 * 60 * 24 * 365
+        # robin_stocks has one global session, shared with MarketData
+        pool_sessions([rh.globals.SESSION])
         rh.authentication.login(
             username=username,
             password=password,
@@ -486,6 +516,9 @@ class Robinhood(Broker):
             pickle_name=pickle_file,
         )
 
+    def warm_up(self) -> None:
+        rh.stocks.get_quotes(WARM_UP_SYMBOL)
+
     def get_current_positions(self) -> tuple[list[StockOrder], list[OptionOrder]]:
         current_positions: list[StockOrder] = []
         positions = rh.account.build_holdings()
@@ -659,12 +692,25 @@ class Robinhood(Broker):
         # write to report file
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
 
         
 
+    @retry(ORDER_LOOKUP_RETRY, op="order_info")
+    def _get_executed_order(self, order_id: str) -> dict:
+        """
+        order info once robinhood reports an execution for it, robin_stocks returns
+        None when the request itself fails
+        """
+        RATE_LIMITER.acquire(self.name(), Priority.CONFIRM)
+        order_data = rh.get_stock_order_info(order_id)
+        if not order_data or not order_data.get("executions"):
+            raise RetryableError(f"no executions for order {order_id} yet")
+        return cast(dict, order_data)
+
+
     '''
     Creates report entry objects
     Requires the trade id in order to pull price and execution time from API
@@ -673,16 +719,11 @@ class Robinhood(Broker):
     '''
     def create_24_hour_report_entry(self, id, symbol, action, submit_time):
 
-        time.sleep(1)
-        order_data = rh.get_stock_order_info(id)
+        order_data = self._get_executed_order(id)
 
         # print(order_data)
         # logger.info("Before error points")
 
-        # if can't pull execution data, try again!
-        if len(order_data['executions']) == 0:
-            time.sleep(2)
-            order_data = rh.get_stock_order_info(id)
         price = str(round(float(order_data['executions'][0]['price']), 2))          # get price
 
         # logger.info("In between error points")
@@ -743,7 +784,7 @@ class Robinhood(Broker):
         # write to report file
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
 
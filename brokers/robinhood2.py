@@ -2,6 +2,7 @@ from datetime import datetime, time
 from zoneinfo import ZoneInfo
 import math
 from pathlib import Path
+import threading
 import time
 from typing import Any, Optional, Union, cast
 from zoneinfo import ZoneInfo
@@ -13,12 +14,14 @@ import re
 
 
 import robin_stocks.robinhood as rh  # type: ignore [import-untyped]
+import ujson as json  # type: ignore[import-untyped]
 from selenium import webdriver
+from selenium.common import WebDriverException
 from selenium.webdriver.common.by import By
 from loguru import logger
 
-from brokers import BASE_PATH, RH_LOGIN, RH_PASSWORD, RH_LOGIN2, RH_PASSWORD2
-from utils.broker import Broker, StockOrder, OptionOrder
+from brokers import BASE_PATH, LIGHTWEIGHT_BROWSER, RH_LOGIN, RH_PASSWORD, RH_LOGIN2, RH_PASSWORD2
+from utils.broker import REPORT_LOCK, Broker, StockOrder, OptionOrder
 from pytz import utc, timezone
 from utils.report.report import (
     OptionReportEntry,
@@ -31,47 +34,69 @@ from utils.report.report import (
     OptionData,
     TwentyFourReportEntry
 )
+from utils.rate_limit import RATE_LIMITER, Priority
+from utils.retry import ORDER_LOOKUP_RETRY, RetryableError, retry
 from utils.util import parse_option_string
+from utils.connections import WARM_UP_SYMBOL
 from utils.selenium_helper import CustomChromeInstance
+from utils.tracing import trace_methods
 from utils.util import convert_date
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
 
+# the buy / sell tabs and the shares dropdown are svg icons
+ALLOWED_URLS = ["*.svg"]
+# the endpoints the stock page itself loads quotes from, 24_5 includes the overnight
+# session's prices
+QUOTES_URL = "https://api.robinhood.com/marketdata/quotes/?bounds=24_5&symbols={symbols}"
+FUNDAMENTALS_URL = "https://api.robinhood.com/fundamentals/?symbols={symbols}"
+# where the web app keeps its oauth token
+AUTH_STORAGE_KEY = "web:auth_state"
+# one quote request covers the whole group's symbols, orders quoted within this many
+# seconds of it are served from it and later ones fetch a new batch
+QUOTE_BATCH_MAX_AGE = 0.5
+
+
+@trace_methods("selenium")
 class Robinhood2(Broker):
     def __init__(self, report_file: Path, broker_name: BrokerNames, option_report_file: Optional[Path] = None):
             
         super().__init__(report_file, broker_name, option_report_file)
         self._broker_name = broker_name
-        self._chrome_inst = CustomChromeInstance()
-        self._chrome_inst.open(
-            "https://robinhood.com/login/"
-        )
+        self._chrome_inst = CustomChromeInstance(name=self.name(), profile=self.name(), lightweight=LIGHTWEIGHT_BROWSER, allowlist=ALLOWED_URLS)
+        # symbols of the group being traded (watch_quotes) and their latest batch
+        self._watched: list[str] = []
+        self._quote_batch: dict[str, StockData] = {}
+        self._batch_time = -math.inf
+        self._quote_lock = threading.Lock()
 
 
     
     def login(self) -> None:
         """
         Enter the username and password into RH site to login!
+        Skipped when the saved browser session is still logged in (order form shows up)
         """
-        time.sleep(3)
-
-        login_input_elem = self._chrome_inst.find(By.XPATH, '//*[@id="react_root"]/div[1]/div[2]/div/div/div[2]/div[2]/div/form/div/div[1]/label/div[2]/input')
+        if self._chrome_inst.resume_session("https://robinhood.com/stocks/SPY", By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form'):
+            return
+        self._chrome_inst.open("https://robinhood.com/login/", "login_page")
+        login_input_elem = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="react_root"]/div[1]/div[2]/div/div/div[2]/div[2]/div/form/div/div[1]/label/div[2]/input', step="login_form")
         self._chrome_inst.sendKeyboardInput(login_input_elem, RH_LOGIN)
-        time.sleep(1)
 
-        password_input_elem = self._chrome_inst.find(By.XPATH, '//*[@id="current-password"]')
+        password_input_elem = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="current-password"]')
         self._chrome_inst.sendKeyboardInput(password_input_elem, RH_PASSWORD)
-        time.sleep(1)
 
-        keep_me_logged_in_button = self._chrome_inst.find(By.XPATH, '//*[@id="react_root"]/div[1]/div[2]/div/div/div[2]/div[2]/div/form/div/div[3]/label/div/div/div')
+        keep_me_logged_in_button = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="react_root"]/div[1]/div[2]/div/div/div[2]/div[2]/div/form/div/div[3]/label/div/div/div')
         keep_me_logged_in_button.click()
-        time.sleep(1)
 
-        login_button = self._chrome_inst.find(By.XPATH, '//*[@id="react_root"]/div[1]/div[2]/div/div/div[2]/div[2]/div/form/footer/div[1]/div[1]/button/span')
+        login_button = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="react_root"]/div[1]/div[2]/div/div/div[2]/div[2]/div/form/footer/div[1]/div[1]/button/span')
+        login_page = self._chrome_inst.url
         login_button.click()
-        time.sleep(5)
+        if not self._chrome_inst.wait_url_change(login_page, timeout=30, step="login"):
+            logger.warning("RH: login page hasn't redirected")
         input("Done logging into Robinhood?")
+        self._chrome_inst.save_cookies()
 
 
 
@@ -240,36 +265,31 @@ class Robinhood2(Broker):
     
     def _place_market_order(self, order: StockOrder, order_type: str):
         # Open Individual Stock Page
-        self._chrome_inst.open(f"https://robinhood.com/stocks/{order.sym}?source=search")
-        time.sleep(5)
+        self._chrome_inst.open(f"https://robinhood.com/stocks/{order.sym}?source=search", "stock_page")
 
 
         # Flip to Sell tab if it's a sell order
         if order_type == "SELL":
-            sell_tab = self._chrome_inst.find(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[1]/div/div[1]/div/div/div[2]')
+            sell_tab = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[1]/div/div[1]/div/div/div[2]', timeout=15, step="stock_page")
             sell_tab.click()
-            time.sleep(1)
+            self._chrome_inst.wait_dom_quiet(step="sell_tab")
 
         # Set to Shares
-        set_to_shares_dropdown_elem = self._chrome_inst.find(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[2]/div/div[2]/div/div/div/div/div')
+        set_to_shares_dropdown_elem = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[2]/div/div[2]/div/div/div/div/div', timeout=15, step="stock_page")
         set_to_shares_dropdown_elem.click()
-        time.sleep(1)
-        shares_dropdown_elem = self._chrome_inst.find(By.XPATH, "//li[contains(@id, '-options-menu-list-option-share')]")
+        shares_dropdown_elem = self._chrome_inst.wait_clickable(By.XPATH, "//li[contains(@id, '-options-menu-list-option-share')]")
         shares_dropdown_elem.click()
-        time.sleep(1)
 
         # Enter # of shares
-        shares_input_elem = self._chrome_inst.find(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[2]/div/div[3]/div/div/div/div/input')
+        shares_input_elem = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[2]/div/div[3]/div/div/div/div/input')
         self._chrome_inst.sendKeyboardInput(shares_input_elem, order.quantity)
-        time.sleep(1)
 
         # Click Review Order button
-        review_order_button = self._chrome_inst.find(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[3]/div/div[2]/div/div/button')
+        review_order_button = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[3]/div/div[2]/div/div/button')
         review_order_button.click()
-        time.sleep(3)
 
         # Click Buy/Sell Button
-        final_button = self._chrome_inst.find(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[3]/div/div[2]/div[1]/div/button')
+        final_button = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[3]/div/div[2]/div[1]/div/button', step="review")
         final_button.click()
 
     def _handle_option_tick_size(self, action: ActionType, price: float) -> float:
@@ -409,27 +429,103 @@ class Robinhood2(Broker):
             )
         return cast(dict, res)
 
+    def get_quotes_web(self, symbols: list[str]) -> dict[str, StockData]:
+        """
+        quotes for all `symbols` in one round trip, fetched from inside the logged in
+        page so no navigation or clicking is needed
+        """
+        joined = ",".join(symbols)
+        quotes, fundamentals = self._chrome_inst.fetch_json(
+            [QUOTES_URL.format(symbols=joined), FUNDAMENTALS_URL.format(symbols=joined)],
+            self._auth_headers(),
+            step="quote_api",
+        )
+        return self.parse_quotes(quotes, fundamentals)
+
+    def warm_up(self) -> None:
+        """the browser keeps its own connections, an in-page quote keeps them open"""
+        self.get_quotes_web([WARM_UP_SYMBOL])
+
+    def _auth_headers(self) -> dict[str, str]:
+        auth_state = self._chrome_inst.local_storage(AUTH_STORAGE_KEY)
+        if not auth_state:
+            return {}
+        token = json.loads(auth_state).get("access_token")
+        return {"Authorization": f"Bearer {token}"} if token else {}
+
+    @staticmethod
+    def parse_quotes(quotes: dict, fundamentals: dict) -> dict[str, StockData]:
+        """
+        StockData per symbol from the quotes and fundamentals responses, the last price
+        is the latest of the overnight, extended and regular trades
+        """
+        volumes = {
+            item["symbol"]: item.get("volume")
+            for item in fundamentals.get("results", [])
+            if item
+        }
+        data = {}
+        for quote in quotes.get("results", []):
+            if not quote:  # unknown symbols come back as null
+                continue
+            if quote.get("ask_price") is None or quote.get("bid_price") is None:
+                # halted or overnight symbols can have no bid / ask, the page is read
+                continue
+            last = (
+                quote.get("last_non_reg_trade_price")
+                or quote.get("last_extended_hours_trade_price")
+                or quote["last_trade_price"]
+            )
+            volume = volumes.get(quote["symbol"])
+            data[quote["symbol"]] = StockData(
+                float(quote["ask_price"]),
+                float(quote["bid_price"]),
+                float(last),
+                float(volume) if volume else 0.0,
+            )
+        return data
+
+    def watch_quotes(self, orders: list[Union[StockOrder, OptionOrder]]) -> None:
+        self._watched = sorted({o.sym for o in orders if isinstance(o, StockOrder)})
+
     def _get_stock_data(self, sym: str) -> StockData:
+        try:
+            return self._batched_quote(sym)
+        except (WebDriverException, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"RH: quote api failed for {sym} ({e}), reading the page")
+        return self._scrape_stock_data(sym)
+
+    def _batched_quote(self, sym: str) -> StockData:
+        """
+        `sym`'s quote from a batch of the watched symbols' quotes, fetched again once
+        it is older than QUOTE_BATCH_MAX_AGE. Concurrent legs wait for the batch in
+        flight instead of sending their own request
+        """
+        with self._quote_lock:
+            age = time.monotonic() - self._batch_time
+            if sym not in self._quote_batch or age > QUOTE_BATCH_MAX_AGE:
+                self._quote_batch = {}
+                self._quote_batch = self.get_quotes_web(sorted({*self._watched, sym}))
+                self._batch_time = time.monotonic()
+            return self._quote_batch[sym]
+
+    def _scrape_stock_data(self, sym: str) -> StockData:
         # Open Page
-        self._chrome_inst.open(f"https://robinhood.com/stocks/{sym}?source=search")
-        time.sleep(3)
+        self._chrome_inst.open(f"https://robinhood.com/stocks/{sym}?source=search", "stock_page")
 
 
         # Set to Shares
-        set_to_shares_dropdown_elem = self._chrome_inst.find(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[2]/div/div[2]/div/div/div/div/div')
+        set_to_shares_dropdown_elem = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="sdp-ticker-symbol-highlight"]/div[1]/form/div[2]/div/div[2]/div/div/div/div/div', timeout=15, step="stock_page")
         set_to_shares_dropdown_elem.click()
-        time.sleep(1)
-        shares_dropdown_elem = self._chrome_inst.find(By.XPATH, "//li[contains(@id, '-options-menu-list-option-share')]")
+        shares_dropdown_elem = self._chrome_inst.wait_clickable(By.XPATH, "//li[contains(@id, '-options-menu-list-option-share')]")
         shares_dropdown_elem.click()
-        time.sleep(1)
 
         # Click button to open up window w/ data
-        set_to_shares_dropdown_elem = self._chrome_inst.find(By.XPATH, "//*[@id='sdp-ticker-symbol-highlight']/div[1]/form/div[2]/div/div[4]//button")
+        set_to_shares_dropdown_elem = self._chrome_inst.wait_clickable(By.XPATH, "//*[@id='sdp-ticker-symbol-highlight']/div[1]/form/div[2]/div/div[4]//button")
         set_to_shares_dropdown_elem.click()
-        time.sleep(1)
 
-        last_sale_data = self._chrome_inst.find(By.XPATH, '//*[@id="equity-order-form-bid-ask-popover"]/div/div/div[3]/div[1]/div[2]/span')
-        last_sale_data_text = last_sale_data.text
+        # the popover fills in once the quote arrives
+        last_sale_data_text = self._chrome_inst.wait_text_stable(By.XPATH, '//*[@id="equity-order-form-bid-ask-popover"]/div/div/div[3]/div[1]/div[2]/span', step="quote")
         price_str, volume_str = last_sale_data_text.split("×")
         last_sale_price = float(price_str.strip().replace("$", ""))
         last_sale_volume = float(volume_str.strip())
@@ -747,7 +843,7 @@ class Robinhood2(Broker):
         market_hours_flag = self.get_correct_market_flag()
 
         # Open Individual Stock Page
-        self._chrome_inst.open(f"https://robinhood.com/stocks/{symbol}?source=search")
+        self._chrome_inst.open(f"https://robinhood.com/stocks/{symbol}?source=search", "stock_page")
         time.sleep(4)
 
         ask_price, limit_price = self.put_in_order_web(market_hours_flag, "BUY")
@@ -792,7 +888,7 @@ class Robinhood2(Broker):
         # limit_price = round(bid_price * 0.98, 2)
         
         # Open Individual Stock Page
-        self._chrome_inst.open(f"https://robinhood.com/stocks/{symbol}?source=search")
+        self._chrome_inst.open(f"https://robinhood.com/stocks/{symbol}?source=search", "stock_page")
         time.sleep(4)
 
         # Flip to Sell tab if it's a sell order
@@ -966,7 +1062,7 @@ class Robinhood2(Broker):
         # write to report file
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
 
@@ -979,7 +1075,7 @@ class Robinhood2(Broker):
     sell
     '''
     def get_price_and_execution_time_web(self):
-        self._chrome_inst.open(f"https://robinhood.com/account/history")
+        self._chrome_inst.open(f"https://robinhood.com/account/history", "history_page")
         time.sleep(4)
 
         items = self._chrome_inst._driver.find_elements(By.XPATH, "(//*[normalize-space()='Recent']/following::div[@data-testid='activity-item'])[position() <= 2]")
@@ -1057,13 +1153,26 @@ class Robinhood2(Broker):
         # write to report file
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
 
 # =================================================================================================================
 
 
+    @retry(ORDER_LOOKUP_RETRY, op="order_info")
+    def _get_executed_order(self, order_id: str) -> dict:
+        """
+        order info once robinhood reports an execution for it, robin_stocks returns
+        None when the request itself fails
+        """
+        RATE_LIMITER.acquire(self.name(), Priority.CONFIRM)
+        order_data = rh.get_stock_order_info(order_id)
+        if not order_data or not order_data.get("executions"):
+            raise RetryableError(f"no executions for order {order_id} yet")
+        return cast(dict, order_data)
+
+
     '''
     Creates report entry objects
     Requires the trade id in order to pull price and execution time from API
@@ -1072,16 +1181,11 @@ class Robinhood2(Broker):
     '''
     def create_24_hour_report_entry(self, order_id, symbol, action, submit_time, ask_price, bid_price, limit_price):
 
-        time.sleep(1)
-        order_data = rh.get_stock_order_info(order_id)
+        order_data = self._get_executed_order(order_id)
 
         # print(order_data)
         # logger.info("Before error points")
 
-        # if can't pull execution data, try again!
-        if len(order_data['executions']) == 0:
-            time.sleep(2)
-            order_data = rh.get_stock_order_info(order_id)
         price = str(round(float(order_data['executions'][0]['price']), 2))          # get price
 
         # logger.info("In between error points")
@@ -1153,15 +1257,21 @@ class Robinhood2(Broker):
         # write to report file
         date = datetime.now().strftime("%m_%d")
         report_file = BASE_PATH / f"reports/24_hour/24_report_{date}.csv"
-        with report_file.open("a") as file:
+        with REPORT_LOCK, report_file.open("a") as file:
             file.write(str(buy_report_entry))
             file.write(str(sell_report_entry))
 
 # =================================================================================================================
 
     def get_ask_and_bid_price_web(self, symbol):
+        try:
+            quote = self.get_quotes_web([symbol])[symbol]
+            return quote.ask, quote.bid
+        except (WebDriverException, KeyError, TypeError, ValueError) as e:
+            logger.warning(f"RH: quote api failed for {symbol} ({e}), reading the page")
+
         # Open Individual Stock Page
-        self._chrome_inst.open(f"https://robinhood.com/stocks/{symbol}?source=search")
+        self._chrome_inst.open(f"https://robinhood.com/stocks/{symbol}?source=search", "stock_page")
         time.sleep(4)
 
         # Open Order type dropdown
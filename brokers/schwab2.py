@@ -1,17 +1,33 @@
-from datetime import datetime, timedelta
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
 import json
 from pathlib import Path
 import time
-from typing import Any, Optional, cast
+from typing import Any, Optional, Union, cast
+from zoneinfo import ZoneInfo
+import httpx
 from loguru import logger
 from schwab import auth, client
+from schwab.utils import Utils
 from schwab.orders.equities import equity_buy_market, equity_sell_market
 from schwab.orders.options import (  # type: ignore[import-untyped]
     option_buy_to_open_market,
     option_sell_to_close_market,
     OptionSymbol,
 )
-from brokers import SCHWAB_APP_KEY, SCHWAB_APP_SECRET, SCHWAB_TOKEN_PATH, SCHWAB_URI
+from brokers import (
+    SCHWAB_APP_KEY,
+    SCHWAB_APP_SECRET,
+    SCHWAB_BASE_URL,
+    SCHWAB_STREAM_QUOTES,
+    SCHWAB_TOKEN_PATH,
+    SCHWAB_URI,
+)
+from brokers.schwab_stream import QuoteStream
+from utils.async_broker import AsyncBroker
+from utils.base_url import AsyncRedirectTransport, RedirectTransport
+from utils.connections import WARM_UP_SYMBOL, httpx_limits, pool_httpx
 from utils.broker import Broker, OptionOrder, StockOrder
 from utils.report.report import (
     NULL_OPTION_DATA,
@@ -24,39 +40,127 @@ from utils.report.report import (
     ReportEntry,
     StockData,
 )
+from utils.retry import ORDER_LOOKUP_RETRY, QUOTE_RETRY, RetryableError, retry
 from utils.selenium_helper import CustomChromeInstance
 from utils.util import parse_option_string
 
 
+# a refresh token lasts seven days, after that only the manual oauth flow helps
+REFRESH_TOKEN_LIFETIME = timedelta(days=7)
+# most orders the orders endpoint returns per request (its own maximum)
+ORDERS_PAGE_SIZE = 3000
+# the day a trading session belongs to
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+
+class NotExecutedError(RetryableError):
+    """a placed order the broker hasn't reported executions for yet"""
+
+    def __init__(self, order_data: dict) -> None:
+        super().__init__(f"SB order {order_data['orderId']} not executed yet")
+        self.order_data = order_data
+
+
 class Schwab(Broker):
+    # access tokens last 30 minutes
+    SESSION_REFRESH_INTERVAL = 20 * 60
+
     def __init__(
         self,
         report_file: Path,
         broker_name: BrokerNames,
         option_report_file: Optional[Path] = None,
+        base_url: str = SCHWAB_BASE_URL,
+        stream_quotes: bool = SCHWAB_STREAM_QUOTES,
     ):
         super().__init__(report_file, broker_name, option_report_file)
+        self._base_url = base_url
+        self._stream_quotes = stream_quotes
+        self._quote_stream: Optional[QuoteStream] = None
 
+    @retry(QUOTE_RETRY)
     def _get_stock_data(self, sym: str) -> StockData:
-        res = self._client.get_quote(sym).json()[sym]["quote"]
+        streamed = self._streamed_stock_data(sym)
+        if streamed is not None:
+            return streamed
+        response = self._client.get_quote(sym)
+        response.raise_for_status()
+        return self._parse_quote(response.json(), sym)
+
+    @staticmethod
+    def _parse_quote(data: dict, sym: str) -> StockData:
+        res = data[sym]["quote"]
         return StockData(
             res["askPrice"], res["bidPrice"], res["lastPrice"], res["totalVolume"]
         )
 
+    def _streamed_stock_data(self, sym: str) -> Optional[StockData]:
+        if self._quote_stream is None:
+            return None
+        quote = self._quote_stream.stock_data(sym)
+        if quote is None:
+            logger.debug(f"SB no fresh streamed quote for {sym}, using REST")
+            return None
+        logger.debug(f"SB {sym} streamed quote from {quote.quote_time:%X.%f}")
+        return quote.data
+
+    def _streamed_option_data(self, order: OptionOrder) -> Optional[OptionData]:
+        if self._quote_stream is None:
+            return None
+        quote = self._quote_stream.option_data(self._option_symbol(order))
+        if quote is None:
+            logger.debug(f"SB no fresh streamed quote for {order}, using REST")
+            return None
+        logger.debug(f"SB {order} streamed quote from {quote.quote_time:%X.%f}")
+        return cast(OptionData, quote.data)
+
+    def _rate_limited(self, phase: str, *args: Any) -> bool:
+        # quotes the stream can serve don't call the API
+        quoted = phase in ("pre_quote", "post_quote") and bool(args)
+        if not quoted or self._quote_stream is None:
+            return True
+        target = args[0]
+        if isinstance(target, OptionOrder):
+            quote = self._quote_stream.option_data(self._option_symbol(target))
+        else:
+            quote = self._quote_stream.stock_data(target)
+        return quote is None
+
+    def watch_quotes(self, orders: list[Union[StockOrder, OptionOrder]]) -> None:
+        if self._quote_stream is None:
+            return
+        equities = sorted({o.sym for o in orders if isinstance(o, StockOrder)})
+        options = sorted(
+            {self._option_symbol(o) for o in orders if isinstance(o, OptionOrder)}
+        )
+        self._quote_stream.subscribe(equities, options)
+
     def _get_option_data(self, order: OptionOrder) -> OptionData:
+        streamed = self._streamed_option_data(order)
+        if streamed is not None:
+            return streamed
+        option_data = self._client.get_option_chain(
+            order.sym, **self._option_chain_params(order)
+        ).json()
+        return self._parse_option_chain(option_data, order)
+
+    @staticmethod
+    def _option_chain_params(order: OptionOrder) -> dict:
         contract_type = (
             client.Client.Options.ContractType.CALL
             if order.option_type == OptionType.CALL
             else client.Client.Options.ContractType.PUT
         )
         date = datetime.strptime(order.expiration, "%Y-%m-%d")
-        option_data = self._client.get_option_chain(
-            order.sym,
-            contract_type=contract_type,
-            strike=order.strike,
-            from_date=date,
-            to_date=date,
-        ).json()
+        return {
+            "contract_type": contract_type,
+            "strike": order.strike,
+            "from_date": date,
+            "to_date": date,
+        }
+
+    @staticmethod
+    def _parse_option_chain(option_data: dict, order: OptionOrder) -> OptionData:
         if order.option_type == OptionType.CALL:
             possibilities = option_data["callExpDateMap"]
         else:
@@ -80,27 +184,79 @@ class Schwab(Broker):
                     )
         return NULL_OPTION_DATA
 
-    def _get_latest_order(self) -> dict:
-        return cast(
-            dict,
-            self._client.get_orders_for_account(
-                self._hash,
-                from_entered_datetime=datetime.now(),
-                to_entered_datetime=datetime.now() + timedelta(1),
-            ).json()[0],
-        )
+    @retry(ORDER_LOOKUP_RETRY, op="order_info")
+    def _get_order_data(self, order_id: int) -> dict:
+        response = self._client.get_order(order_id, self._hash)
+        response.raise_for_status()
+        return self._executed_order(response.json())
+
+    @staticmethod
+    def _executed_order(order_data: dict) -> dict:
+        if not order_data.get("orderActivityCollection"):
+            raise NotExecutedError(order_data)
+        return order_data
+
+    def _order_data(self, order_id: int) -> dict:
+        """
+        the executed order, or the order without executions when it still hasn't
+        executed after ORDER_LOOKUP_RETRY, so the placed order is reported either way
+        """
+        try:
+            return self._get_order_data(order_id)
+        except NotExecutedError as e:
+            logger.warning(f"{e}, reporting it without executions")
+            return e.order_data
+
+    @staticmethod
+    def _placed_order_id(response: httpx.Response, account_hash: str) -> int:
+        """
+        the id of a placed order, from the Location header of the response
+        """
+        order_id = Utils(None, account_hash).extract_order_id(response)
+        if order_id is None:
+            raise ValueError(f"SB order response without an order id: {response}")
+        return cast(int, order_id)
 
     def login(self) -> None:
-        try:
-            self._client = auth.client_from_token_file(
-                SCHWAB_TOKEN_PATH, SCHWAB_APP_KEY, SCHWAB_APP_SECRET
-            )
-        except:
-            self._client = auth.client_from_manual_flow(
-                SCHWAB_APP_KEY, SCHWAB_APP_SECRET, SCHWAB_URI, SCHWAB_TOKEN_PATH
+        if self._base_url:
+            # local stand-in server, no oauth token needed
+            self._client = client.Client(
+                SCHWAB_APP_KEY,
+                httpx.Client(
+                    transport=RedirectTransport(self._base_url, limits=httpx_limits())
+                ),
             )
+        else:
+            try:
+                self._client = auth.client_from_token_file(
+                    SCHWAB_TOKEN_PATH, SCHWAB_APP_KEY, SCHWAB_APP_SECRET
+                )
+            except:
+                self._client = auth.client_from_manual_flow(
+                    SCHWAB_APP_KEY, SCHWAB_APP_SECRET, SCHWAB_URI, SCHWAB_TOKEN_PATH
+                )
+            pool_httpx(self._client.session)
+            if self._stream_quotes and self._quote_stream is None:
+                self._quote_stream = QuoteStream(self._client)
+                self._quote_stream.start()
         self._hash = self._client.get_account_numbers().json()[0]["hashValue"]
 
+    def warm_up(self) -> None:
+        self._client.get_quote(WARM_UP_SYMBOL).raise_for_status()
+
+    def refresh_session(self) -> None:
+        if self._client.token_metadata:
+            # writes the new token to SCHWAB_TOKEN_PATH through schwab-py's hook
+            self._client.session.refresh_token(auth.TOKEN_ENDPOINT)
+        self.warm_up()
+
+    def session_expires(self) -> Optional[datetime]:
+        metadata = self._client.token_metadata
+        if not metadata:
+            return None
+        created = datetime.fromtimestamp(metadata.creation_timestamp, timezone.utc)
+        return created + REFRESH_TOKEN_LIFETIME
+
     def buy(self, order: StockOrder) -> None:
         ### PRE BUY INFO ###
         pre_stock_data = self._get_stock_data(order.sym)
@@ -108,9 +264,9 @@ class Schwab(Broker):
 
         ### BUY ###
         if order.order_type == OrderType.MARKET:
-            self._market_buy(order)
+            order_id = self._market_buy(order)
         else:
-            self._limit_buy(order)
+            order_id = self._limit_buy(order)
 
         ### POST BUY INFO ###
         program_executed = self._get_current_time()
@@ -124,6 +280,7 @@ class Schwab(Broker):
             program_submitted,
             pre_stock_data,
             post_stock_data,
+            order_id=order_id,
         )
 
     def sell(self, order: StockOrder) -> None:
@@ -133,9 +290,9 @@ class Schwab(Broker):
 
         ### BUY ###
         if order.order_type == OrderType.MARKET:
-            self._market_sell(order)
+            order_id = self._market_sell(order)
         else:
-            self._limit_sell(order)
+            order_id = self._limit_sell(order)
 
         ### POST BUY INFO ###
         program_executed = self._get_current_time()
@@ -149,6 +306,7 @@ class Schwab(Broker):
             program_submitted,
             pre_stock_data,
             post_stock_data,
+            order_id=order_id,
         )
 
     def buy_option(self, order: OptionOrder) -> None:
@@ -158,9 +316,9 @@ class Schwab(Broker):
 
         ### BUY ###
         if order.option_type == OptionType.CALL:
-            self._buy_call_option(order)
+            order_id = self._buy_call_option(order)
         else:
-            self._buy_put_option(order)
+            order_id = self._buy_put_option(order)
 
         ### POST BUY INFO ###
         program_executed = self._get_current_time()
@@ -173,6 +331,7 @@ class Schwab(Broker):
             program_submitted,
             pre_stock_data,
             post_stock_data,
+            order_id=order_id,
         )
         time.sleep(1)
 
@@ -183,9 +342,9 @@ class Schwab(Broker):
 
         ### SELL ###
         if order.option_type == OptionType.CALL:
-            self._sell_call_option(order)
+            order_id = self._sell_call_option(order)
         else:
-            self._sell_put_option(order)
+            order_id = self._sell_put_option(order)
 
         ### POST SELL INFO ###
         program_executed = self._get_current_time()
@@ -198,52 +357,62 @@ class Schwab(Broker):
             program_submitted,
             pre_stock_data,
             post_stock_data,
+            order_id=order_id,
         )
         time.sleep(1)
 
-    def _market_buy(self, order: StockOrder) -> None:
-        self._client.place_order(
+    def _market_buy(self, order: StockOrder) -> int:
+        response = self._client.place_order(
             self._hash, equity_buy_market(order.sym, order.quantity)
         )
+        return self._placed_order_id(response, self._hash)
 
-    def _market_sell(self, order: StockOrder) -> None:
-        self._client.place_order(
+    def _market_sell(self, order: StockOrder) -> int:
+        response = self._client.place_order(
             self._hash, equity_sell_market(order.sym, order.quantity)
         )
+        return self._placed_order_id(response, self._hash)
 
-    def _limit_buy(self, order: StockOrder) -> None:
+    def _limit_buy(self, order: StockOrder) -> int:
         raise NotImplementedError
 
-    def _limit_sell(self, order: StockOrder) -> None:
+    def _limit_sell(self, order: StockOrder) -> int:
         raise NotImplementedError
 
-    def _buy_call_option(self, order: OptionOrder) -> None:
-        sym = OptionSymbol(
-            order.sym,
-            datetime.strptime(order.expiration, "%Y-%m-%d"),
-            "C",
-            str(order.strike),
-        ).build()
-        self._client.place_order(
-            self._hash, option_buy_to_open_market(sym, order.quantity)
+    @staticmethod
+    def _option_symbol(order: OptionOrder) -> str:
+        return cast(
+            str,
+            OptionSymbol(
+                order.sym,
+                datetime.strptime(order.expiration, "%Y-%m-%d"),
+                "C" if order.option_type == OptionType.CALL else "P",
+                str(order.strike),
+            ).build(),
         )
 
-    def _sell_call_option(self, order: OptionOrder) -> None:
-        sym = OptionSymbol(
-            order.sym,
-            datetime.strptime(order.expiration, "%Y-%m-%d"),
-            "C",
-            str(order.strike),
-        ).build()
+    @staticmethod
+    def _call_symbol(order: OptionOrder) -> str:
+        return Schwab._option_symbol(replace(order, option_type=OptionType.CALL))
 
-        self._client.place_order(
-            self._hash, option_sell_to_close_market(sym, 1).build()
+    def _buy_call_option(self, order: OptionOrder) -> int:
+        response = self._client.place_order(
+            self._hash,
+            option_buy_to_open_market(self._call_symbol(order), order.quantity),
         )
+        return self._placed_order_id(response, self._hash)
 
-    def _buy_put_option(self, order: OptionOrder) -> None:
+    def _sell_call_option(self, order: OptionOrder) -> int:
+        response = self._client.place_order(
+            self._hash,
+            option_sell_to_close_market(self._call_symbol(order), 1).build(),
+        )
+        return self._placed_order_id(response, self._hash)
+
+    def _buy_put_option(self, order: OptionOrder) -> int:
         raise NotImplementedError
 
-    def _sell_put_option(self, order: OptionOrder) -> None:
+    def _sell_put_option(self, order: OptionOrder) -> int:
         raise NotImplementedError
 
     def get_current_positions(self) -> tuple[list[StockOrder], list[OptionOrder]]:
@@ -281,6 +450,43 @@ class Schwab(Broker):
 
         return current_positions, current_option_positions
 
+    @retry(ORDER_LOOKUP_RETRY, op="day_orders")
+    def get_day_orders(
+        self, date: datetime, page_size: int = ORDERS_PAGE_SIZE
+    ) -> list[dict]:
+        """
+        every order entered on the given day with its executions, newest first. The
+        endpoint has no cursor, a full page is followed by the orders entered up to the
+        oldest one on it (orders of that second come back twice and are dropped)
+        """
+        start = datetime(date.year, date.month, date.day, tzinfo=MARKET_TIMEZONE)
+        end = start + timedelta(days=1)
+        start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+        orders: dict[int, dict] = {}
+        while True:
+            response = self._client.get_orders_for_account(
+                self._hash,
+                max_results=page_size,
+                from_entered_datetime=start,
+                to_entered_datetime=end,
+            )
+            response.raise_for_status()
+            page = response.json()
+            orders.update((order["orderId"], order) for order in page)
+            if len(page) < page_size:
+                break
+            oldest = min(
+                datetime.strptime(order["enteredTime"], "%Y-%m-%dT%H:%M:%S%z")
+                for order in page
+            )
+            if oldest == end:
+                # a whole page within one second, whatever else was entered in it
+                # can't be reached
+                logger.warning(f"SB orders entered at {end} may be missing")
+                oldest -= timedelta(seconds=1)
+            end = oldest
+        return list(orders.values())
+
     def _save_report(
         self,
         sym: str,
@@ -291,14 +497,37 @@ class Schwab(Broker):
         post_stock_data: StockData,
         **kwargs: Any,
     ) -> None:
-        order_data = self._get_latest_order()
+        self._report_order(
+            self._order_data(kwargs["order_id"]),
+            sym,
+            action_type,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+    @staticmethod
+    def _executed_time(activity: dict) -> str:
+        SB_ct = activity["executionLegs"][0]["time"][11:]
+        SB_ct_hour = str(int(SB_ct[:2]) - 7)
+        if len(SB_ct_hour) == 1:
+            SB_ct_hour = "0" + SB_ct_hour
+        return SB_ct_hour + SB_ct[2:-5]
+
+    def _report_order(
+        self,
+        order_data: dict,
+        sym: str,
+        action_type: ActionType,
+        program_submitted: str,
+        program_executed: str,
+        pre_stock_data: StockData,
+        post_stock_data: StockData,
+    ) -> None:
         try:
-            for activity in order_data["orderActivityCollection"]:
-                SB_ct = activity["executionLegs"][0]["time"][11:]
-                SB_ct_hour = str(int(SB_ct[:2]) - 7)
-                if len(SB_ct_hour) == 1:
-                    SB_ct_hour = "0" + SB_ct_hour
-                broker_executed = SB_ct_hour + SB_ct[2:-5]
+            for activity in order_data.get("orderActivityCollection", []):
+                broker_executed = self._executed_time(activity)
 
                 self._add_report_to_file(
                     ReportEntry(
@@ -320,6 +549,28 @@ class Schwab(Broker):
                         order_data["destinationLinkName"],
                     )
                 )
+            if not order_data.get("orderActivityCollection"):
+                # not executed in time, the execution is left to the reconciliation
+                self._add_report_to_file(
+                    ReportEntry(
+                        program_submitted,
+                        program_executed,
+                        None,
+                        sym,
+                        action_type,
+                        order_data.get("quantity", 0),
+                        None,
+                        None,
+                        pre_stock_data,
+                        post_stock_data,
+                        OrderType.MARKET,
+                        False,
+                        order_data["orderId"],
+                        None,
+                        BrokerNames.SB,
+                        order_data.get("destinationLinkName", ""),
+                    )
+                )
 
             self._save_report_to_file()
         except:
@@ -334,16 +585,31 @@ class Schwab(Broker):
         program_executed: str,
         pre_stock_data: OptionData,
         post_stock_data: OptionData,
-        **kwargs: str,
+        **kwargs: Any,
+    ) -> None:
+        self._report_option_order(
+            self._order_data(kwargs["order_id"]),
+            order,
+            action_type,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+    def _report_option_order(
+        self,
+        order_data: dict,
+        order: OptionOrder,
+        action_type: ActionType,
+        program_submitted: str,
+        program_executed: str,
+        pre_stock_data: OptionData,
+        post_stock_data: OptionData,
     ) -> None:
-        order_data = self._get_latest_order()
         try:
-            for activity in order_data["orderActivityCollection"]:
-                SB_ct = activity["executionLegs"][0]["time"][11:]
-                SB_ct_hour = str(int(SB_ct[:2]) - 7)
-                if len(SB_ct_hour) == 1:
-                    SB_ct_hour = "0" + SB_ct_hour
-                broker_executed = SB_ct_hour + SB_ct[2:-5]
+            for activity in order_data.get("orderActivityCollection", []):
+                broker_executed = self._executed_time(activity)
 
                 self._add_option_report_to_file(
                     OptionReportEntry(
@@ -366,6 +632,28 @@ class Schwab(Broker):
                         BrokerNames.SB,
                     )
                 )
+            if not order_data.get("orderActivityCollection"):
+                self._add_option_report_to_file(
+                    OptionReportEntry(
+                        program_submitted,
+                        program_executed,
+                        None,
+                        order.sym,
+                        order.strike,
+                        order.option_type,
+                        order.expiration,
+                        action_type,
+                        order.quantity,
+                        None,
+                        pre_stock_data,
+                        post_stock_data,
+                        OrderType.MARKET,
+                        order_data.get("destinationLinkName"),
+                        order_data["orderId"],
+                        None,
+                        BrokerNames.SB,
+                    )
+                )
 
             self._save_option_report_to_file()
         except:
@@ -373,6 +661,223 @@ class Schwab(Broker):
             logger.error(order_data)
 
 
+class AsyncSchwab(AsyncBroker):
+    """
+    Schwab on schwab-py's asyncio client, the orders of a group share one connection
+    pool instead of a thread each. The wrapped Schwab is logged in as well, it builds
+    the report rows and serves everything off the hot path (positions, staging)
+    """
+
+    def __init__(self, broker: Schwab) -> None:
+        self._broker = broker
+
+    def name(self) -> str:
+        return self._broker.name()
+
+    def _rate_limited(self, phase: str, *args: Any) -> bool:
+        return self._broker._rate_limited(phase, *args)
+
+    async def login(self) -> None:
+        await asyncio.to_thread(self._broker.login)
+        base_url = self._broker._base_url
+        if base_url:
+            self._client = client.AsyncClient(
+                SCHWAB_APP_KEY,
+                httpx.AsyncClient(
+                    transport=AsyncRedirectTransport(base_url, limits=httpx_limits())
+                ),
+            )
+        else:
+            self._client = auth.client_from_token_file(
+                SCHWAB_TOKEN_PATH, SCHWAB_APP_KEY, SCHWAB_APP_SECRET, asyncio=True
+            )
+            pool_httpx(self._client.session)
+        self._hash = self._broker._hash
+
+    async def warm_up(self) -> None:
+        (await self._client.get_quote(WARM_UP_SYMBOL)).raise_for_status()
+
+    @retry(QUOTE_RETRY)
+    async def _get_stock_data(self, sym: str) -> StockData:
+        streamed = self._broker._streamed_stock_data(sym)
+        if streamed is not None:
+            return streamed
+        response = await self._client.get_quote(sym)
+        response.raise_for_status()
+        return Schwab._parse_quote(response.json(), sym)
+
+    async def _get_option_data(self, order: OptionOrder) -> OptionData:
+        streamed = self._broker._streamed_option_data(order)
+        if streamed is not None:
+            return streamed
+        response = await self._client.get_option_chain(
+            order.sym, **Schwab._option_chain_params(order)
+        )
+        return Schwab._parse_option_chain(response.json(), order)
+
+    @retry(ORDER_LOOKUP_RETRY, op="order_info")
+    async def _get_order_data(self, order_id: int) -> dict:
+        response = await self._client.get_order(order_id, self._hash)
+        response.raise_for_status()
+        return Schwab._executed_order(response.json())
+
+    async def _order_data(self, order_id: int) -> dict:
+        """see Schwab._order_data"""
+        try:
+            return await self._get_order_data(order_id)
+        except NotExecutedError as e:
+            logger.warning(f"{e}, reporting it without executions")
+            return e.order_data
+
+    async def buy(self, order: StockOrder) -> None:
+        pre_stock_data = await self._get_stock_data(order.sym)
+        program_submitted = self._broker._get_current_time()
+
+        if order.order_type != OrderType.MARKET:
+            raise NotImplementedError
+        order_id = await self._market_buy(order)
+
+        program_executed = self._broker._get_current_time()
+        post_stock_data = await self._get_stock_data(order.sym)
+        await self._save_report(
+            order.sym,
+            ActionType.BUY,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+            order_id,
+        )
+
+    async def sell(self, order: StockOrder) -> None:
+        pre_stock_data = await self._get_stock_data(order.sym)
+        program_submitted = self._broker._get_current_time()
+
+        if order.order_type != OrderType.MARKET:
+            raise NotImplementedError
+        order_id = await self._market_sell(order)
+
+        program_executed = self._broker._get_current_time()
+        post_stock_data = await self._get_stock_data(order.sym)
+        await self._save_report(
+            order.sym,
+            ActionType.SELL,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+            order_id,
+        )
+
+    async def buy_option(self, order: OptionOrder) -> None:
+        pre_stock_data = await self._get_option_data(order)
+        program_submitted = self._broker._get_current_time()
+
+        if order.option_type != OptionType.CALL:
+            raise NotImplementedError
+        order_id = await self._buy_call_option(order)
+
+        program_executed = self._broker._get_current_time()
+        post_stock_data = await self._get_option_data(order)
+        await self._save_option_report(
+            order,
+            ActionType.BUY,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+            order_id,
+        )
+        await asyncio.sleep(1)
+
+    async def sell_option(self, order: OptionOrder) -> None:
+        pre_stock_data = await self._get_option_data(order)
+        program_submitted = self._broker._get_current_time()
+
+        if order.option_type != OptionType.CALL:
+            raise NotImplementedError
+        order_id = await self._sell_call_option(order)
+
+        program_executed = self._broker._get_current_time()
+        post_stock_data = await self._get_option_data(order)
+        await self._save_option_report(
+            order,
+            ActionType.SELL,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+            order_id,
+        )
+        await asyncio.sleep(1)
+
+    async def _market_buy(self, order: StockOrder) -> int:
+        response = await self._client.place_order(
+            self._hash, equity_buy_market(order.sym, order.quantity)
+        )
+        return Schwab._placed_order_id(response, self._hash)
+
+    async def _market_sell(self, order: StockOrder) -> int:
+        response = await self._client.place_order(
+            self._hash, equity_sell_market(order.sym, order.quantity)
+        )
+        return Schwab._placed_order_id(response, self._hash)
+
+    async def _buy_call_option(self, order: OptionOrder) -> int:
+        response = await self._client.place_order(
+            self._hash,
+            option_buy_to_open_market(Schwab._call_symbol(order), order.quantity),
+        )
+        return Schwab._placed_order_id(response, self._hash)
+
+    async def _sell_call_option(self, order: OptionOrder) -> int:
+        response = await self._client.place_order(
+            self._hash,
+            option_sell_to_close_market(Schwab._call_symbol(order), 1).build(),
+        )
+        return Schwab._placed_order_id(response, self._hash)
+
+    async def _save_report(
+        self,
+        sym: str,
+        action_type: ActionType,
+        program_submitted: str,
+        program_executed: str,
+        pre_stock_data: StockData,
+        post_stock_data: StockData,
+        order_id: int,
+    ) -> None:
+        self._broker._report_order(
+            await self._order_data(order_id),
+            sym,
+            action_type,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+    async def _save_option_report(
+        self,
+        order: OptionOrder,
+        action_type: ActionType,
+        program_submitted: str,
+        program_executed: str,
+        pre_stock_data: OptionData,
+        post_stock_data: OptionData,
+        order_id: int,
+    ) -> None:
+        self._broker._report_option_order(
+            await self._order_data(order_id),
+            order,
+            action_type,
+            program_submitted,
+            program_executed,
+            pre_stock_data,
+            post_stock_data,
+        )
+
+
 if __name__ == "__main__":
     s = Schwab(Path("temp.csv"), BrokerNames.SB, Path("temp_option.csv"))
     s.login()
@@ -0,0 +1,201 @@
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, Union
+
+from loguru import logger
+from schwab.client import Client
+from schwab.streaming import StreamClient
+
+from utils.report.report import OptionData, StockData
+
+# a stream that has sent nothing (tick or heartbeat) for this long is stale and the
+# quotes come from REST again
+STREAM_MAX_AGE = 5.0
+# seconds before a dropped stream logs in again
+RECONNECT_DELAY = 5.0
+
+EquityFields = StreamClient.LevelOneEquityFields
+OptionFields = StreamClient.LevelOneOptionFields
+EQUITY_FIELDS = [
+    EquityFields.SYMBOL,
+    EquityFields.BID_PRICE,
+    EquityFields.ASK_PRICE,
+    EquityFields.LAST_PRICE,
+    EquityFields.TOTAL_VOLUME,
+    EquityFields.QUOTE_TIME_MILLIS,
+]
+OPTION_FIELDS = [
+    OptionFields.SYMBOL,
+    OptionFields.BID_PRICE,
+    OptionFields.ASK_PRICE,
+    OptionFields.LAST_PRICE,
+    OptionFields.TOTAL_VOLUME,
+    OptionFields.VOLATILITY,
+    OptionFields.DELTA,
+    OptionFields.THETA,
+    OptionFields.GAMMA,
+    OptionFields.VEGA,
+    OptionFields.RHO,
+    OptionFields.UNDERLYING_PRICE,
+    OptionFields.MONEY_INTRINSIC_VALUE,
+    OptionFields.QUOTE_TIME_MILLIS,
+]
+# fields a quote needs before it is served, ticks carry the symbol as their key
+EQUITY_REQUIRED = [field.name for field in EQUITY_FIELDS[1:]]
+OPTION_REQUIRED = [field.name for field in OPTION_FIELDS[1:]]
+
+
+@dataclass
+class StreamedQuote:
+    data: Union[StockData, OptionData]
+    quote_time: datetime  # exchange time of the latest tick
+
+
+class QuoteStream:
+    """
+    level one equity and option quotes from Schwab's streamer, run on a daemon thread
+    with its own event loop. Ticks only carry the fields that changed, the latest value
+    of every field is kept per symbol
+    """
+
+    def __init__(
+        self,
+        api_client: Client,
+        max_age: float = STREAM_MAX_AGE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._client = api_client
+        self._max_age = max_age
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._fields: dict[str, dict[str, Any]] = {}
+        self._equities: list[str] = []
+        self._options: list[str] = []
+        self._last_message: Optional[float] = None
+        self._stream: Optional[StreamClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(
+            target=self._loop.run_forever, name="SB-quote-stream", daemon=True
+        ).start()
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+    def subscribe(self, equities: list[str], options: list[str]) -> None:
+        """
+        replaces the watched symbols (options by their Schwab option symbol), the
+        stream sends a full quote for each right after
+        """
+        with self._lock:
+            self._equities, self._options = equities, options
+            watched = set(equities + options)
+            self._fields = {
+                key: fields for key, fields in self._fields.items() if key in watched
+            }
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._subscribe(), self._loop)
+
+    def stale(self) -> bool:
+        return (
+            self._last_message is None
+            or self._clock() - self._last_message > self._max_age
+        )
+
+    def stock_data(self, sym: str) -> Optional[StreamedQuote]:
+        fields = self._latest(sym, EQUITY_REQUIRED)
+        if fields is None:
+            return None
+        return StreamedQuote(
+            StockData(
+                fields["ASK_PRICE"],
+                fields["BID_PRICE"],
+                fields["LAST_PRICE"],
+                fields["TOTAL_VOLUME"],
+            ),
+            self._quote_time(fields),
+        )
+
+    def option_data(self, symbol: str) -> Optional[StreamedQuote]:
+        fields = self._latest(symbol, OPTION_REQUIRED)
+        if fields is None:
+            return None
+        return StreamedQuote(
+            OptionData(
+                fields["ASK_PRICE"],
+                fields["BID_PRICE"],
+                fields["LAST_PRICE"],
+                fields["TOTAL_VOLUME"],
+                fields["VOLATILITY"],
+                fields["DELTA"],
+                fields["THETA"],
+                fields["GAMMA"],
+                fields["VEGA"],
+                fields["RHO"],
+                round(fields["UNDERLYING_PRICE"], 4),
+                fields["MONEY_INTRINSIC_VALUE"] > 0,
+            ),
+            self._quote_time(fields),
+        )
+
+    @staticmethod
+    def _quote_time(fields: dict[str, Any]) -> datetime:
+        return datetime.fromtimestamp(fields["QUOTE_TIME_MILLIS"] / 1000, timezone.utc)
+
+    def _latest(self, key: str, required: list[str]) -> Optional[dict[str, Any]]:
+        if self.stale():
+            return None
+        with self._lock:
+            fields = self._fields.get(key)
+            if fields is None or any(field not in fields for field in required):
+                return None
+            return dict(fields)
+
+    def _on_quote(self, msg: dict) -> None:
+        self._last_message = self._clock()
+        with self._lock:
+            watched = set(self._equities + self._options)
+            for content in msg.get("content", []):
+                if content.get("key") in watched:
+                    self._fields.setdefault(content["key"], {}).update(content)
+
+    async def _subscribe(self) -> None:
+        stream = self._stream
+        if stream is None:
+            # sent once the stream has logged in
+            return
+        with self._lock:
+            equities, options = self._equities, self._options
+        try:
+            if equities:
+                await stream.level_one_equity_subs(equities, fields=EQUITY_FIELDS)
+            if options:
+                await stream.level_one_option_subs(options, fields=OPTION_FIELDS)
+        except Exception as e:
+            logger.error(f"SB quote stream subscription failed: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                stream = StreamClient(self._client)
+                await stream.login()
+                stream.add_level_one_equity_handler(self._on_quote)
+                stream.add_level_one_option_handler(self._on_quote)
+                self._stream = stream
+                await self._subscribe()
+                logger.info("SB quote stream connected")
+                while True:
+                    await stream.handle_message()
+                    self._last_message = self._clock()
+            except Exception as e:
+                logger.error(f"SB quote stream dropped: {e}")
+            self._stream = None
+            await asyncio.sleep(RECONNECT_DELAY)
@@ -1,8 +1,11 @@
+import asyncio
 import random
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
 from pyexpat import ExpatError
-from typing import Any, Optional, Union, cast
+from typing import Any, Callable, Optional, Union, cast
 from utils.report.report import OptionType, OrderType
 
 import schedule
@@ -16,9 +19,17 @@ from brokers import (
     Schwab,
     Vanguard,
     IBKR,
+    AsyncIBKR,
+    AsyncSchwab,
 )
-from utils.broker import Broker, OptionOrder, StockOrder
+from utils.async_broker import ORDER_CATEGORY, AsyncBroker, ThreadedAsyncBroker
+from utils.broker import Broker, OptionOrder, StagedOrder, StockOrder
+from utils.circuit_breaker import CircuitBreaker, SkippedOrders
 from utils.market_data import MarketData
+from utils.metrics import LATENCY
+from utils.retry import RETRIES
+from utils.session_keeper import SessionKeeper
+from utils.tracing import TRACER, traced
 from utils.program_manager import ProgramManager, SYM_LIST_LEN, SYM_LIST
 from utils.report.post_processing import PostProcessing
 from utils.report.report import ActionType, BrokerNames
@@ -44,6 +55,36 @@ FRAC_BROKERS = ["FD"]
 # OPTN_BROKERS = ["TD", "RH", "E2", "FD", "SB", "VD"]
 OPTN_BROKERS = ["RH", "E2", "FD", "SB", "IF", "VD"]
 
+# seconds before a buy / sell that orders are staged (ticket filled, preview placed)
+STAGE_LEAD = 20
+# seconds before a buy / sell that every broker's connection is warmed up
+WARM_UP_LEAD = 5
+# the stock, fractional and option legs of a group trade at the same time, each broker
+# call runs inside broker.session(<leg>) so a broker only overlaps legs it has
+# separate sessions for
+LEG_WORKERS = 3
+# warm-ups and staging run one broker per worker, off the leg workers so a broker that
+# hangs can't hold up a leg at the trigger
+PREP_WORKERS = 6
+# seconds the scheduler waits for the warm-ups / staging before moving on, a slower
+# broker keeps going on its worker without delaying the trigger
+WARM_UP_TIMEOUT = 3
+STAGE_TIMEOUT = 15
+
+# (brokers, orders, manager key / order category, action) for one _perform_trade
+Leg = tuple[list[str], Union[list[StockOrder], list[OptionOrder]], str, ActionType]
+
+
+def make_async(broker: Broker) -> AsyncBroker:
+    """
+    the broker's native asyncio implementation, brokers without one run on threads
+    """
+    if isinstance(broker, Schwab):
+        return AsyncSchwab(broker)
+    if isinstance(broker, IBKR):
+        return AsyncIBKR(broker)
+    return ThreadedAsyncBroker(broker)
+
 
 class AutomatedTrading:
     def __init__(
@@ -52,6 +93,8 @@ class AutomatedTrading:
         time_between_buy_and_sell: float,
         time_between_groups: float,
         enable_stdout: bool = False,
+        enable_tracing: bool = False,
+        use_asyncio: bool = False,
     ):
         logger.info("Beginning Automated Trading")
 
@@ -64,6 +107,8 @@ class AutomatedTrading:
         self._time_between_groups = time_between_groups
 
         self._manager = ProgramManager(enable_stdout=enable_stdout)
+        if enable_tracing:
+            TRACER.enable(BASE_PATH)
         report_file, option_report_file = (
             self._manager.report_file,
             self._manager.option_report_file,
@@ -80,14 +125,44 @@ class AutomatedTrading:
         ]
 
         self._fractionals = [0.1, 0.25, 0.5, 0.75, 0.9]
+        # orders staged ahead of the next buy / sell, keyed by (broker, action, order)
+        self._staged: dict[tuple[str, ActionType, str], StagedOrder] = {}
+        self._pending_orders: Optional[
+            tuple[list[StockOrder], list[StockOrder], Optional[list[OptionOrder]]]
+        ] = None
+        self._leg_workers = ThreadPoolExecutor(LEG_WORKERS, thread_name_prefix="leg")
+        self._prep_workers = ThreadPoolExecutor(PREP_WORKERS, thread_name_prefix="prep")
+        # brokers that keep failing are skipped for a while, see _allowed
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._skipped = SkippedOrders(BASE_PATH)
+        # with use_asyncio every order of a group is a task on this loop, see
+        # _perform_legs_async
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_brokers: dict[str, AsyncBroker] = {}
+        if use_asyncio:
+            self._loop = asyncio.new_event_loop()
+            # ib_async's blocking calls (IBKR.stage, ...) run on the current loop
+            asyncio.set_event_loop(self._loop)
+            self._async_brokers = {
+                broker.name(): make_async(broker) for broker in self._brokers
+            }
 
         self._login_all()
+        # renews the API tokens in the gaps between jobs, see start
+        self._session_keeper = SessionKeeper(self._brokers)
 
     def _login_all(self) -> None:
-        for broker in self._brokers:
-            broker.login()
+        if self._loop:
+            self._loop.run_until_complete(self._login_all_async())
+        else:
+            for broker in self._brokers:
+                broker.login()
         logger.info("Finished Logging into all brokers...")
 
+    async def _login_all_async(self) -> None:
+        for broker in self._async_brokers.values():
+            await broker.login()
+
     def start(self) -> None:
         '''
         Starts automated trading procedure
@@ -100,6 +175,7 @@ class AutomatedTrading:
         while True:
             try:
                 schedule.run_pending()
+                self._session_keeper.maintain(schedule.idle_seconds())
                 time.sleep(1)
                 if len(schedule.get_jobs()) == 0:
                     logger.info("Finished trading")
@@ -190,6 +266,25 @@ class AutomatedTrading:
             if option:
                 logger.info(self._options_list[option_idx % OPTN_LIST_LEN])
 
+            # Stage the orders shortly before the buy / sell so only the submit is left
+            stage_buy_time = buy_time.replace(second=0) - timedelta(seconds=STAGE_LEAD)
+            self._schedule_ahead(
+                stage_buy_time,
+                self._stage_buy,
+                sym_list=sym_list,
+                options=option,
+                fractional=fractional,
+            )
+            stage_sell_time = sell_time.replace(second=0) - timedelta(
+                seconds=STAGE_LEAD
+            )
+            self._schedule_ahead(stage_sell_time, self._stage_sell)
+            for trigger in (buy_time, sell_time):
+                warm_up_time = trigger.replace(second=0) - timedelta(
+                    seconds=WARM_UP_LEAD
+                )
+                self._schedule_ahead(warm_up_time, self._warm_up_brokers)
+
             # Use Schedule module to schedule + execute buys at buy time
             # UNCOMMENT FOR OPTIONS: need to add options in the parameter here
             schedule.every().day.at(buy_time.strftime("%H:%M")).do(
@@ -215,6 +310,19 @@ class AutomatedTrading:
 
         logger.info("Done scheduling")
 
+    def _schedule_ahead(
+        self, job_time: datetime, job: Callable[..., Any], **kwargs: Any
+    ) -> None:
+        '''
+        Schedules a job that runs ahead of a trigger, unless its time has already
+        passed: schedule would run it tomorrow instead. Without the job the trigger
+        just runs unprepared (unstaged orders, cold connections)
+        '''
+        if job_time <= datetime.now():
+            logger.info(f"Skipping {job.__name__} at {job_time:%X}, already passed")
+            return
+        schedule.every().day.at(job_time.strftime("%H:%M:%S")).do(job, **kwargs)
+
     def manual_override(
         self,
         orders: Union[list[StockOrder], list[OptionOrder]],
@@ -287,6 +395,7 @@ class AutomatedTrading:
         stock_list: list[StockOrder],
         action: ActionType,
         main_program: bool = True,
+        category: str = "STOCKS",
     ) -> None:
         '''
         Function that actually buys or sells the stock for each of the brokers
@@ -295,15 +404,22 @@ class AutomatedTrading:
         for order in stock_list:
             
             for broker in brokers:
+                if not self._allowed(broker, order, action):
+                    continue
                 try:
-                    if action == ActionType.BUY:
-                        broker.buy(order)
-                        time.sleep(1)
-                        # maybe add time.sleep(1) for robinhood error?
-                    else:
-                        broker.sell(order)
-                        time.sleep(1)
+                    staged = self._staged.pop((broker.name(), action, str(order)), None)
+                    with broker.session(category):
+                        if staged:
+                            broker.commit(staged)
+                        elif action == ActionType.BUY:
+                            broker.buy(order)
+                            # maybe add time.sleep(1) for robinhood error?
+                        else:
+                            broker.sell(order)
+                    self._breaker(broker).record_success()
+                    time.sleep(1)
                 except Exception as e:
+                    self._breaker(broker).record_failure()
                     logger.error(e)
                     logger.error(
                         f"{broker.name()} Error {'buying' if action == ActionType.BUY else 'selling'} {order.quantity} '{order.sym}' stocks"
@@ -312,7 +428,7 @@ class AutomatedTrading:
             # Set variables in the manager
             if main_program:
                 if action == ActionType.BUY:
-                    self._manager.set("COMPLETED", self._manager.get("COMPLETED") + 1)
+                    self._manager.increment("COMPLETED")
                 self._manager.set("PREVIOUS_STOCK_NAME", order.sym)
 
     def _perform_option_action(
@@ -321,6 +437,7 @@ class AutomatedTrading:
         orders: list[OptionOrder],
         action: ActionType,
         main_program: bool = True,
+        category: str = "OPTIONS",
     ) -> None:
         '''
         Executed buy or sell for options
@@ -329,42 +446,63 @@ class AutomatedTrading:
         for order in orders:
 
             for broker in brokers:
+                if not self._allowed(broker, order, action):
+                    continue
                 try:
-                    if action == ActionType.OPEN:
-                        broker.buy_option(order)
-                    else:
-                        # hardcoding to fix error where it switches to PUT when selling
-                        logger.info(f"BROKER: {broker.name()}")
-                        logger.info(f"Prior to hardcoded change: {order}")
-                        if order.option_type == OptionType.PUT:
-                            order.option_type = OptionType.CALL
-                        logger.info(f"After hardcoded change: {order}")
-                        broker.sell_option(order)
-                        logger.info("Finished selling option")
+                    staged = self._staged.pop((broker.name(), action, str(order)), None)
+                    with broker.session(category):
+                        if staged:
+                            broker.commit(staged)
+                        elif action == ActionType.OPEN:
+                            broker.buy_option(order)
+                        else:
+                            # hardcoding to fix error where it switches to PUT when selling
+                            logger.info(f"BROKER: {broker.name()}")
+                            logger.info(f"Prior to hardcoded change: {order}")
+                            if order.option_type == OptionType.PUT:
+                                order.option_type = OptionType.CALL
+                            logger.info(f"After hardcoded change: {order}")
+                            broker.sell_option(order)
+                            logger.info("Finished selling option")
+                    self._breaker(broker).record_success()
                 except Exception as e:
+                    self._breaker(broker).record_failure()
                     logger.error(e)
                     logger.error(
                         f"{broker.name()} Error {'buying' if action == ActionType.OPEN else 'selling'} {order}"
                     )
 
             if main_program and action == ActionType.OPEN:
-                self._manager.set(
-                    "COMPLETED_OPTIONS",
-                    self._manager.get("COMPLETED_OPTIONS") + 1,
-                )
+                self._manager.increment("COMPLETED_OPTIONS")
 
-    def _buy_across_brokers(
+    def _breaker(self, broker: Union[Broker, AsyncBroker]) -> CircuitBreaker:
+        breaker = self._breakers.get(broker.name())
+        if breaker is None:
+            breaker = CircuitBreaker(broker.name())
+            breaker = self._breakers.setdefault(broker.name(), breaker)
+        return breaker
+
+    def _allowed(
         self,
-        sym_list: list[str],
-        options: list[OptionOrder],
-        fractional: float,
-    ) -> Any:
+        broker: Union[Broker, AsyncBroker],
+        order: Union[StockOrder, OptionOrder],
+        action: ActionType,
+    ) -> bool:
         '''
-        Buys the specified equities, fractionals, and options across all brokers
+        False (and the order recorded as skipped) while the broker's circuit is open
         '''
+        breaker = self._breaker(broker)
+        if breaker.allow():
+            return True
+        self._staged.pop((broker.name(), action, str(order)), None)
+        self._skipped.record(
+            broker.name(), order, action, f"circuit {breaker.state.value}"
+        )
+        return False
 
-        self._manager.set("STATUS", "Buy")
-
+    def _buy_orders(
+        self, sym_list: list[str], fractional: float
+    ) -> tuple[list[StockOrder], list[StockOrder]]:
         # Orders list
         orders = [
             StockOrder(sym, *MarketData.get_stock_amount(sym)) for sym in sym_list
@@ -376,24 +514,202 @@ class AutomatedTrading:
             for order in orders
             if order.price >= 20
         ]
+        return orders, frac_orders
+
+    @traced(cat="job")
+    def _stage_buy(
+        self,
+        sym_list: list[str],
+        options: Optional[list[OptionOrder]],
+        fractional: float,
+    ) -> Any:
+        '''
+        Works out the next buy's orders and stages them on the brokers that support it
+        '''
+        orders, frac_orders = self._buy_orders(sym_list, fractional)
+        self._pending_orders = (orders, frac_orders, options)
+
+        self._watch_quotes([*orders, *(options or [])])
+        legs: list[Leg] = [
+            (EQUITY_BROKERS, orders, "STOCKS", ActionType.BUY),
+            (FRAC_BROKERS, frac_orders, "FRACTIONALS", ActionType.BUY),
+        ]
+        if options:
+            legs.append((OPTN_BROKERS, options, "OPTIONS", ActionType.OPEN))
+        self._stage_legs(legs)
+        return schedule.CancelJob
+
+    def _watch_quotes(self, orders: list[Union[StockOrder, OptionOrder]]) -> None:
+        '''
+        lets brokers that stream quotes subscribe to the group's symbols before the
+        buy, they stay subscribed through the sell
+        '''
+        names = set(EQUITY_BROKERS + FRAC_BROKERS + OPTN_BROKERS)
+        for broker in self._choose_brokers(sorted(names)):
+            try:
+                broker.watch_quotes(orders)
+            except Exception as e:
+                logger.error(f"{broker.name()} Error watching quotes: {e}")
+
+    @traced(cat="job")
+    def _stage_sell(self) -> Any:
+        legs: list[Leg] = [
+            (
+                EQUITY_BROKERS,
+                parse_stock_list(self._manager.get("STOCKS")),
+                "STOCKS",
+                ActionType.SELL,
+            ),
+            (
+                FRAC_BROKERS,
+                parse_stock_list(self._manager.get("FRACTIONALS")),
+                "FRACTIONALS",
+                ActionType.SELL,
+            ),
+        ]
+        option_order = parse_option_list(self._manager.get("OPTIONS"))
+        if option_order:
+            legs.append((OPTN_BROKERS, option_order, "OPTIONS", ActionType.CLOSE))
+        self._stage_legs(legs)
+        return schedule.CancelJob
+
+    @traced(cat="job")
+    def _warm_up_brokers(self) -> Any:
+        '''
+        Opens (or keeps open) each trading broker's API connection right before a
+        trigger, the time each takes is recorded as the warm_up phase
+        '''
+        names = set(EQUITY_BROKERS + FRAC_BROKERS + OPTN_BROKERS)
+        if self._loop:
+            self._loop.run_until_complete(
+                asyncio.gather(
+                    *(
+                        self._warm_up_async(broker)
+                        for broker in self._as_async(sorted(names))
+                    )
+                )
+            )
+            return schedule.CancelJob
+        brokers = self._choose_brokers(sorted(names))
+        calls = [(broker, self._warm_up, ()) for broker in brokers]
+        self._run_prep(calls, WARM_UP_TIMEOUT, "warm up")
+        return schedule.CancelJob
+
+    def _warm_up(self, broker: Broker) -> None:
+        try:
+            with broker.session("STOCKS"):
+                broker.warm_up()
+        except Exception as e:
+            logger.error(f"{broker.name()} Error warming up: {e}")
+
+    async def _warm_up_async(self, broker: AsyncBroker) -> None:
+        try:
+            await asyncio.wait_for(broker.warm_up(), WARM_UP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"{broker.name()} warm up didn't finish in time")
+        except Exception as e:
+            logger.error(f"{broker.name()} Error warming up: {e}")
+
+    def _run_prep(
+        self,
+        calls: list[tuple[Broker, Callable[..., Any], tuple]],
+        timeout: float,
+        step: str,
+    ) -> list[Any]:
+        '''
+        Runs each (broker, func, args) call on the prep workers, or on this thread for
+        main thread only brokers, and returns the results of the calls that finished
+        within `timeout`
+        '''
+        futures: dict[Future, Broker] = {}
+        results = []
+        for broker, func, args in calls:
+            if not broker.MAIN_THREAD_ONLY:
+                futures[self._prep_workers.submit(func, broker, *args)] = broker
+        for broker, func, args in calls:
+            if broker.MAIN_THREAD_ONLY:
+                results.append(func(broker, *args))
+        done, late = wait(futures, timeout=timeout)
+        for future in late:
+            logger.warning(f"{futures[future].name()} {step} didn't finish in time")
+        results.extend(future.result() for future in done)
+        return results
+
+    def _stage_legs(self, legs: list[Leg]) -> None:
+        '''
+        Stages the orders of every leg, a failed or late stage only means the order is
+        placed in full later
+        '''
+        calls = [
+            (broker, self._stage_orders, (orders, key, action))
+            for brokers_str, orders, key, action in legs
+            for broker in self._choose_brokers(brokers_str)
+        ]
+        for staged_orders in self._run_prep(calls, STAGE_TIMEOUT, "staging"):
+            self._staged.update(staged_orders)
+        logger.info(f"Staged {len(self._staged)} orders")
+
+    def _stage_orders(
+        self,
+        broker: Broker,
+        orders: Union[list[StockOrder], list[OptionOrder]],
+        key: str,
+        action: ActionType,
+    ) -> dict[tuple[str, ActionType, str], StagedOrder]:
+        staged_orders = {}
+        for order in orders:
+            try:
+                with broker.session(key):
+                    staged = broker.stage(order, action)
+            except Exception as e:
+                logger.error(f"{broker.name()} Error staging {order}: {e}")
+                continue
+            if staged.data:
+                staged_orders[(broker.name(), action, str(order))] = staged
+        return staged_orders
+
+    @traced(cat="job")
+    def _buy_across_brokers(
+        self,
+        sym_list: list[str],
+        options: list[OptionOrder],
+        fractional: float,
+    ) -> Any:
+        '''
+        Buys the specified equities, fractionals, and options across all brokers
+        '''
+
+        self._manager.set("STATUS", "Buy")
+
+        if self._pending_orders:
+            orders, frac_orders, _ = self._pending_orders
+            self._pending_orders = None
+        else:
+            orders, frac_orders = self._buy_orders(sym_list, fractional)
 
         # Perform buys
         logger.info(options)
         logger.info("Currently Buying")
-        self._perform_trade(EQUITY_BROKERS, orders, "STOCKS", ActionType.BUY)
-        self._perform_trade(FRAC_BROKERS, frac_orders, "FRACTIONALS", ActionType.BUY,)
+        legs: list[Leg] = [
+            (EQUITY_BROKERS, orders, "STOCKS", ActionType.BUY),
+            (FRAC_BROKERS, frac_orders, "FRACTIONALS", ActionType.BUY),
+        ]
 
         # UNCOMMENT FOR OPTIONS
         if options:
             logger.info("About to buy options")
-            self._perform_trade(OPTN_BROKERS, options, "OPTIONS", ActionType.OPEN)
-            logger.info("Bought options")
+            legs.append((OPTN_BROKERS, options, "OPTIONS", ActionType.OPEN))
         else:
             self._manager.set("OPTIONS", [])
+        self._perform_legs(legs)
 
+        self._staged.clear()
         logger.info("Done Buying...\n")
+        LATENCY.export("buy", BASE_PATH)
+        RETRIES.export(BASE_PATH)
         return schedule.CancelJob
 
+    @traced(cat="job")
     def _sell_across_brokers(self) -> Any:
         self._manager.set("STATUS", "Sell")
 
@@ -401,13 +717,10 @@ class AutomatedTrading:
         frac_orders = parse_stock_list(self._manager.get("FRACTIONALS"))
 
         logger.info("Currently Selling")
-        self._perform_trade(EQUITY_BROKERS, orders, "STOCKS", ActionType.SELL)
-        self._perform_trade(
-            FRAC_BROKERS,
-            frac_orders,
-            "FRACTIONALS",
-            ActionType.SELL,
-        )
+        legs: list[Leg] = [
+            (EQUITY_BROKERS, orders, "STOCKS", ActionType.SELL),
+            (FRAC_BROKERS, frac_orders, "FRACTIONALS", ActionType.SELL),
+        ]
 
         # UNCOMMENT FOR OPTIONS
         option_order = parse_option_list(self._manager.get("OPTIONS"))
@@ -415,12 +728,124 @@ class AutomatedTrading:
         if option_order:
             logger.info("About to sell options")
             logger.info(f"OPTIONS: {option_order}")
-            self._perform_trade(OPTN_BROKERS, option_order, "OPTIONS", ActionType.CLOSE)
-            logger.info("Bought options")
+            legs.append((OPTN_BROKERS, option_order, "OPTIONS", ActionType.CLOSE))
+        self._perform_legs(legs)
 
+        self._staged.clear()
         logger.info("Done Selling...\n")
+        LATENCY.export("sell", BASE_PATH)
+        RETRIES.export(BASE_PATH)
         return schedule.CancelJob
 
+    def _perform_legs(self, legs: list[Leg]) -> None:
+        '''
+        Performs the legs of a group at the same time, legs with a main thread only
+        broker run on this thread while the others run on the leg workers
+        '''
+        if self._loop:
+            self._loop.run_until_complete(self._perform_legs_async(legs))
+            return
+        main_legs, futures = [], []
+        for leg in legs:
+            if any(broker.MAIN_THREAD_ONLY for broker in self._choose_brokers(leg[0])):
+                main_legs.append(leg)
+            else:
+                futures.append(self._leg_workers.submit(self._perform_trade, *leg))
+        for leg in main_legs:
+            self._perform_trade(*leg)
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(e)
+
+    def _as_async(self, brokers_str: Optional[list[str]]) -> list[AsyncBroker]:
+        return [
+            self._async_brokers[broker.name()]
+            for broker in self._choose_brokers(brokers_str)
+        ]
+
+    async def _perform_legs_async(self, legs: list[Leg]) -> None:
+        '''
+        Every order of every leg is its own task, so all of a group's broker calls are
+        in flight together. Brokers on threads still run one call per category at a
+        time and the rate limits still apply
+        '''
+        tasks = []
+        for brokers_str, orders, key, action in legs:
+            self._start_leg(orders, key, action)
+            brokers = self._as_async(brokers_str)
+            tasks += [
+                self._perform_order_async(brokers, order, key, action)
+                for order in orders
+            ]
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(result)
+
+    async def _perform_order_async(
+        self,
+        brokers: list[AsyncBroker],
+        order: Union[StockOrder, OptionOrder],
+        key: str,
+        action: ActionType,
+    ) -> None:
+        ORDER_CATEGORY.set(key)
+        if isinstance(order, OptionOrder) and action == ActionType.CLOSE:
+            # hardcoding to fix error where it switches to PUT when selling
+            order.option_type = OptionType.CALL
+        await asyncio.gather(
+            *(self._submit_async(broker, order, action) for broker in brokers)
+        )
+
+        if isinstance(order, StockOrder):
+            if action == ActionType.BUY:
+                self._manager.increment("COMPLETED")
+            self._manager.set("PREVIOUS_STOCK_NAME", order.sym)
+        elif action == ActionType.OPEN:
+            self._manager.increment("COMPLETED_OPTIONS")
+
+    async def _submit_async(
+        self,
+        broker: AsyncBroker,
+        order: Union[StockOrder, OptionOrder],
+        action: ActionType,
+    ) -> None:
+        if not self._allowed(broker, order, action):
+            return
+        try:
+            staged = self._staged.pop((broker.name(), action, str(order)), None)
+            if staged:
+                await broker.commit(staged)
+            elif action == ActionType.BUY:
+                await broker.buy(cast(StockOrder, order))
+            elif action == ActionType.SELL:
+                await broker.sell(cast(StockOrder, order))
+            elif action == ActionType.OPEN:
+                await broker.buy_option(cast(OptionOrder, order))
+            else:
+                await broker.sell_option(cast(OptionOrder, order))
+            self._breaker(broker).record_success()
+        except Exception as e:
+            self._breaker(broker).record_failure()
+            logger.error(f"{broker.name()} Error on {action.value} {order}: {e!r}")
+
+    def _start_leg(
+        self,
+        orders: Union[list[StockOrder], list[OptionOrder]],
+        key: str,
+        action: ActionType,
+    ) -> None:
+        formatted_orders = format_list_of_orders(orders)
+        self._manager.set(key, formatted_orders)
+        msg = (
+            f"Buying {key}"
+            if action == ActionType.BUY or action == ActionType.OPEN
+            else f"Selling {key}"
+        )
+        logger.info(f"{msg}: {formatted_orders}")
+
+    @traced(cat="job")
     def _perform_trade(
         self,
         brokers_str: list[str],
@@ -437,27 +862,20 @@ class AutomatedTrading:
         # logger.info(type(orders))
 
         # Logger stuff
-        formatted_orders = format_list_of_orders(orders)
-
-        # logger.info("after formatted orders")
-        self._manager.set(key, formatted_orders)
-        msg = (
-            f"Buying {key}"
-            if action == ActionType.BUY or action == ActionType.OPEN
-            else f"Selling {key}"
-        )
-        logger.info(f"{msg}: {formatted_orders}")
+        self._start_leg(orders, key, action)
 
         # Options trading execution
         if action == ActionType.OPEN or action == ActionType.CLOSE:
             # logger.info("REACHED")
             self._perform_option_action(
-                brokers, cast(list[OptionOrder], orders), action
+                brokers, cast(list[OptionOrder], orders), action, category=key
             )
             # logger.info("REACHED2")
         # Normal trade execution
         else:
-            self._perform_action(brokers, cast(list[StockOrder], orders), action)
+            self._perform_action(
+                brokers, cast(list[StockOrder], orders), action, category=key
+            )
 
     @staticmethod
     def generate_reports(
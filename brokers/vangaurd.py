@@ -1,8 +1,11 @@
+from contextlib import contextmanager
 from pathlib import Path
-import time
-from typing import Any, Optional, Union
-from brokers import VANGUARD_LOGIN, VANGUARD_PASSWORD
-from utils.broker import Broker, OptionOrder, StockOrder
+from typing import Any, Iterator, Optional, Union, cast
+
+from loguru import logger
+
+from brokers import LIGHTWEIGHT_BROWSER, VANGUARD_LOGIN, VANGUARD_PASSWORD
+from utils.broker import Broker, OptionOrder, StagedOrder, StockOrder
 from utils.market_data import MarketData
 from utils.report.report import (
     NULL_STOCK_DATA,
@@ -14,10 +17,20 @@ from utils.report.report import (
     OrderType,
     StockData,
 )
-from utils.selenium_helper import CustomChromeInstance
+from utils.selenium_helper import BrowserPool, CustomChromeInstance
+from utils.tracing import trace_methods
+from selenium.common import TimeoutException
 from selenium.webdriver.common.by import By
 
 
+TRADE_TICKET_URL = "https://personal.vanguard.com/us/TradeTicket?investmentType=OPTION"
+# the login page loads its form through adobe launch
+ALLOWED_URLS = ["*adobedtm.com*"]
+# Vanguard only trades options, other categories share the options browser
+SESSION_CATEGORIES = ["OPTIONS"]
+
+
+@trace_methods("selenium")
 class Vanguard(Broker):
     def __init__(
         self,
@@ -26,23 +39,72 @@ class Vanguard(Broker):
         option_report_file: Optional[Path] = None,
     ):
         super().__init__(report_file, broker_name, option_report_file)
-        self._chrome_inst = CustomChromeInstance(undetected=True)
-        self._chrome_inst.open(
-            "https://personal.vanguard.com/us/TradeTicket?investmentType=OPTION"
+        self._pool = BrowserPool(self._create_browser, SESSION_CATEGORIES)
+        # each browser has a single order ticket, so one order is staged per browser
+        self._staged_tickets: dict[str, StagedOrder] = {}
+
+    def _create_browser(self, category: str) -> CustomChromeInstance:
+        primary = category == SESSION_CATEGORIES[0]
+        return CustomChromeInstance(
+            undetected=True,
+            name=self.name(),
+            profile=self.name() if primary else f"{self.name()}_{category}",
+            lightweight=LIGHTWEIGHT_BROWSER,
+            allowlist=ALLOWED_URLS,
+            cookies_from=self.name(),
         )
 
+    @property
+    def _chrome_inst(self) -> CustomChromeInstance:
+        return self._pool.current()
+
+    @property
+    def _staged_ticket(self) -> Optional[StagedOrder]:
+        return self._staged_tickets.get(self._pool.category())
+
+    @_staged_ticket.setter
+    def _staged_ticket(self, staged: Optional[StagedOrder]) -> None:
+        if staged:
+            self._staged_tickets[self._pool.category()] = staged
+        else:
+            self._staged_tickets.pop(self._pool.category(), None)
+
+    @contextmanager
+    def session(self, category: str) -> Iterator[None]:
+        with self._pool.session(category):
+            yield
+
     def login(self) -> None:
-        username_input = self._chrome_inst.find(By.XPATH, '//*[@id="USER"]')
+        self._login_primary()
+        self._pool.primary.save_cookies()
+        for category in SESSION_CATEGORIES[1:]:
+            with self._pool.session(category) as browser:
+                if not browser.resume_session(
+                    TRADE_TICKET_URL,
+                    By.XPATH,
+                    '//*[@id="baseForm:investmentTextField"]',
+                ):
+                    logger.warning(f"VD: {category} shares the primary browser")
+                    self._pool.share(category)
+
+    def _login_primary(self) -> None:
+        if self._chrome_inst.resume_session(
+            TRADE_TICKET_URL, By.XPATH, '//*[@id="baseForm:investmentTextField"]'
+        ):
+            return
+        # not logged in, the ticket redirected to the login form
+        username_input = self._chrome_inst.wait_clickable(By.XPATH, '//*[@id="USER"]')
         self._chrome_inst.sendKeyboardInput(username_input, VANGUARD_LOGIN)
-        time.sleep(2)
-        password_input = self._chrome_inst.find(By.XPATH, '//*[@id="PASSWORD-blocked"]')
+        password_input = self._chrome_inst.wait_clickable(
+            By.XPATH, '//*[@id="PASSWORD-blocked"]'
+        )
         self._chrome_inst.sendKeyboardInput(password_input, VANGUARD_PASSWORD)
-        time.sleep(2)
-        login_btn = self._chrome_inst.find(
+        login_btn = self._chrome_inst.wait_clickable(
             By.XPATH, '//*[@id="username-password-submit-btn-1"]'
         )
         login_btn.click()
         input("Done logging in (VD)? (press enter to continue)")
+        self._chrome_inst.save_cookies()
 
     def buy(self, order: StockOrder) -> Any:
         return NotImplemented
@@ -62,14 +124,36 @@ class Vanguard(Broker):
     def _limit_sell(self, order: StockOrder) -> Any:
         return NotImplemented
 
-    def buy_option(self, order: OptionOrder) -> None:
+    def stage(
+        self, order: Union[StockOrder, OptionOrder], action: ActionType
+    ) -> StagedOrder:
+        """
+        fills the option ticket for an open, commit only has to set the limit price
+        from a fresh quote, review and submit
+        """
+        if action != ActionType.OPEN or self._staged_ticket:
+            return super().stage(order, action)
+        order = cast(OptionOrder, order)
+        self._fill_option_buy_order(order, action, with_price=False)
+        self._staged_ticket = StagedOrder(order, action, {"ticket": True})
+        return self._staged_ticket
+
+    def commit(self, staged: StagedOrder) -> None:
+        if staged is not self._staged_ticket:
+            # never staged or the ticket was reused by another order since
+            return super().commit(staged)
+        self.buy_option(cast(OptionOrder, staged.order), staged)
+
+    def buy_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
         pre_stock_data = self._get_option_data(order)
         program_submitted = self._get_current_time()
 
         if order.option_type == OptionType.CALL:
-            self._buy_call_option(order)
+            self._buy_call_option(order, staged)
         else:
-            self._buy_put_option(order)
+            self._buy_put_option(order, staged)
 
         program_executed = self._get_current_time()
         post_stock_data = self._get_option_data(order)
@@ -110,35 +194,62 @@ class Vanguard(Broker):
     def _get_option_data(self, order: OptionOrder) -> OptionData:
         return MarketData.get_option_data(order)
 
-    def _buy_call_option(self, order: OptionOrder) -> None:
-        self._perform_option_buy_order(order, ActionType.OPEN)
+    def _buy_call_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        self._perform_option_buy_order(order, ActionType.OPEN, staged)
 
     def _sell_call_option(self, order: OptionOrder) -> None:
         self._perform_option_sell_order(order, ActionType.CLOSE)
 
-    def _buy_put_option(self, order: OptionOrder) -> None:
-        self._perform_option_buy_order(order, ActionType.OPEN)
+    def _buy_put_option(
+        self, order: OptionOrder, staged: Optional[StagedOrder] = None
+    ) -> None:
+        self._perform_option_buy_order(order, ActionType.OPEN, staged)
 
     def _sell_put_option(self, order: OptionOrder) -> None:
         self._perform_option_sell_order(order, ActionType.CLOSE)
 
-    def _perform_option_buy_order(self, order: OptionOrder, action: ActionType) -> None:
+    def _perform_option_buy_order(
+        self,
+        order: OptionOrder,
+        action: ActionType,
+        staged: Optional[StagedOrder] = None,
+    ) -> None:
+        if staged:
+            self._staged_ticket = None
+            # a price from the quote at staging would be STAGE_LEAD old
+            self._set_price(order, action)
+        else:
+            self._fill_option_buy_order(order, action)
+        self._place_order()
+
+    def _fill_option_buy_order(
+        self, order: OptionOrder, action: ActionType, with_price: bool = True
+    ) -> None:
+        # whatever was staged on the ticket is overwritten
+        self._staged_ticket = None
         self._set_option_type(order.option_type)
         self._set_transaction_type(action)
         self._set_symbol(order.sym)
         self._set_expiration(order.expiration)
         self._set_strike(order.strike)
         self._set_quantity(order.quantity)
-        self._set_price(order, action)
+        if with_price:
+            self._set_price(order, action)
         self._set_day()
-        self._place_order()
 
     def _perform_option_sell_order(
         self, order: OptionOrder, action: ActionType
     ) -> None:
+        self._staged_ticket = None
         self._set_option_type(order.option_type)
         self._set_transaction_type(action)
-        time.sleep(2)
+        self._chrome_inst.wait_visible(
+            By.XPATH,
+            '//*[@id="optionsSellToCloseHoldingsForm:optionsSellToCloseTabletbody0"]',
+            step="holdings",
+        )
         self._find_option_to_sell(order)
         self._set_quantity(order.quantity)
         self._set_price(order, action)
@@ -154,7 +265,7 @@ class Vanguard(Broker):
             self._chrome_inst.find(
                 By.XPATH, '//*[@id="baseForm:putRadioButton"]'
             ).click()
-        time.sleep(2)
+        self._chrome_inst.wait_dom_quiet(step="option_type")
 
     def _set_transaction_type(self, action: ActionType) -> None:
         self._chrome_inst.find(
@@ -174,7 +285,8 @@ class Vanguard(Broker):
             By.XPATH, '//*[@id="baseForm:investmentTextField"]'
         )
         self._chrome_inst.sendKeyboardInput(symbol_input, sym)
-        time.sleep(2)
+        # expirations for the symbol are fetched
+        self._chrome_inst.wait_network_idle(step="symbol")
 
     def _convert_date(self, date: str) -> str:
         month, day, year = date.split("/")
@@ -197,7 +309,7 @@ class Vanguard(Broker):
             except:
                 pass
             idx += 1
-        time.sleep(1)
+        self._chrome_inst.wait_network_idle(step="expiration")
 
     def _set_strike(self, strike: str) -> None:
         self._chrome_inst.find(
@@ -217,7 +329,7 @@ class Vanguard(Broker):
             except:
                 pass
             idx += 1
-        time.sleep(1)
+        self._chrome_inst.wait_network_idle(step="strike")
 
     def _set_quantity(self, quantity: int) -> None:
         elem = self._chrome_inst.find(
@@ -237,7 +349,7 @@ class Vanguard(Broker):
                 price = 0.01
         price = self._handle_option_tick_size(action, price)
         self._chrome_inst.sendKeyboardInput(price_input, str(round(price, 2)))
-        time.sleep(1)
+        self._chrome_inst.wait_dom_quiet(step="price")
 
     def _set_day(self) -> None:
         self._chrome_inst.find(
@@ -252,18 +364,20 @@ class Vanguard(Broker):
         self._chrome_inst.find(
             By.XPATH, '//*[@id="baseForm:reviewButtonInput"]'
         ).click()
-        time.sleep(2)
         if action == ActionType.CLOSE:
-            self._chrome_inst.find(
-                By.XPATH, '//*[@id="orderCaptureWarningLayerForm:yesButtonInput"]'
+            self._chrome_inst.wait_clickable(
+                By.XPATH,
+                '//*[@id="orderCaptureWarningLayerForm:yesButtonInput"]',
+                step="review_warning",
             ).click()
-        time.sleep(2)
-        self._chrome_inst.find(
-            By.XPATH, '//*[@id="baseForm:submitButtonInput"]'
+        self._chrome_inst.wait_clickable(
+            By.XPATH, '//*[@id="baseForm:submitButtonInput"]', step="review"
         ).click()
-        time.sleep(1)
+        # let the submit finish before navigating away from the ticket
+        self._chrome_inst.wait_network_idle(step="submit")
         self._chrome_inst.open(
-            "https://personal.vanguard.com/us/TradeTicket?accountId=258586230212504&investmentType=OPTION"
+            "https://personal.vanguard.com/us/TradeTicket?accountId=258586230212504&investmentType=OPTION",
+            "option_ticket",
         )
 
     def _find_option_to_sell(self, order: OptionOrder) -> None:
@@ -296,7 +410,7 @@ class Vanguard(Broker):
                         By.XPATH,
                         '//*[@id="optionsSellToCloseHoldingsForm:continueButtonInput"]',
                     ).click()
-                    time.sleep(2)
+                    self._chrome_inst.wait_network_idle(step="holdings_continue")
             except:
                 pass
             idx += 1
@@ -351,9 +465,13 @@ class Vanguard(Broker):
 
     def download_trade_data(self, dates: list[str]) -> None:
         # TODO: doesn't completely work
-        self._chrome_inst.open("https://confirmations.web.vanguard.com/")
+        self._chrome_inst.open(
+            "https://confirmations.web.vanguard.com/", "confirmations_page"
+        )
         input("Waiting to set confirmation type to monetary")
         idx = 1
+        # the confirmations download in parallel, each is waited on at the end
+        downloads = {}
         while True:
             try:
                 date = self._chrome_inst.find(
@@ -363,11 +481,19 @@ class Vanguard(Broker):
                 download = self._chrome_inst.find(
                     By.XPATH, f'//*[@id="download-icon-{idx-1}"]'
                 )
+                pending = self._chrome_inst.expect_download(
+                    step="confirmation_download"
+                )
                 download.click()
-                time.sleep(2)
+                downloads[date] = pending
                 idx += 1
             except:
                 break
+        for date, pending in downloads.items():
+            try:
+                logger.info(f"VD: downloaded {date} to {pending.result()}")
+            except TimeoutException as e:
+                logger.error(f"VD: {date} confirmation did not download: {e}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,190 @@
+"""
+Seeded generator for a synthetic trading day: the original report written by the
+program plus the Schwab (api orders and the old csv), Fidelity and IBKR files that post
+processing merges into it. Every symbol is traded once (buy + sell) on each broker so
+the merges stay one-to-one like a real day, and a fraction of the Fidelity fills are
+split across several executions.
+"""
+
+import json
+import string
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.program_manager import REPORT_COLUMNS
+
+BROKERS = ["FD", "SB", "IF"]
+ACTIONS = ["Buy", "Sell"]
+SPLIT_RATE = 0.05
+
+
+@dataclass
+class SyntheticDay:
+    report: pd.DataFrame
+    schwab: pd.DataFrame
+    schwab_orders: list[dict]
+    fidelity: pd.DataFrame
+    ibkr: pd.DataFrame
+
+
+def _symbols(count: int) -> list[str]:
+    letters = string.ascii_uppercase
+    syms = []
+    for i in range(count):
+        sym = ""
+        i += 1
+        while i > 0:
+            i, rem = divmod(i - 1, 26)
+            sym = letters[rem] + sym
+        syms.append(sym)
+    return syms
+
+
+def _times(rng: np.random.Generator, count: int, fmt: str) -> list[str]:
+    seconds = rng.integers(6 * 3600 + 1800, 13 * 3600, count)
+    micros = rng.integers(0, 1_000_000, count)
+    stamps = pd.Timestamp("1900-01-01") + pd.to_timedelta(seconds, unit="s")
+    stamps = stamps + pd.to_timedelta(micros, unit="us")
+    return list(stamps.strftime(fmt))
+
+
+def generate_day(rows: int, seed: int = 0, date: str = "01/02/2024") -> SyntheticDay:
+    """
+    :param rows: approximate number of rows in the original report
+    """
+    rng = np.random.default_rng(seed)
+    num_syms = max(rows // (len(BROKERS) * len(ACTIONS)), 1)
+    syms = np.array(_symbols(num_syms))
+
+    sym_col = np.tile(np.repeat(syms, len(ACTIONS)), len(BROKERS))
+    action_col = np.tile(ACTIONS, num_syms * len(BROKERS))
+    broker_col = np.repeat(BROKERS, num_syms * len(ACTIONS))
+    count = len(sym_col)
+
+    quote = np.round(rng.uniform(5, 500, count), 2)
+    spread = np.round(rng.uniform(0.01, 0.1, count), 2)
+    size = rng.integers(1, 100, count).astype(float)
+    fill = np.round(quote + rng.uniform(-0.02, 0.02, count), 4)
+
+    report = pd.DataFrame(index=range(count), columns=REPORT_COLUMNS)
+    report["Date"] = date
+    report["Program Submitted"] = _times(rng, count, "%H:%M:%S:%f")
+    report["Program Executed"] = _times(rng, count, "%H:%M:%S:%f")
+    report["Broker Executed"] = _times(rng, count, "%H:%M:%S:%f")
+    report["Symbol"] = sym_col
+    report["Broker"] = broker_col
+    report["Action"] = action_col
+    report["Size"] = size
+    report["Pre Quote"] = quote
+    report["Post Quote"] = np.round(quote + rng.uniform(-0.05, 0.05, count), 2)
+    report["Pre Bid"] = np.round(quote - spread / 2, 2)
+    report["Pre Ask"] = np.round(quote + spread / 2, 2)
+    report["Post Bid"] = report["Pre Bid"]
+    report["Post Ask"] = report["Pre Ask"]
+    report["Pre Volume"] = rng.integers(1, 1000, count)
+    report["Post Volume"] = rng.integers(1, 1000, count)
+    report["Order Type"] = "Market"
+    report["Split"] = False
+
+    # only IBKR fills are known when the report is written
+    is_ibkr = report["Broker"] == "IF"
+    report.loc[is_ibkr, "Price"] = fill[is_ibkr]
+    report.loc[is_ibkr, "Dollar Amt"] = np.round(fill * size, 4)[is_ibkr]
+
+    def broker_fills(broker: str) -> pd.DataFrame:
+        mask = (report["Broker"] == broker).to_numpy()
+        return pd.DataFrame(
+            {
+                "Date": date,
+                "Symbol": sym_col[mask],
+                "Action": action_col[mask],
+                "Size": size[mask],
+                "Price": fill[mask],
+                "Dollar Amt": np.round(fill * size, 4)[mask],
+            }
+        )
+
+    schwab = broker_fills("SB")
+    is_schwab = report["Broker"] == "SB"
+    order_ids = np.arange(len(schwab)) + 1000
+    report.loc[is_schwab, "Order ID"] = order_ids
+    report.loc[is_schwab, "Activity ID"] = order_ids * 10
+    month, day, year = date.split("/")
+    leg_times = _times(rng, len(schwab), f"{year}-{month}-{day}T%H:%M:%S+0000")
+    schwab_orders = [
+        {
+            "orderId": int(order_id),
+            "orderActivityCollection": [
+                {
+                    "activityType": "EXECUTION",
+                    "activityId": int(order_id) * 10,
+                    "executionLegs": [
+                        {"quantity": fill_size, "price": price, "time": leg_time}
+                    ],
+                }
+            ],
+        }
+        for order_id, fill_size, price, leg_time in zip(
+            order_ids, schwab["Size"], schwab["Price"], leg_times
+        )
+    ]
+
+    ibkr = broker_fills("IF")
+    ibkr["Broker Executed"] = report.loc[is_ibkr, "Broker Executed"].to_numpy()
+    ibkr["Split"] = False
+    ibkr["Expiration"] = ""
+    ibkr["Strike"] = ""
+    ibkr["Option Type"] = ""
+
+    fidelity = broker_fills("FD")
+    fidelity["Broker Executed"] = _times(rng, len(fidelity), "%H:%M:%S")
+    fidelity["Identifier"] = np.arange(len(fidelity))
+    fidelity["Split"] = False
+    split_rows = fidelity[rng.random(len(fidelity)) < SPLIT_RATE]
+    if len(split_rows) != 0:
+        # a split order is reported as two partial executions of the same order
+        first, second = split_rows.copy(), split_rows.copy()
+        first["Size"] = np.maximum(np.floor(split_rows["Size"] / 2), 1)
+        second["Size"] = split_rows["Size"] - first["Size"]
+        for part in (first, second):
+            part["Dollar Amt"] = np.round(part["Price"] * part["Size"], 4)
+            part["Split"] = True
+        fidelity = pd.concat(
+            [fidelity.drop(split_rows.index), first, second], ignore_index=True
+        )
+    fidelity["Price"] = fidelity["Price"].map("{:,.4f}".format)
+    fidelity["Dollar Amt"] = fidelity["Dollar Amt"].map("{:,.2f}".format)
+    fidelity["Strike"] = np.nan
+    fidelity["Expiration"] = np.nan
+    fidelity["Option Type"] = np.nan
+
+    return SyntheticDay(report, schwab, schwab_orders, fidelity, ibkr)
+
+
+def write_day(day: SyntheticDay, base_path: Path, date: str = "01_02") -> Path:
+    """
+    writes the files where PostProcessing expects them under `base_path`
+    :return: path of the original report
+    """
+    for folder in [
+        "reports/original",
+        "reports/filtered",
+        "reports/tests",
+        "data/fidelity",
+        "data/schwab",
+        "data/ibkr",
+    ]:
+        (base_path / folder).mkdir(parents=True, exist_ok=True)
+
+    report_file = base_path / f"reports/original/report_{date}.csv"
+    day.report.to_csv(report_file, index=False)
+    day.schwab.to_csv(base_path / f"data/schwab/schwab_{date}.csv", index=False)
+    (base_path / f"data/schwab/schwab_orders_{date}.json").write_text(
+        json.dumps(day.schwab_orders)
+    )
+    day.fidelity.to_csv(base_path / f"data/fidelity/fd_splits_{date}.csv", index=False)
+    day.ibkr.to_csv(base_path / f"data/ibkr/ibkr_{date}_new.csv", index=False)
+    return report_file
@@ -0,0 +1,162 @@
+"""
+Post processing benchmarks, skipped unless pytest is run with --benchmark:
+
+    python -m pytest tests/benchmarks --benchmark --benchmark-sizes=1000,100000
+
+Each stage is timed on a synthetic day and compared with baseline.json, a stage that is
+slower than baseline * (1 + tolerance) plus MIN_SLACK fails. Baselines are machine specific,
+refresh them with --benchmark-update after an intentional change or on new hardware.
+"""
+
+import shutil
+import time
+from pathlib import Path
+from typing import Callable
+
+import pytest
+import ujson as json  # type: ignore[import-untyped]
+
+import utils.report.post_processing as post_processing
+import utils.report.report_utils as report_utils
+from tests.benchmarks.synthetic import generate_day, write_day
+from utils.report.post_processing import PostProcessing
+from utils.report.report_utils import (
+    combine_fidelity_data,
+    combine_schwab_data,
+    combine_schwab_orders,
+    get_fidelity_report,
+    get_schwab_report,
+    perform_equity_analysis,
+    schwab_executions,
+)
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+# create_datetime_from_string splits the whole path on "_", this keeps the month and
+# day at the indices it expects
+BENCH_DIR = Path(__file__).parent.parent / "tmp_benchmarks"
+DATE = "01_02"
+# absolute allowance so millisecond stages don't fail on scheduler noise
+MIN_SLACK = 0.05
+
+results: dict[str, dict[str, float]] = {}
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    if "size" in metafunc.fixturenames:
+        sizes = metafunc.config.getoption("--benchmark-sizes").split(",")
+        metafunc.parametrize("size", [int(size) for size in sizes], scope="module")
+
+
+@pytest.fixture(scope="module", autouse=True)
+def benchmark_enabled(request):
+    if not request.config.getoption("--benchmark"):
+        pytest.skip("benchmarks only run with --benchmark")
+    yield
+    if request.config.getoption("--benchmark-update") and results:
+        baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+        for size, stages in results.items():
+            baseline.setdefault(size, {}).update(stages)
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=4, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="module")
+def report_file(size):
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    report_file = write_day(generate_day(size, seed=size), BENCH_DIR, DATE)
+    original = report_utils.BASE_PATH, post_processing.BASE_PATH
+    report_utils.BASE_PATH = post_processing.BASE_PATH = BENCH_DIR
+    yield report_file
+    report_utils.BASE_PATH, post_processing.BASE_PATH = original
+    shutil.rmtree(BENCH_DIR)
+
+
+@pytest.fixture(scope="module")
+def processor():
+    # skip logging into the brokers, the synthetic day has no E2 / RH rows
+    processor = PostProcessing.__new__(PostProcessing)
+    processor._output_file_version = ""
+    processor._brokers = {"E2": None}
+    return processor
+
+
+def run_stage(request, size: int, stage: str, func: Callable[[], object]) -> None:
+    repeats = 3 if size <= 10_000 else 1
+    elapsed = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    results.setdefault(str(size), {})[stage] = round(elapsed, 4)
+
+    if request.config.getoption("--benchmark-update"):
+        return
+    baseline = json.loads(BASELINE_FILE.read_text()) if BASELINE_FILE.exists() else {}
+    expected = baseline.get(str(size), {}).get(stage)
+    if expected is None:
+        pytest.skip(f"no baseline for {stage} at {size} rows ({elapsed:.4f}s)")
+    tolerance = request.config.getoption("--benchmark-tolerance")
+    assert elapsed <= expected * (1 + tolerance) + MIN_SLACK, (
+        f"{stage} regressed at {size} rows: {elapsed:.4f}s vs baseline {expected:.4f}s"
+    )
+
+
+class TestPostProcessingBenchmark:
+    def test_read_report(self, request, size, report_file, processor):
+        run_stage(
+            request, size, "read_report", lambda: processor._read_report(report_file)
+        )
+
+    def test_combine_schwab_data(self, request, size, report_file, processor):
+        df = processor._read_report(report_file)
+        sb_df = get_schwab_report(BENCH_DIR / f"data/schwab/schwab_{DATE}.csv")
+        run_stage(
+            request,
+            size,
+            "combine_schwab_data",
+            lambda: combine_schwab_data(df.copy(), sb_df),
+        )
+
+    def test_combine_schwab_orders(self, request, size, report_file, processor):
+        df = processor._read_report(report_file)
+        orders_file = BENCH_DIR / f"data/schwab/schwab_orders_{DATE}.json"
+        orders = json.loads(orders_file.read_text())
+        run_stage(
+            request,
+            size,
+            "combine_schwab_orders",
+            lambda: combine_schwab_orders(df.copy(), schwab_executions(orders)),
+        )
+
+    def test_combine_fidelity_data(self, request, size, report_file, processor):
+        df = processor._read_report(report_file)
+        fd_df = get_fidelity_report(BENCH_DIR / f"data/fidelity/fd_splits_{DATE}.csv")
+        run_stage(
+            request,
+            size,
+            "combine_fidelity_data",
+            lambda: combine_fidelity_data(df.copy(), fd_df),
+        )
+
+    def test_perform_equity_analysis(self, request, size, report_file, processor):
+        df = processor._read_report(report_file)
+        df = combine_schwab_data(
+            df, get_schwab_report(BENCH_DIR / f"data/schwab/schwab_{DATE}.csv")
+        )
+        df = combine_fidelity_data(
+            df, get_fidelity_report(BENCH_DIR / f"data/fidelity/fd_splits_{DATE}.csv")
+        )
+        df["Date"] = df["Date"].min()
+        run_stage(
+            request,
+            size,
+            "perform_equity_analysis",
+            lambda: perform_equity_analysis(df.copy()),
+        )
+
+    def test_generate_report(self, request, size, report_file, processor):
+        run_stage(
+            request,
+            size,
+            "generate_report",
+            lambda: processor.generate_report(str(report_file)),
+        )
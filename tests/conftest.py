@@ -0,0 +1,26 @@
+import pytest
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("benchmark")
+    group.addoption(
+        "--benchmark",
+        action="store_true",
+        help="run the post processing benchmarks in tests/benchmarks",
+    )
+    group.addoption(
+        "--benchmark-sizes",
+        default="1000,10000",
+        help="comma separated report sizes to benchmark (up to 1000000)",
+    )
+    group.addoption(
+        "--benchmark-tolerance",
+        type=float,
+        default=0.5,
+        help="allowed slowdown over the stored baseline before failing (0.5 = 50%%)",
+    )
+    group.addoption(
+        "--benchmark-update",
+        action="store_true",
+        help="store the measured timings as the new baseline",
+    )
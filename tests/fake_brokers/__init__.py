@@ -0,0 +1,21 @@
+"""
+Local stand-ins for the ETrade, Schwab and Robinhood APIs so the real client code can be
+exercised and load tested without a network. Point the adapters at them with the
+ETRADE_BASE_URL / SCHWAB_BASE_URL / RH_BASE_URL environment variables (or the base_url
+argument of the broker), e.g. after starting all three with:
+
+    python -m tests.fake_brokers --latency 0.05 --throttle-rate 0.01
+"""
+
+from tests.fake_brokers.etrade import FakeETradeServer
+from tests.fake_brokers.robinhood import FakeRobinhoodServer
+from tests.fake_brokers.schwab import FakeSchwabServer
+from tests.fake_brokers.server import FakeBrokerServer, FaultConfig
+
+__all__ = [
+    "FakeBrokerServer",
+    "FakeETradeServer",
+    "FakeRobinhoodServer",
+    "FakeSchwabServer",
+    "FaultConfig",
+]
@@ -0,0 +1,46 @@
+import argparse
+import time
+
+from tests.fake_brokers import (
+    FakeETradeServer,
+    FakeRobinhoodServer,
+    FakeSchwabServer,
+    FaultConfig,
+)
+
+SERVERS = [
+    ("ETRADE_BASE_URL", FakeETradeServer, 8801),
+    ("SCHWAB_BASE_URL", FakeSchwabServer, 8802),
+    ("RH_BASE_URL", FakeRobinhoodServer, 8803),
+]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake broker api servers")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--partial-fill-rate", type=float, default=0.0)
+    parser.add_argument("--fill-delay", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    faults = FaultConfig(
+        args.latency,
+        args.jitter,
+        args.throttle_rate,
+        args.partial_fill_rate,
+        args.fill_delay,
+        args.seed,
+    )
+    servers = []
+    for env, server_cls, port in SERVERS:
+        server = server_cls(faults, port).start()
+        servers.append(server)
+        print(f"{env}={server.base_url}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
@@ -0,0 +1,156 @@
+import re
+from typing import Optional, Union
+
+import xmltodict
+
+from tests.fake_brokers.server import FakeBrokerServer, FakeOrder, FaultConfig, Response
+
+
+class FakeETradeServer(FakeBrokerServer):
+    """
+    ETrade v1 endpoints used by brokers/etrade.py: quotes, preview / place order, list
+    orders and the account portfolio. Responses are JSON when the path ends in .json
+    and XML otherwise, like the real API.
+    """
+
+    def __init__(self, faults: Optional[FaultConfig] = None, port: int = 0) -> None:
+        super().__init__(faults, port)
+        self._previews: dict[int, dict] = {}
+        accounts = r"/v1/accounts/(?P<key>[^/.]*)"
+        quote = r"/v1/market/quote/(?P<symbols>[^/]+?)(?P<json>\.json)?"
+        self.route("GET", quote, self._quote)
+        self.route("POST", accounts + r"/orders/preview", self._preview)
+        self.route("POST", accounts + r"/orders/place", self._place)
+        self.route("GET", accounts + r"/orders(?P<json>\.json)?", self._list_orders)
+        self.route("GET", accounts + r"/portfolio(?P<json>\.json)?", self._portfolio)
+
+    @staticmethod
+    def _render(data: dict, match: re.Match) -> Response:
+        if match.group("json"):
+            return Response(body=data)
+        return Response(body=xmltodict.unparse(data), content_type="application/xml")
+
+    def _quote(self, match: re.Match, query: dict, body: bytes) -> Response:
+        quotes = []
+        for sym in match.group("symbols").split(","):
+            ask, bid, last, volume = self.quote(sym)
+            quotes.append(
+                {
+                    "Product": {"symbol": sym, "securityType": "EQ"},
+                    "All": {
+                        "ask": ask,
+                        "bid": bid,
+                        "lastTrade": last,
+                        "totalVolume": volume,
+                    },
+                }
+            )
+        return self._render({"QuoteResponse": {"QuoteData": quotes}}, match)
+
+    @staticmethod
+    def _instrument(request: dict) -> dict:
+        instrument = request["Order"]["Instrument"]
+        return instrument[0] if isinstance(instrument, list) else instrument
+
+    def _preview(self, match: re.Match, query: dict, body: bytes) -> Response:
+        request = xmltodict.parse(body)["PreviewOrderRequest"]
+        with self._lock:
+            preview_id = len(self._previews) + 1
+            self._previews[preview_id] = request
+        return Response(
+            body=xmltodict.unparse(
+                {
+                    "PreviewOrderResponse": {
+                        "orderType": request["orderType"],
+                        "PreviewIds": {"previewId": preview_id},
+                    }
+                }
+            ),
+            content_type="application/xml",
+        )
+
+    def _place(self, match: re.Match, query: dict, body: bytes) -> Response:
+        request = xmltodict.parse(body)["PlaceOrderRequest"]
+        preview_id = int(request["PreviewIds"]["previewId"])
+        if preview_id not in self._previews:
+            return Response(
+                400,
+                xmltodict.unparse(
+                    {"Error": {"code": 1033, "message": "Invalid previewId"}}
+                ),
+                content_type="application/xml",
+            )
+        instrument = self._instrument(request)
+        order = self.place_order(
+            instrument["Product"]["symbol"],
+            "BUY" if instrument["orderAction"].startswith("BUY") else "SELL",
+            float(instrument["quantity"]),
+        )
+        return Response(
+            body=xmltodict.unparse(
+                {
+                    "PlaceOrderResponse": {
+                        "orderType": request["orderType"],
+                        "OrderIds": {"orderId": order.order_id},
+                    }
+                }
+            ),
+            content_type="application/xml",
+        )
+
+    def _order(self, order: FakeOrder) -> dict:
+        filled = self.filled(order)
+        if filled == 0:
+            status = "OPEN"
+        elif filled < order.quantity:
+            status = "PARTIAL"
+        else:
+            status = "EXECUTED"
+        placed = int(order.placed.timestamp() * 1000)
+        instrument: dict[str, Union[str, float, dict]] = {
+            "Product": {"symbol": order.symbol, "securityType": "EQ"},
+            "orderAction": order.side,
+            "orderedQuantity": order.quantity,
+            "filledQuantity": filled,
+        }
+        if filled:
+            instrument["averageExecutionPrice"] = order.price
+        detail = {"placedTime": placed, "status": status, "Instrument": [instrument]}
+        if filled:
+            detail["executedTime"] = placed
+        return {"orderId": order.order_id, "OrderDetail": [detail]}
+
+    def _list_orders(self, match: re.Match, query: dict, body: bytes) -> Response:
+        with self._lock:
+            orders = sorted(self.orders.values(), key=lambda o: -o.order_id)
+        if "orderId" in query:
+            orders = [o for o in orders if str(o.order_id) == query["orderId"]]
+        if "symbol" in query:
+            orders = [o for o in orders if o.symbol in query["symbol"].split(",")]
+        if "transactionType" in query:
+            orders = [o for o in orders if o.side == query["transactionType"]]
+        response: dict = {}
+        if orders:
+            response["Order"] = [self._order(order) for order in orders]
+        return self._render({"OrdersResponse": response}, match)
+
+    def _portfolio(self, match: re.Match, query: dict, body: bytes) -> Response:
+        positions = [
+            {
+                "symbolDescription": sym,
+                "quantity": quantity,
+                "Product": {"symbol": sym, "securityType": "EQ"},
+            }
+            for sym, quantity in self.positions().items()
+        ]
+        return self._render(
+            {
+                "PortfolioResponse": {
+                    "AccountPortfolio": {
+                        "accountId": match.group("key"),
+                        "Position": positions,
+                    }
+                }
+            },
+            match,
+        )
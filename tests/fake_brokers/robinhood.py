@@ -0,0 +1,172 @@
+import re
+import uuid
+from typing import Optional
+from urllib.parse import parse_qs
+
+import ujson as json  # type: ignore[import-untyped]
+
+from tests.fake_brokers.server import FakeBrokerServer, FakeOrder, FaultConfig, Response
+
+API_URL = "https://api.robinhood.com"
+ACCOUNT_NUMBER = "5RH00000"
+
+
+def _order_uuid(order_id: int) -> str:
+    return f"00000000-0000-4000-8000-{order_id:012d}"
+
+
+class FakeRobinhoodServer(FakeBrokerServer):
+    """
+    Robinhood endpoints used through robin_stocks by brokers/robinhood.py: quotes,
+    fundamentals, accounts, portfolios, instruments, orders and positions. Urls inside
+    responses point at the real host like the real api does, RedirectAdapter sends the
+    follow up requests back here.
+    """
+
+    def __init__(self, faults: Optional[FaultConfig] = None, port: int = 0) -> None:
+        super().__init__(faults, port)
+        self._instruments: dict[str, str] = {}
+        self.route("GET", r"/quotes/", self._quotes)
+        self.route("GET", r"/fundamentals/", self._fundamentals)
+        self.route("GET", r"/accounts/", self._accounts)
+        self.route("GET", r"/portfolios/", self._portfolios)
+        self.route("GET", r"/instruments/", self._instruments_by_symbol)
+        self.route("GET", r"/instruments/(?P<id>[0-9a-f-]+)/", self._instrument_by_id)
+        self.route("POST", r"/orders/", self._place)
+        self.route("GET", r"/orders/(?P<id>[0-9a-f-]+)/", self._order_info)
+        self.route("GET", r"/positions/", self._positions)
+
+    def _quotes(self, match: re.Match, query: dict, body: bytes) -> Response:
+        results = []
+        for sym in query.get("symbols", "").split(","):
+            ask, bid, last, _ = self.quote(sym)
+            results.append(
+                {
+                    "symbol": sym,
+                    "ask_price": f"{ask:.6f}",
+                    "bid_price": f"{bid:.6f}",
+                    "last_trade_price": f"{last:.6f}",
+                    "last_extended_hours_trade_price": None,
+                    "trading_halted": False,
+                }
+            )
+        return Response(body={"results": results})
+
+    def _fundamentals(self, match: re.Match, query: dict, body: bytes) -> Response:
+        results = []
+        for sym in query.get("symbols", "").split(","):
+            results.append(
+                {"symbol": sym, "volume": f"{self.quote(sym)[3]:.6f}", "pe_ratio": None}
+            )
+        return Response(body={"results": results})
+
+    def _accounts(self, match: re.Match, query: dict, body: bytes) -> Response:
+        account = {
+            "url": f"{API_URL}/accounts/{ACCOUNT_NUMBER}/",
+            "account_number": ACCOUNT_NUMBER,
+            "cash": "100000.0000",
+            "uncleared_deposits": "0.0000",
+        }
+        return Response(body={"results": [account], "next": None})
+
+    def _portfolios(self, match: re.Match, query: dict, body: bytes) -> Response:
+        equity = 100_000 + sum(
+            self.quote(sym)[2] * quantity for sym, quantity in self.positions().items()
+        )
+        portfolio = {"equity": f"{equity:.4f}", "extended_hours_equity": None}
+        return Response(body={"results": [portfolio], "next": None})
+
+    def _instrument(self, sym: str) -> dict:
+        instrument_id = str(uuid.uuid5(uuid.NAMESPACE_URL, sym))
+        with self._lock:
+            self._instruments[instrument_id] = sym
+        return {
+            "id": instrument_id,
+            "url": f"{API_URL}/instruments/{instrument_id}/",
+            "symbol": sym,
+            "simple_name": sym,
+            "name": sym,
+            "type": "stock",
+            "tradeable": True,
+        }
+
+    def _instruments_by_symbol(
+        self, match: re.Match, query: dict, body: bytes
+    ) -> Response:
+        sym = query.get("symbol", "")
+        return Response(body={"results": [self._instrument(sym)], "next": None})
+
+    def _instrument_by_id(self, match: re.Match, query: dict, body: bytes) -> Response:
+        sym = self._instruments.get(match.group("id"))
+        if sym is None:
+            return Response(404, {"detail": "Not found."})
+        return Response(body=self._instrument(sym))
+
+    def _place(self, match: re.Match, query: dict, body: bytes) -> Response:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+        order = self.place_order(
+            payload["symbol"],
+            payload["side"].upper(),
+            float(payload["quantity"]),
+        )
+        return Response(201, self._order(order))
+
+    def _order(self, order: FakeOrder) -> dict:
+        filled = self.filled(order)
+        if filled == 0:
+            state = "queued"
+        elif filled < order.quantity:
+            state = "partially_filled"
+        else:
+            state = "filled"
+        placed = order.placed.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        executions = []
+        if filled:
+            executions.append(
+                {
+                    "id": str(uuid.uuid5(uuid.NAMESPACE_OID, str(order.order_id))),
+                    "price": f"{order.price:.8f}",
+                    "quantity": f"{filled:.8f}",
+                    "rounded_notional": f"{order.price * filled:.2f}",
+                    "timestamp": placed,
+                }
+            )
+        return {
+            "id": _order_uuid(order.order_id),
+            "url": f"{API_URL}/orders/{_order_uuid(order.order_id)}/",
+            "account": f"{API_URL}/accounts/{ACCOUNT_NUMBER}/",
+            "instrument": self._instrument(order.symbol)["url"],
+            "symbol": order.symbol,
+            "side": order.side.lower(),
+            "type": "market",
+            "state": state,
+            "quantity": f"{order.quantity:.8f}",
+            "cumulative_quantity": f"{filled:.8f}",
+            "average_price": f"{order.price:.8f}" if filled else None,
+            "created_at": placed,
+            "executions": executions,
+        }
+
+    def _order_info(self, match: re.Match, query: dict, body: bytes) -> Response:
+        order = self.orders.get(int(match.group("id").split("-")[-1]))
+        if order is None:
+            return Response(404, {"detail": "Not found."})
+        return Response(body=self._order(order))
+
+    def _positions(self, match: re.Match, query: dict, body: bytes) -> Response:
+        results = []
+        for sym, quantity in self.positions().items():
+            price = f"{self.quote(sym)[2]:.4f}"
+            results.append(
+                {
+                    "instrument": self._instrument(sym)["url"],
+                    "symbol": sym,
+                    "quantity": f"{quantity:.8f}",
+                    "average_buy_price": price,
+                    "intraday_average_buy_price": price,
+                }
+            )
+        return Response(body={"results": results, "next": None})
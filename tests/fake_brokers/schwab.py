@@ -0,0 +1,149 @@
+import re
+from datetime import datetime, timezone
+from typing import Optional
+
+import ujson as json  # type: ignore[import-untyped]
+
+from tests.fake_brokers.server import FakeBrokerServer, FakeOrder, FaultConfig, Response
+
+ACCOUNT_NUMBER = "12345678"
+ACCOUNT_HASH = "FAKEHASH0123456789"
+
+
+class FakeSchwabServer(FakeBrokerServer):
+    """
+    Schwab trader / marketdata v1 endpoints used by brokers/schwab2.py: account numbers,
+    quotes, place order (201 + Location header), orders for account, order by id and
+    account positions. Of the orders query only toEnteredTime and maxResults are
+    applied, a server only ever holds one session's orders.
+    """
+
+    def __init__(self, faults: Optional[FaultConfig] = None, port: int = 0) -> None:
+        super().__init__(faults, port)
+        account = rf"/trader/v1/accounts/(?P<hash>{ACCOUNT_HASH})"
+        self.route("GET", r"/trader/v1/accounts/accountNumbers", self._account_numbers)
+        self.route("GET", r"/marketdata/v1/(?P<symbol>[^/]+)/quotes", self._quote)
+        self.route("GET", r"/marketdata/v1/quotes", self._quotes)
+        self.route("POST", account + r"/orders", self._place)
+        self.route("GET", account + r"/orders", self._orders)
+        self.route("GET", account + r"/orders/(?P<order_id>\d+)", self._order_info)
+        self.route("GET", account, self._account)
+
+    def _account_numbers(self, match: re.Match, query: dict, body: bytes) -> Response:
+        return Response(
+            body=[{"accountNumber": ACCOUNT_NUMBER, "hashValue": ACCOUNT_HASH}]
+        )
+
+    def _quote_data(self, sym: str) -> dict:
+        ask, bid, last, volume = self.quote(sym)
+        return {
+            "assetMainType": "EQUITY",
+            "symbol": sym,
+            "quote": {
+                "askPrice": ask,
+                "bidPrice": bid,
+                "lastPrice": last,
+                "totalVolume": volume,
+            },
+        }
+
+    def _quote(self, match: re.Match, query: dict, body: bytes) -> Response:
+        sym = match.group("symbol")
+        return Response(body={sym: self._quote_data(sym)})
+
+    def _quotes(self, match: re.Match, query: dict, body: bytes) -> Response:
+        syms = query.get("symbols", "").split(",")
+        return Response(body={sym: self._quote_data(sym) for sym in syms if sym})
+
+    def _place(self, match: re.Match, query: dict, body: bytes) -> Response:
+        leg = json.loads(body)["orderLegCollection"][0]
+        order = self.place_order(
+            leg["instrument"]["symbol"],
+            "BUY" if leg["instruction"].startswith("BUY") else "SELL",
+            float(leg["quantity"]),
+        )
+        # the real api answers with an empty body, the new order is in the Location
+        location = (
+            f"https://api.schwabapi.com/trader/v1/accounts/{ACCOUNT_HASH}"
+            f"/orders/{order.order_id}"
+        )
+        return Response(201, None, {"Location": location})
+
+    def _order(self, order: FakeOrder) -> dict:
+        filled = self.filled(order)
+        if filled == 0:
+            status = "QUEUED"
+        elif filled < order.quantity:
+            status = "WORKING"
+        else:
+            status = "FILLED"
+        entered = order.placed.strftime("%Y-%m-%dT%H:%M:%S+0000")
+        data = {
+            "orderId": order.order_id,
+            "accountNumber": int(ACCOUNT_NUMBER),
+            "enteredTime": entered,
+            "status": status,
+            "orderType": "MARKET",
+            "quantity": order.quantity,
+            "filledQuantity": filled,
+            "remainingQuantity": order.quantity - filled,
+            "destinationLinkName": "FAKE",
+            "orderLegCollection": [
+                {
+                    "instruction": order.side,
+                    "quantity": order.quantity,
+                    "instrument": {"symbol": order.symbol, "assetType": "EQUITY"},
+                }
+            ],
+        }
+        if filled:
+            data["closeTime"] = entered
+            data["orderActivityCollection"] = [
+                {
+                    "activityType": "EXECUTION",
+                    "activityId": order.order_id * 10,
+                    "executionType": "FILL",
+                    "quantity": filled,
+                    "executionLegs": [
+                        {
+                            "legId": 1,
+                            "quantity": filled,
+                            "price": order.price,
+                            "time": entered,
+                        }
+                    ],
+                }
+            ]
+        return data
+
+    def _orders(self, match: re.Match, query: dict, body: bytes) -> Response:
+        with self._lock:
+            orders = sorted(self.orders.values(), key=lambda o: -o.order_id)
+        if "toEnteredTime" in query:
+            # second resolution, inclusive
+            to = datetime.strptime(query["toEnteredTime"], "%Y-%m-%dT%H:%M:%SZ")
+            to = to.replace(tzinfo=timezone.utc)
+            orders = [o for o in orders if o.placed.replace(microsecond=0) <= to]
+        if "maxResults" in query:
+            orders = orders[: int(query["maxResults"])]
+        # newest first like the real api
+        return Response(body=[self._order(order) for order in orders])
+
+    def _order_info(self, match: re.Match, query: dict, body: bytes) -> Response:
+        order = self.orders.get(int(match.group("order_id")))
+        if order is None:
+            return Response(404, {"message": "Order not found"})
+        return Response(body=self._order(order))
+
+    def _account(self, match: re.Match, query: dict, body: bytes) -> Response:
+        account: dict = {"type": "MARGIN", "accountNumber": ACCOUNT_NUMBER}
+        if "positions" in query.get("fields", ""):
+            account["positions"] = [
+                {
+                    "longQuantity": max(quantity, 0.0),
+                    "shortQuantity": max(-quantity, 0.0),
+                    "instrument": {"symbol": sym, "assetType": "EQUITY"},
+                }
+                for sym, quantity in self.positions().items()
+            ]
+        return Response(body={"securitiesAccount": account})
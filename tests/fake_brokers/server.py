@@ -0,0 +1,221 @@
+"""
+Base for the fake broker servers: a threaded stdlib http server on localhost with a small
+in-memory order book and injectable faults (latency, 429 throttling, partial fills and
+delayed fills) shared by the ETrade, Schwab and Robinhood stand-ins.
+"""
+
+import random
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+
+import ujson as json  # type: ignore[import-untyped]
+
+Handler = Callable[[re.Match, dict[str, str], bytes], "Response"]
+
+
+@dataclass
+class FaultConfig:
+    # seconds added to every response, plus up to `jitter` seconds at random
+    latency: float = 0.0
+    jitter: float = 0.0
+    # fraction of requests answered with 429 Too Many Requests
+    throttle_rate: float = 0.0
+    # fraction of orders that only fill part of their quantity
+    partial_fill_rate: float = 0.0
+    # seconds an order stays open before it (partially) fills
+    fill_delay: float = 0.0
+    # seconds added when a client opens a connection, stands in for TCP / TLS setup
+    connect_latency: float = 0.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: Union[str, dict, list, None] = None
+    headers: dict[str, str] = field(default_factory=dict)
+    content_type: str = "application/json"
+
+
+@dataclass
+class FakeOrder:
+    order_id: int
+    symbol: str
+    side: str  # "BUY" or "SELL"
+    quantity: float
+    price: float
+    fill_quantity: float
+    placed: datetime
+
+    def filled(self, delay: float) -> float:
+        elapsed = (datetime.now(timezone.utc) - self.placed).total_seconds()
+        return self.fill_quantity if elapsed >= delay else 0.0
+
+
+class FakeBrokerServer:
+    """
+    Subclasses register their endpoints with `route(method, pattern, handler)`, patterns
+    are matched against the request path. Use as a context manager or start()/stop().
+    """
+
+    def __init__(self, faults: Optional[FaultConfig] = None, port: int = 0) -> None:
+        self.faults = faults or FaultConfig()
+        self.orders: dict[int, FakeOrder] = {}
+        self.request_count = 0
+        self.throttled_count = 0
+        self.connection_count = 0
+        self._routes: list[tuple[str, re.Pattern, Handler]] = []
+        self._rng = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._next_id = 100001
+        self._port = port
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        if self._httpd is None:
+            raise RuntimeError(f"{type(self).__name__} is not running")
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, method: str, pattern: str, handler: Handler) -> None:
+        self._routes.append((method, re.compile(pattern + "$"), handler))
+
+    def start(self) -> "FakeBrokerServer":
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connection_count += 1
+                if server.faults.connect_latency:
+                    time.sleep(server.faults.connect_latency)
+
+            def do_GET(self) -> None:
+                server._dispatch(self, "GET")
+
+            def do_POST(self) -> None:
+                server._dispatch(self, "POST")
+
+            def do_PUT(self) -> None:
+                server._dispatch(self, "PUT")
+
+            def do_DELETE(self) -> None:
+                server._dispatch(self, "DELETE")
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", self._port), RequestHandler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self) -> "FakeBrokerServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def quote(self, sym: str) -> tuple[float, float, float, int]:
+        """deterministic (ask, bid, last, volume) per symbol"""
+        seed = zlib.crc32(sym.encode())
+        last = round(10 + (seed % 49_000) / 100, 2)
+        return round(last + 0.01, 2), round(last - 0.01, 2), last, 1000 + seed % 100_000
+
+    def place_order(self, symbol: str, side: str, quantity: float) -> FakeOrder:
+        ask, bid, _, _ = self.quote(symbol)
+        with self._lock:
+            fill_quantity = quantity
+            if quantity > 1 and self._rng.random() < self.faults.partial_fill_rate:
+                fill_quantity = float(int(quantity // 2))
+            order = FakeOrder(
+                self._next_id,
+                symbol,
+                side,
+                quantity,
+                ask if side == "BUY" else bid,
+                fill_quantity,
+                datetime.now(timezone.utc),
+            )
+            self._next_id += 1
+            self.orders[order.order_id] = order
+        return order
+
+    def filled(self, order: FakeOrder) -> float:
+        return order.filled(self.faults.fill_delay)
+
+    def positions(self) -> dict[str, float]:
+        positions: dict[str, float] = {}
+        with self._lock:
+            orders = list(self.orders.values())
+        for order in orders:
+            filled = self.filled(order)
+            change = filled if order.side == "BUY" else -filled
+            positions[order.symbol] = positions.get(order.symbol, 0.0) + change
+        return {sym: quantity for sym, quantity in positions.items() if quantity != 0}
+
+    def _fault(self) -> Optional[Response]:
+        with self._lock:
+            self.request_count += 1
+            delay = self.faults.latency + self._rng.uniform(0, self.faults.jitter)
+            throttled = self._rng.random() < self.faults.throttle_rate
+            if throttled:
+                self.throttled_count += 1
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            return Response(429, {"error": "Too Many Requests"}, {"Retry-After": "1"})
+        return None
+
+    def _dispatch(self, request: BaseHTTPRequestHandler, method: str) -> None:
+        length = int(request.headers.get("Content-Length") or 0)
+        body = request.rfile.read(length) if length else b""
+        url = urlsplit(request.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        response = self._fault()
+        if response is None:
+            response = Response(404, {"error": f"no route for {method} {url.path}"})
+            for route_method, pattern, handler in self._routes:
+                match = pattern.match(url.path)
+                if route_method == method and match:
+                    try:
+                        response = handler(match, query, body)
+                    except Exception as e:
+                        response = Response(500, {"error": repr(e)})
+                    break
+
+        if response.body is None:
+            payload = b""
+        elif isinstance(response.body, str):
+            payload = response.body.encode()
+        else:
+            payload = json.dumps(response.body).encode()
+        request.send_response(response.status)
+        request.send_header("Content-Type", response.content_type)
+        request.send_header("Content-Length", str(len(payload)))
+        for key, value in response.headers.items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(payload)
@@ -0,0 +1,77 @@
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+twenty_four_hour_trading = importlib.import_module("brokers.24_hour_trading")
+
+
+class FakeBroker:
+    MAIN_THREAD_ONLY = False
+
+    def __init__(self, name, delay=0.0):
+        self._broker_name = name
+        self._delay = delay
+        self.traded = []
+        self.threads = set()
+
+    def name(self):
+        return self._broker_name
+
+    def buy_and_sell_immediately(self, sym):
+        time.sleep(self._delay)
+        self.threads.add(threading.current_thread().name)
+        self.traded.append(sym)
+
+
+class TestTwentyFourHourTrading:
+    def make_trader(self, brokers):
+        trader = twenty_four_hour_trading.TwentyFourHourTrading.__new__(
+            twenty_four_hour_trading.TwentyFourHourTrading
+        )
+        trader._brokers = brokers
+        trader._workers = {
+            broker.name(): ThreadPoolExecutor(1, thread_name_prefix=broker.name())
+            for broker in brokers
+            if not broker.MAIN_THREAD_ONLY
+        }
+        trader._running = {}
+        trader._symbol_list = [["AAPL", "MSFT"], ["GME"]]
+        trader._24_hour_manager = {"GROUP_ASSIGNMENT": [1, 2]}
+        return trader
+
+    def test_brokers_trade_concurrently(self, monkeypatch):
+        monkeypatch.setattr(twenty_four_hour_trading, "datetime", FixedDatetime)
+        slow, fast = FakeBroker("RH", 0.2), FakeBroker("FD")
+        main = FakeBroker("IF")
+        main.MAIN_THREAD_ONLY = True
+        trader = self.make_trader([slow, fast, main])
+        monkeypatch.setattr(trader, "_slot_deadline", lambda: time.time() + 60)
+
+        start = time.perf_counter()
+        trader.trade_symbols_across_brokers(trader._symbol_list, 0)
+        assert main.traded == ["AAPL", "MSFT"]
+        assert main.threads == {threading.current_thread().name}
+
+        trader._running["FD"].result()
+        # RH is still busy with the first group, it is skipped instead of queued
+        trader.trade_symbols_across_brokers(trader._symbol_list, 1)
+        for future in trader._running.values():
+            future.result()
+        assert time.perf_counter() - start < 0.6
+        assert slow.traded == ["AAPL", "MSFT"]
+        assert fast.traded == ["AAPL", "MSFT", "GME"]
+        assert all(name.startswith("FD") for name in fast.threads)
+
+    def test_deadline_stops_new_symbols(self):
+        broker = FakeBroker("RH")
+        trader = self.make_trader([broker])
+        trader._trade_symbols(broker, ["AAPL", "MSFT"], time.time() - 1)
+        assert broker.traded == []
+
+
+class FixedDatetime(twenty_four_hour_trading.datetime):  # type: ignore[name-defined, misc]
+    @classmethod
+    def now(cls, tz=None):
+        # a tuesday afternoon, inside the trading week
+        return cls(2024, 1, 2, 12, 30, 1)
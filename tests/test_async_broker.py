@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from contextlib import nullcontext
+
+import pytest
+
+from brokers import AsyncSchwab, Schwab
+from tests.fake_brokers import FakeSchwabServer, FaultConfig
+from utils import async_broker
+from utils.async_broker import ORDER_CATEGORY, ThreadedAsyncBroker
+from utils.broker import StockOrder
+from utils.metrics import LATENCY
+from utils.rate_limit import RateLimiter
+from utils.report.report import BrokerNames, StockData
+
+QUOTES = 40
+QUOTE_LATENCY = 0.1
+
+
+class FakeBroker:
+    MAIN_THREAD_ONLY = False
+
+    def __init__(self):
+        self.calls = []
+
+    def name(self):
+        return "FD"
+
+    def session(self, category):
+        self.calls.append((category, threading.current_thread().name))
+        return nullcontext()
+
+    def _get_stock_data(self, sym):
+        return StockData(1.0, 1.0, 1.0, 1)
+
+
+class TestAsyncBroker:
+    @pytest.fixture(autouse=True)
+    def unlimited(self, monkeypatch):
+        monkeypatch.setattr(async_broker, "RATE_LIMITER", RateLimiter({}))
+
+    def test_schwab_order(self, tmp_path):
+        LATENCY.reset()
+        report_file = tmp_path / "report.csv"
+
+        async def trade(broker):
+            await broker.login()
+            await broker.buy(StockOrder("MSFT", 3))
+
+        with FakeSchwabServer() as server:
+            schwab = Schwab(report_file, BrokerNames.SB, base_url=server.base_url)
+            asyncio.run(trade(AsyncSchwab(schwab)))
+            assert server.positions() == {"MSFT": 3.0}
+        assert "MSFT" in report_file.read_text()
+        assert LATENCY.get("SB", "submit").count == 1
+        assert LATENCY.get("SB", "post_quote").count == 1
+
+    def test_schwab_quotes_share_one_loop(self):
+        async def quotes(broker):
+            await broker.login()
+            await broker.warm_up()
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(broker._get_stock_data("AAPL") for _ in range(QUOTES))
+            )
+            return time.perf_counter() - start
+
+        with FakeSchwabServer(FaultConfig(latency=QUOTE_LATENCY)) as server:
+            schwab = Schwab(None, BrokerNames.SB, base_url=server.base_url)
+            elapsed = asyncio.run(quotes(AsyncSchwab(schwab)))
+        # sequential quotes would take QUOTES * QUOTE_LATENCY
+        assert elapsed < QUOTES * QUOTE_LATENCY / 2
+
+    def test_threaded_broker_per_category(self):
+        broker = FakeBroker()
+        threaded = ThreadedAsyncBroker(broker)
+
+        async def quote(category):
+            ORDER_CATEGORY.set(category)
+            return await threaded._get_stock_data("AAPL")
+
+        async def main():
+            return await asyncio.gather(quote("STOCKS"), quote("OPTIONS"))
+
+        assert asyncio.run(main()) == [StockData(1.0, 1.0, 1.0, 1)] * 2
+        assert sorted(broker.calls) == [
+            ("OPTIONS", "FD-OPTIONS_0"),
+            ("STOCKS", "FD-STOCKS_0"),
+        ]
+        threaded.shutdown()
+
+        broker.MAIN_THREAD_ONLY = True
+        with pytest.raises(ValueError):
+            ThreadedAsyncBroker(broker)
@@ -0,0 +1,51 @@
+import time
+from pathlib import Path
+
+from brokers import ETrade, Schwab
+from tests.fake_brokers import FakeETradeServer, FakeSchwabServer, FaultConfig
+from utils import connections
+from utils.broker import StockOrder
+from utils.report.report import BrokerNames
+
+CONNECT_LATENCY = 0.2
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+class TestConnections:
+    def test_etrade_clients_share_warm_connection(self):
+        with FakeETradeServer() as server:
+            report = Path("report.csv")
+            broker = ETrade(report, BrokerNames.ET, base_url=server.base_url)
+            broker.login()
+            broker.warm_up()
+            # quotes and orders go through different pyetrade clients
+            broker._get_stock_data("AAPL")
+            broker._market_buy(StockOrder("AAPL", 1))
+            assert server.connection_count == 1
+
+    def test_warm_up_against_cold_baseline(self, monkeypatch):
+        faults = FaultConfig(connect_latency=CONNECT_LATENCY)
+        with FakeSchwabServer(faults) as server:
+            report = Path("report.csv")
+            # the idle gap between groups outlasts the keep-alive of the cold client
+            monkeypatch.setattr(connections, "KEEPALIVE_EXPIRY", 0.05)
+            cold_broker = Schwab(report, BrokerNames.SB, base_url=server.base_url)
+            cold_broker.login()
+            time.sleep(0.1)
+            cold = timed(cold_broker._get_stock_data, "AAPL")
+
+            monkeypatch.undo()
+            broker = Schwab(report, BrokerNames.SB, base_url=server.base_url)
+            broker.login()
+            time.sleep(0.1)
+            broker.warm_up()
+            opened = server.connection_count
+            warm = timed(broker._get_stock_data, "AAPL")
+
+        assert cold >= CONNECT_LATENCY > warm
+        assert server.connection_count == opened
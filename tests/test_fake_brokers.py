@@ -0,0 +1,154 @@
+import shutil
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from brokers import ETrade, Robinhood, Schwab
+from brokers.schwab2 import NotExecutedError
+from tests.fake_brokers import (
+    FakeETradeServer,
+    FakeRobinhoodServer,
+    FakeSchwabServer,
+    FaultConfig,
+)
+from utils.broker import StockOrder
+from utils.report.report import ActionType, BrokerNames, StockData
+
+
+class TestFakeBrokers:
+    @pytest.fixture(autouse=True)
+    def pre_post_script(self):
+        curr_dir = Path(__file__).parent / "tmp"
+        curr_dir.mkdir(parents=True, exist_ok=True)
+        yield curr_dir
+        shutil.rmtree(curr_dir)
+
+    def test_etrade(self, pre_post_script):
+        report_file = pre_post_script / "report.csv"
+        with FakeETradeServer() as server:
+            broker = ETrade(report_file, BrokerNames.ET, base_url=server.base_url)
+            broker.login()
+            ask, bid, last, volume = server.quote("AAPL")
+            assert broker._get_stock_data("AAPL") == StockData(ask, bid, last, volume)
+
+            broker.buy(StockOrder("AAPL", 2))
+            order_id = int(broker._market_sell(StockOrder("AAPL", 1)))
+            assert broker._get_latest_order(str(order_id)).price == bid
+            # portfolio is xml, quantities come back as strings like the real api
+            positions = broker.get_current_positions()[0]
+            assert [(pos.sym, float(pos.quantity)) for pos in positions] == [("AAPL", 1)]
+        assert "AAPL" in report_file.read_text()
+
+    def test_etrade_staged(self, pre_post_script):
+        report_file = pre_post_script / "report.csv"
+        with FakeETradeServer() as server:
+            broker = ETrade(report_file, BrokerNames.ET, base_url=server.base_url)
+            broker.login()
+            staged = broker.stage(StockOrder("AAPL", 2), ActionType.BUY)
+            assert len(server._previews) == 1
+            assert server.orders == {}
+
+            broker.commit(staged)
+            # the preview from stage is placed, commit doesn't preview again
+            assert len(server._previews) == 1
+            assert server.positions() == {"AAPL": 2.0}
+        assert "AAPL" in report_file.read_text()
+
+    def test_commit_without_staging(self, pre_post_script):
+        report_file = pre_post_script / "report.csv"
+        with FakeRobinhoodServer() as server:
+            broker = Robinhood(report_file, BrokerNames.RH, base_url=server.base_url)
+            broker.login()
+            staged = broker.stage(StockOrder("TSLA", 4), ActionType.BUY)
+            assert staged.data == {}
+            broker.commit(staged)
+            assert server.positions() == {"TSLA": 4.0}
+
+    def test_schwab(self, pre_post_script):
+        report_file = pre_post_script / "report.csv"
+        with FakeSchwabServer() as server:
+            broker = Schwab(report_file, BrokerNames.SB, base_url=server.base_url)
+            broker.login()
+            broker.buy(StockOrder("MSFT", 3))
+            order_id = broker._market_sell(StockOrder("MSFT", 1))
+            assert order_id == max(server.orders)
+            assert broker._get_order_data(order_id)["orderLegCollection"][0][
+                "instruction"
+            ] == "SELL"
+            assert broker.get_current_positions()[0] == [StockOrder("MSFT", 2.0)]
+        assert "MSFT" in report_file.read_text()
+
+    def test_schwab_confirms_by_order_id(self):
+        faults = FaultConfig(fill_delay=0.3)
+        with FakeSchwabServer(faults) as server:
+            broker = Schwab(Path("report.csv"), BrokerNames.SB, base_url=server.base_url)
+            broker.login()
+            first = broker._market_buy(StockOrder("AAPL", 2))
+            broker._market_buy(StockOrder("MSFT", 1))
+            # retried until the first order has executions, not the newest one
+            order = broker._get_order_data(first)
+            assert order["orderId"] == first
+            assert order["orderActivityCollection"][0]["quantity"] == 2
+
+    def test_schwab_reports_unexecuted_order(self, pre_post_script, monkeypatch):
+        report_file = pre_post_script / "report.csv"
+        with FakeSchwabServer(FaultConfig(fill_delay=60)) as server:
+            broker = Schwab(report_file, BrokerNames.SB, base_url=server.base_url)
+            broker.login()
+            order_id = broker._market_buy(StockOrder("AAPL", 2))
+            order = broker._client.get_order(order_id, broker._hash).json()
+
+            def retries_ran_out(order_id):
+                raise NotExecutedError(order)
+
+            monkeypatch.setattr(broker, "_get_order_data", retries_ran_out)
+            quote = StockData(1.0, 0.9, 0.95, 10.0)
+            broker._save_report(
+                "AAPL",
+                ActionType.BUY,
+                "10:00:00",
+                "10:00:01",
+                quote,
+                quote,
+                order_id=order_id,
+            )
+        row = report_file.read_text().strip().split(",")
+        assert row[3:9] == ["None", "AAPL", "SB", "Buy", "2.0", "None"]
+        assert str(order_id) in row
+
+    def test_robinhood(self, pre_post_script):
+        report_file = pre_post_script / "report.csv"
+        with FakeRobinhoodServer() as server:
+            broker = Robinhood(report_file, BrokerNames.RH, base_url=server.base_url)
+            broker.login()
+            broker.buy(StockOrder("TSLA", 4))
+            order_id = next(iter(server.orders))
+            executions = broker._get_order_data(
+                f"00000000-0000-4000-8000-{order_id:012d}"
+            )
+            assert float(executions[0][1]) == 4
+            assert broker.get_current_positions()[0] == [StockOrder("TSLA", 4.0)]
+        assert "TSLA" in report_file.read_text()
+
+    def test_partial_fills(self):
+        faults = FaultConfig(partial_fill_rate=1.0, seed=1)
+        with FakeETradeServer(faults) as server:
+            broker = ETrade(Path("report.csv"), BrokerNames.ET, base_url=server.base_url)
+            broker.login()
+            order_id = broker._market_buy(StockOrder("AAPL", 10))
+            data, _ = broker.get_order_data(int(order_id), "AAPL", "BUY")
+            assert data.empty  # PARTIAL, not EXECUTED
+            assert server.positions() == {"AAPL": 5.0}
+
+    def test_throttling_and_latency(self):
+        with FakeSchwabServer(FaultConfig(throttle_rate=1.0)) as server:
+            res = httpx.get(f"{server.base_url}/marketdata/v1/AAPL/quotes")
+            assert res.status_code == 429
+            assert server.throttled_count == 1
+
+        with FakeSchwabServer(FaultConfig(latency=0.1)) as server:
+            start = time.perf_counter()
+            httpx.get(f"{server.base_url}/marketdata/v1/AAPL/quotes")
+            assert time.perf_counter() - start >= 0.1
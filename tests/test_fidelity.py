@@ -0,0 +1,192 @@
+import json
+from io import StringIO
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from selenium.common import WebDriverException
+
+from brokers import fidelity as fidelity_module
+from brokers.fidelity import SPLITS_COLUMNS, Fidelity
+from utils.report.report import BrokerNames
+
+FIXTURES = Path(__file__).parent / "fixtures" / "fidelity"
+
+
+def reference_unopened(repeat=1):
+    """
+    activity_unopened.html's rows (Symbol, Action, Strike, Expiration, Option Type) as
+    the BeautifulSoup implementation the lxml parser replaced read them, repeated like
+    long_page
+    """
+    rows = json.loads((FIXTURES / "activity_unopened_rows.json").read_text()) * repeat
+    unopened_df = pd.DataFrame(
+        rows,
+        columns=["Symbol", "Action", "Strike", "Expiration", "Option Type"],
+        dtype=object,
+    )
+    return unopened_df[
+        (unopened_df["Action"] == "Buy") | (unopened_df["Action"] == "Sell")
+    ]
+
+
+def reference_opened(opened):
+    """the pd.read_html implementation the lxml parser replaced"""
+    data = []
+    for idx, temp in enumerate(pd.read_html(StringIO(opened))):
+        splits = temp.iloc[:-1].to_numpy()
+        identifier = np.empty((splits.shape[0], 1))
+        identifier.fill(idx)
+        data.append(np.hstack((splits, identifier)))
+    res = data[0]
+    for x in data[1:]:
+        res = np.append(res, x, axis=0)
+    splits_df = pd.DataFrame(
+        res,
+        columns=["Date", "Broker Executed", "Price", "Size", "Dollar Amt", "Identifier"],
+    )
+    splits_df["Split"] = splits_df["Identifier"].duplicated(keep=False)
+    return splits_df
+
+
+def long_page(html, repeat):
+    """the fixture's activity rows repeated `repeat` times"""
+    container = '<div class="pvd-grid__grid pvd-grid__grid--gutter">'
+    head, rest = html.split(container)
+    rows, tail = rest.rsplit("\n    </div>\n", 1)
+    return head + container + rows * repeat + "\n    </div>\n" + tail
+
+
+def execution(time, price, quantity):
+    return {"dateTime": time, "price": price, "quantity": quantity}
+
+
+ACTIVITY = {
+    "data": {
+        "activity": {
+            "orders": [
+                {
+                    "orderId": "A2",
+                    "symbol": "AAPL",
+                    "action": "SELL",
+                    # 10:00:01 ET as epoch millis
+                    "executions": [execution(1718028001000, "190.10", 2)],
+                },
+                {
+                    "orderId": "A1",
+                    "symbol": "AAPL",
+                    "action": "BUY",
+                    "executions": [
+                        execution("2024-06-10T09:59:58", 1190.5, 1),
+                        execution("2024-06-10T09:59:59", 1190.25, 1),
+                    ],
+                },
+                {"orderId": "D1", "symbol": "SPAXX", "action": "DIVIDEND", "executions": []},
+            ]
+        }
+    }
+}
+OPTIONS = [
+    {
+        "orderId": "O1",
+        "symbol": "SPY",
+        "action": "Buy",
+        "option": {"strike": "530", "expiration": "2024-06-21", "type": "CALL"},
+        "executions": [execution("2024-06-10T13:30:00+00:00", 1.25, 1)],
+    }
+]
+
+
+class TestFidelityActivity:
+    def test_parse_activity_payloads(self):
+        # the same order seen twice when more results are loaded
+        df = Fidelity.parse_activity_payloads([ACTIVITY, OPTIONS, ACTIVITY])
+        assert list(df.columns) == SPLITS_COLUMNS
+        assert df["Broker Executed"].tolist() == [
+            "06:30:00",
+            "06:59:58",
+            "06:59:59",
+            "07:00:01",
+        ]
+        assert df["Symbol"].tolist() == ["SPY", "AAPL", "AAPL", "AAPL"]
+        assert df["Action"].tolist() == ["Buy", "Buy", "Buy", "Sell"]
+        assert df["Split"].tolist() == [False, True, True, False]
+        assert df["Price"].tolist() == ["1.2500", "1,190.5000", "1,190.2500", "190.1000"]
+        assert df["Dollar Amt"].tolist() == ["1.25", "1,190.50", "1,190.25", "380.20"]
+        assert df.loc[1, "Identifier"] == df.loc[2, "Identifier"]
+        assert df.loc[0, "Expiration"] == "Jun-21-2024"
+        assert df.loc[0, "Option Type"] == "Call"
+        assert pd.isna(df.loc[3, "Expiration"])
+        assert (df["Date"] == "06/10/2024").all()
+
+    def test_no_orders(self):
+        df = Fidelity.parse_activity_payloads([{"data": {"activity": None}}])
+        assert df.empty
+        assert list(df.columns) == SPLITS_COLUMNS
+
+    def test_unexpected_payload_falls_back(self):
+        class CaptureBrowser:
+            def captured_json(self, pattern):
+                # an order without executions details
+                order = {
+                    "orderId": "A1",
+                    "symbol": "AAPL",
+                    "action": "buy",
+                    "executions": [{}],
+                }
+                return [{"orders": [order]}]
+
+        fidelity = Fidelity.__new__(Fidelity)
+        df = fidelity._captured_activity(CaptureBrowser())
+        assert df.empty
+        assert list(df.columns) == SPLITS_COLUMNS
+
+    def test_unrelated_objects_are_not_orders(self):
+        quote = {"symbol": "AAPL", "executions": [execution(1718028001000, 1.0, 1)]}
+        assert Fidelity.parse_activity_payloads([{"quotes": [quote]}]).empty
+
+    def test_activity_browser_launch_failure(self, monkeypatch):
+        class Pool:
+            class primary:
+                @staticmethod
+                def save_cookies():
+                    pass
+
+        def launch_fails(**kwargs):
+            raise WebDriverException("chrome not reachable")
+
+        monkeypatch.setattr(fidelity_module, "CustomChromeInstance", launch_fails)
+        fidelity = Fidelity.__new__(Fidelity)
+        fidelity._broker_name = BrokerNames.FD
+        fidelity._pool = Pool()
+        assert fidelity._activity_browser() is None
+
+
+class TestFidelityHtml:
+    unopened = (FIXTURES / "activity_unopened.html").read_text()
+    opened = (FIXTURES / "activity_opened.html").read_text()
+
+    def test_unopened_matches_reference(self):
+        df = Fidelity._handle_unopened_data(self.unopened)
+        pd.testing.assert_frame_equal(df, reference_unopened())
+        assert df["Symbol"].tolist() == ["AAPL", "MSFT", "SPY", "QQQ"]
+        assert df.index.tolist() == [0, 1, 2, 4]
+        assert df.loc[4, "Expiration"] == "Jul-19-2024"
+
+    def test_opened_matches_reference(self):
+        df = Fidelity._handle_opened_data(self.opened)
+        pd.testing.assert_frame_equal(
+            df, reference_opened(self.opened), check_dtype=False
+        )
+        assert df["Identifier"].tolist() == [0, 0, 1, 2, 3, 4, 4]
+        assert df["Size"].tolist()[:3] == [6, 4, 5]
+        assert pd.isna(df.loc[4, "Broker Executed"])
+
+    def test_long_page_matches_reference(self):
+        unopened, opened = long_page(self.unopened, 40), long_page(self.opened, 40)
+        pd.testing.assert_frame_equal(
+            Fidelity._handle_unopened_data(unopened), reference_unopened(40)
+        )
+        df = Fidelity._handle_opened_data(opened)
+        assert len(df) == 7 * 40
+        pd.testing.assert_frame_equal(df, reference_opened(opened), check_dtype=False)
@@ -0,0 +1,56 @@
+import os
+
+from utils.memory import MB, MemoryWatchdog, process_tree_rss
+
+
+class FakeBrowser:
+    def __init__(self, label, rss):
+        self.label = label
+        self.rss = rss
+        self.restarts = 0
+        self.restartable = True
+
+    def memory_rss(self):
+        return self.rss
+
+    def can_restart(self):
+        return self.restartable
+
+    def restart(self):
+        self.restarts += 1
+        self.rss = 100 * MB
+        return True
+
+
+class TestMemory:
+    def test_process_tree_rss(self):
+        rss = process_tree_rss([os.getpid()])
+        assert rss > 0
+        # missing pids are ignored
+        assert process_tree_rss([2**22 + 1]) == 0
+
+    def test_restarts_only_when_allowed(self):
+        watchdog = MemoryWatchdog(browser_limit=500 * MB)
+        small, large = FakeBrowser("RH", 200 * MB), FakeBrowser("FD", 800 * MB)
+
+        samples = watchdog.check([small, large], can_recycle=False)
+        assert samples["FD"] == 800 * MB and "python" in samples
+        assert large.restarts == 0
+
+        watchdog.check([small, large], can_recycle=True)
+        assert (small.restarts, large.restarts) == (0, 1)
+        assert watchdog.trend("FD") == 0
+
+        # a browser that would need a manual login again is left running
+        large.rss, large.restartable = 800 * MB, False
+        watchdog.check([large], can_recycle=True)
+        assert large.restarts == 1
+
+    def test_trend(self):
+        watchdog = MemoryWatchdog()
+        browser = FakeBrowser("RH", 200 * MB)
+        watchdog.check([browser], can_recycle=True)
+        browser.rss = 260 * MB
+        watchdog.check([browser], can_recycle=True)
+        assert watchdog.trend("RH") == 60 * MB
+        assert watchdog.trend("missing") == 0
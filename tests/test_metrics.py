@@ -0,0 +1,128 @@
+import csv
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from utils import broker as broker_module
+from utils.broker import Broker
+from utils.metrics import LatencyHistogram, LatencyRecorder
+
+
+class TestLatencyHistogram:
+    def test_small_values_are_exact(self):
+        hist = LatencyHistogram()
+        for value in range(1, 101):
+            hist.record(value)
+        assert hist.count == 100
+        assert hist.min == 1
+        assert hist.max == 100
+        assert hist.percentile(50) == 50
+        assert hist.percentile(99) == 99
+        assert hist.percentile(100) == 100
+
+    def test_large_values_within_one_percent(self):
+        hist = LatencyHistogram()
+        values = [1_000 * i for i in range(1, 1001)]
+        for value in values:
+            hist.record(value)
+        for percent in [50, 90, 99]:
+            expected = values[int(percent / 100 * len(values)) - 1]
+            assert abs(hist.percentile(percent) - expected) / expected < 0.01
+
+    def test_merge(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.record(10)
+        second.record(5_000_000)
+        first.merge(second)
+        assert first.count == 2
+        assert first.min == 10
+        assert first.max == 5_000_000
+
+    def test_empty(self):
+        hist = LatencyHistogram()
+        assert hist.percentile(50) == 0
+        assert hist.mean() == 0.0
+
+
+class TestLatencyRecorder:
+    @pytest.fixture(autouse=True)
+    def pre_post_script(self):
+        curr_dir = Path(__file__).parent / "tmp"
+        curr_dir.mkdir(parents=True, exist_ok=True)
+        yield curr_dir
+        shutil.rmtree(curr_dir)
+
+    def test_export(self, pre_post_script):
+        recorder = LatencyRecorder()
+        recorder.record("FD", "submit", 1.5)
+        recorder.record("SB", "pre_quote", 0.25)
+        recorder.export("buy", pre_post_script)
+
+        prom = (pre_post_script / "metrics/latency.prom").read_text()
+        assert 'broker="FD",phase="submit",quantile="0.5"' in prom
+        assert 'trading_broker_phase_latency_seconds_count{broker="SB",phase="pre_quote"} 1' in prom
+
+        csv_file = next((pre_post_script / "metrics").glob("latency_*.csv"))
+        with open(csv_file) as file:
+            rows = list(csv.DictReader(file))
+        assert [(row["Broker"], row["Phase"]) for row in rows] == [
+            ("FD", "submit"),
+            ("SB", "pre_quote"),
+        ]
+        assert float(rows[0]["Max"]) == 1500.0
+
+        # interval histograms are cleared after every job, cumulative ones are not
+        recorder.export("sell", pre_post_script)
+        with open(csv_file) as file:
+            assert len(list(csv.DictReader(file))) == 2
+        assert recorder.get("FD", "submit").count == 1
+
+    def test_broker_phases_are_recorded(self, monkeypatch):
+        class FakeBroker(Broker):
+            def buy(self, order):
+                self._get_stock_data(order)
+                self._market_buy(order)
+                self._get_stock_data(order)
+
+            def _get_stock_data(self, sym):
+                pass
+
+            def _market_buy(self, order):
+                pass
+
+        for method in list(FakeBroker.__abstractmethods__):
+            setattr(FakeBroker, method, lambda *args: None)
+        FakeBroker.__abstractmethods__ = frozenset()
+
+        recorder = LatencyRecorder()
+        monkeypatch.setattr(broker_module, "LATENCY", recorder)
+        FakeBroker(Path("report.csv"), None).buy("AAPL")
+
+        for phase in ["buy", "pre_quote", "submit", "post_quote"]:
+            assert recorder.get("FakeBroker", phase).count == 1
+
+    def test_quota_wait_is_not_recorded(self, monkeypatch):
+        class FakeBroker(Broker):
+            def _get_stock_data(self, sym):
+                pass
+
+        for method in list(FakeBroker.__abstractmethods__):
+            setattr(FakeBroker, method, lambda *args: None)
+        FakeBroker.__abstractmethods__ = frozenset()
+
+        class SlowLimiter:
+            def acquire_phase(self, api, phase):
+                time.sleep(0.05)
+
+        recorder = LatencyRecorder()
+        monkeypatch.setattr(broker_module, "LATENCY", recorder)
+        monkeypatch.setattr(broker_module, "RATE_LIMITER", SlowLimiter())
+        # a quote before any submit on this thread is a pre_quote
+        monkeypatch.setattr(
+            broker_module._phase_state, "submitted", False, raising=False
+        )
+        FakeBroker(Path("report.csv"), None)._get_stock_data("AAPL")
+
+        assert recorder.get("FakeBroker", "pre_quote").max < 50_000  # micros
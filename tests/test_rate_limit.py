@@ -0,0 +1,49 @@
+import threading
+import time
+
+from utils.rate_limit import Priority, PriorityTokenBucket, RateLimiter
+
+
+class TestRateLimit:
+    def test_refill_rate(self):
+        bucket = PriorityTokenBucket(rate=20, burst=2, reserve=0)
+        start = time.perf_counter()
+        for _ in range(4):
+            assert bucket.acquire(Priority.SUBMIT)
+        # two from the burst, two refilled at 20/s
+        assert 0.08 <= time.perf_counter() - start < 0.5
+
+    def test_reserve_is_only_for_submit(self):
+        bucket = PriorityTokenBucket(rate=1, burst=2, reserve=1)
+        assert bucket.acquire(Priority.CONFIRM, timeout=0.01)
+        assert not bucket.acquire(Priority.CONFIRM, timeout=0.01)
+        assert bucket.acquire(Priority.SUBMIT, timeout=0.01)
+
+    def test_higher_priority_served_first(self):
+        bucket = PriorityTokenBucket(rate=10, burst=1, reserve=0)
+        assert bucket.acquire(Priority.SUBMIT)
+        order = []
+
+        def call(priority, delay):
+            time.sleep(delay)
+            bucket.acquire(priority)
+            order.append(priority)
+
+        threads = [
+            threading.Thread(target=call, args=(Priority.CONFIRM, 0)),
+            threading.Thread(target=call, args=(Priority.POST_QUOTE, 0.01)),
+            threading.Thread(target=call, args=(Priority.SUBMIT, 0.02)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert order == [Priority.SUBMIT, Priority.POST_QUOTE, Priority.CONFIRM]
+
+    def test_unlimited_api(self):
+        limiter = RateLimiter({"SB": (1, 1)})
+        start = time.perf_counter()
+        for _ in range(10):
+            limiter.acquire_phase("FD", "submit")
+            limiter.acquire_phase("SB", "save")
+        assert time.perf_counter() - start < 0.05
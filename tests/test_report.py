@@ -1,3 +1,6 @@
+import threading
+
+from utils.broker import Broker
 from utils.report.report import (
     ActionType,
     BrokerNames,
@@ -91,3 +94,29 @@ class TestReport:
         assert entry.order_id == "1234"
         assert entry.activity_id == "5678"
         assert entry.broker == BrokerNames.TD
+
+
+class TestReportFile:
+    def test_concurrent_legs_write_each_row_once(self, tmp_path):
+        class FakeBroker(Broker):
+            pass
+
+        for method in list(FakeBroker.__abstractmethods__):
+            setattr(FakeBroker, method, lambda *args: None)
+        FakeBroker.__abstractmethods__ = frozenset()
+        broker = FakeBroker(tmp_path / "report.csv", BrokerNames.FD)
+
+        def leg(name):
+            for i in range(200):
+                broker._add_report_to_file(f"{name},{i}\n")
+                broker._save_report_to_file()
+
+        legs = [threading.Thread(target=leg, args=(name,)) for name in "AB"]
+        for thread in legs:
+            thread.start()
+        for thread in legs:
+            thread.join()
+
+        rows = (tmp_path / "report.csv").read_text().splitlines()
+        expected = [f"{name},{i}" for name in "AB" for i in range(200)]
+        assert sorted(rows) == sorted(expected)
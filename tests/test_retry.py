@@ -0,0 +1,91 @@
+from pathlib import Path
+
+import httpx
+import pytest
+
+from brokers import Schwab
+from tests.fake_brokers import FakeSchwabServer, FaultConfig
+from utils import retry as retry_module
+from utils.retry import RETRIES, RetryableError, RetryPolicy, retry
+from utils.report.report import BrokerNames
+
+
+def http_error(status, headers=None):
+    request = httpx.Request("GET", "https://example.com")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+class Flaky:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def name(self):
+        return "TEST"
+
+    @retry(RetryPolicy(attempts=4, base_delay=0.01, deadline=None), op="flaky")
+    def call(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+class TestRetry:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self, monkeypatch):
+        self.waits = []
+        monkeypatch.setattr(retry_module.time, "sleep", self.waits.append)
+        RETRIES.reset()
+
+    def test_retries_transient_errors(self):
+        flaky = Flaky([http_error(503), TimeoutError(), RetryableError()])
+        assert flaky.call() == "ok"
+        assert flaky.calls == 4
+        assert RETRIES.get("TEST", "flaky") == {
+            "calls": 1, "attempts": 4, "retries": 3, "exhausted": 0, "fatal": 0
+        }  # fmt: skip
+
+    def test_fatal_errors_are_not_retried(self):
+        flaky = Flaky([http_error(400)])
+        with pytest.raises(httpx.HTTPStatusError):
+            flaky.call()
+        assert flaky.calls == 1
+        assert RETRIES.get("TEST", "flaky")["fatal"] == 1
+
+    def test_gives_up_after_attempts(self):
+        flaky = Flaky([ConnectionError()] * 5)
+        with pytest.raises(ConnectionError):
+            flaky.call()
+        assert flaky.calls == 4
+        assert RETRIES.get("TEST", "flaky")["exhausted"] == 1
+
+    def test_deadline(self):
+        policy = RetryPolicy(attempts=10, base_delay=10, max_delay=10, deadline=1)
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise http_error(429, {"Retry-After": "5"})
+
+        with pytest.raises(httpx.HTTPStatusError):
+            policy.run(fail, "TEST", "deadline")
+        # the server asked for 5s, more than the deadline allows
+        assert calls == [1] and self.waits == []
+
+    def test_backoff_is_capped_and_jittered(self):
+        policy = RetryPolicy(base_delay=1, max_delay=4)
+        waits = [policy.backoff(retry) for retry in range(10) for _ in range(20)]
+        assert all(0 <= wait <= 4 for wait in waits)
+        assert len(set(waits)) > 1
+        assert policy.backoff(0, http_error(429, {"Retry-After": "2"})) == 2
+
+    def test_schwab_quote_through_throttling(self):
+        faults = FaultConfig(throttle_rate=0.5, seed=1)
+        with FakeSchwabServer(faults) as server:
+            broker = Schwab(Path("report.csv"), BrokerNames.SB, base_url=server.base_url)
+            broker.login()
+            assert broker._get_stock_data("AAPL").ask == server.quote("AAPL")[0]
+            retries = RETRIES.get("SB", "get_stock_data")["retries"]
+            assert retries == server.throttled_count > 0
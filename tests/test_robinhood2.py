@@ -0,0 +1,92 @@
+import math
+import threading
+
+import ujson as json  # type: ignore[import-untyped]
+from selenium.common import WebDriverException
+
+from brokers.robinhood2 import Robinhood2
+from utils.broker import StockOrder
+from utils.report.report import StockData
+
+
+class FakeChrome:
+    def __init__(self, bodies=None):
+        self._bodies = bodies
+        self.fetched = []
+
+    def local_storage(self, key):
+        return json.dumps({"access_token": "token"})
+
+    def fetch_json(self, urls, headers, step):
+        self.fetched.append((urls, headers))
+        if self._bodies is None:
+            raise WebDriverException("401")
+        return self._bodies
+
+
+QUOTES = {
+    "results": [
+        {
+            "symbol": "AAPL",
+            "ask_price": "190.100000",
+            "bid_price": "190.000000",
+            "last_trade_price": "189.000000",
+            "last_extended_hours_trade_price": "189.500000",
+            "last_non_reg_trade_price": None,
+        },
+        None,
+    ]
+}
+FUNDAMENTALS = {"results": [{"symbol": "AAPL", "volume": "1000.000000"}, None]}
+
+
+class TestRobinhood2Quotes:
+    def make_broker(self, chrome):
+        broker = Robinhood2.__new__(Robinhood2)
+        broker._chrome_inst = chrome
+        broker._broker_name = None
+        broker._watched = []
+        broker._quote_batch = {}
+        broker._batch_time = -math.inf
+        broker._quote_lock = threading.Lock()
+        return broker
+
+    def test_quotes_from_api(self):
+        chrome = FakeChrome([QUOTES, FUNDAMENTALS])
+        broker = self.make_broker(chrome)
+        assert broker.get_quotes_web(["AAPL", "ZZZZ"]) == {
+            "AAPL": StockData(190.1, 190.0, 189.5, 1000.0)
+        }
+        urls, headers = chrome.fetched[0]
+        assert "symbols=AAPL,ZZZZ" in urls[0] and "symbols=AAPL,ZZZZ" in urls[1]
+        assert headers == {"Authorization": "Bearer token"}
+        assert broker.get_ask_and_bid_price_web("AAPL") == (190.1, 190.0)
+
+    def test_falls_back_to_page(self, monkeypatch):
+        broker = self.make_broker(FakeChrome())
+        scraped = StockData(1.0, 0.9, 0.95, 10.0)
+        monkeypatch.setattr(broker, "_scrape_stock_data", lambda sym: scraped)
+        assert broker._get_stock_data("AAPL") == scraped
+
+    def test_null_quote_falls_back_to_page(self, monkeypatch):
+        halted = dict(QUOTES["results"][0], ask_price=None, bid_price=None)
+        broker = self.make_broker(FakeChrome([{"results": [halted]}, FUNDAMENTALS]))
+        scraped = StockData(1.0, 0.9, 0.95, 10.0)
+        monkeypatch.setattr(broker, "_scrape_stock_data", lambda sym: scraped)
+        assert broker._get_stock_data("AAPL") == scraped
+
+    def test_group_is_quoted_in_one_request(self):
+        msft = dict(QUOTES["results"][0], symbol="MSFT")
+        quotes = {"results": [QUOTES["results"][0], msft]}
+        chrome = FakeChrome([quotes, FUNDAMENTALS])
+        broker = self.make_broker(chrome)
+        broker.watch_quotes([StockOrder("MSFT", 1), StockOrder("AAPL", 1)])
+
+        assert broker._get_stock_data("AAPL").ask == 190.1
+        assert broker._get_stock_data("MSFT").ask == 190.1
+        assert len(chrome.fetched) == 1
+        assert "symbols=AAPL,MSFT" in chrome.fetched[0][0][0]
+
+        broker._batch_time -= 1  # older than QUOTE_BATCH_MAX_AGE
+        broker._get_stock_data("AAPL")
+        assert len(chrome.fetched) == 2
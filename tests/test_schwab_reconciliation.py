@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from brokers import Schwab
+from tests.fake_brokers import FakeSchwabServer
+from utils.report.post_processing import PostProcessing
+from utils.report.report import BrokerNames
+from utils.report.report_utils import combine_schwab_orders, schwab_executions
+
+
+def order(order_id, price, size, time="2026-10-19T14:30:01+0000"):
+    return {
+        "orderId": order_id,
+        "orderActivityCollection": [
+            {
+                "activityType": "EXECUTION",
+                "activityId": order_id * 10,
+                "executionLegs": [{"quantity": size, "price": price, "time": time}],
+            }
+        ],
+    }
+
+
+class TestSchwabReconciliation:
+    def test_day_orders_are_paged(self):
+        with FakeSchwabServer() as server:
+            schwab = Schwab(Path(""), BrokerNames.SB, base_url=server.base_url)
+            schwab.login()
+            placed = [server.place_order("AAPL", "BUY", 1) for _ in range(5)]
+            start = datetime.now(timezone.utc) - timedelta(minutes=10)
+            # two orders share a second, pages are split by entered time
+            for seconds, fake in zip([0, 1, 2, 2, 3], placed):
+                fake.placed = start + timedelta(seconds=seconds)
+            requests = server.request_count
+
+            orders = schwab.get_day_orders(datetime.now(), page_size=2)
+            assert [o["orderId"] for o in orders] == [
+                fake.order_id for fake in reversed(placed)
+            ]
+            assert server.request_count - requests == 4
+
+    def test_repeated_symbol_joins_by_id(self):
+        report = pd.DataFrame(
+            {
+                "Broker": ["SB", "SB", "SB", "FD"],
+                "Symbol": ["AAPL", "AAPL", "MSFT", "AAPL"],
+                "Action": ["Buy"] * 4,
+                "Size": [1.0, 2.0, 3.0, 1.0],
+                "Price": np.nan,
+                "Dollar Amt": np.nan,
+                "Broker Executed": pd.NaT,
+                "Order ID": [101.0, 102.0, 103.0, np.nan],
+                "Activity ID": [1010.0, 1020.0, 1030.0, np.nan],
+            }
+        )
+        executions = schwab_executions(
+            [
+                order(101, 10.0, 1),
+                order(102, 11.0, 2, "2026-10-19T14:30:02+0000"),
+                {"orderId": 103, "status": "CANCELED"},
+            ]
+        )
+
+        df = combine_schwab_orders(report, executions)
+        assert len(df) == 4
+        assert list(df["Price"][:2]) == [10.0, 11.0]
+        assert list(df["Dollar Amt"][:2]) == [10.0, 22.0]
+        assert df["Broker Executed"][1].strftime("%X") == "07:30:02"
+        assert np.isnan(df["Price"][2])
+
+    def test_report_without_schwab_orders(self):
+        post = PostProcessing.__new__(PostProcessing)
+        fetched = []
+
+        def failing_orders(date):
+            fetched.append(date)
+            raise ConnectionError("token expired")
+
+        post._get_schwab_orders = failing_orders
+        date = datetime(2026, 10, 19)
+        report = pd.DataFrame({"Broker": ["FD", "SB"], "Price": np.nan})
+
+        # no SB rows, Schwab isn't asked
+        assert post._combine_schwab_data(report[:1], date).equals(report[:1])
+        assert fetched == []
+        # a failed fetch leaves the SB rows unreconciled
+        df = post._combine_schwab_data(report, date)
+        assert fetched == [date]
+        assert df["Price"].isna().all()
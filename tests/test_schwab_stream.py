@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+from brokers import Schwab
+from utils import broker
+from brokers.schwab_stream import STREAM_MAX_AGE, QuoteStream
+from tests.fake_brokers import FakeSchwabServer
+from utils.broker import OptionOrder, StockOrder
+from utils.rate_limit import RateLimiter
+from utils.report.report import BrokerNames, OptionData, OptionType, StockData
+
+QUOTE_TIME = datetime(2026, 10, 19, 14, 30, 1, tzinfo=timezone.utc)
+OPTION = OptionOrder("AAPL", OptionType.PUT, "150", "2026-11-20")
+
+
+def equity_tick(sym, **fields):
+    return {"service": "LEVELONE_EQUITIES", "content": [{"key": sym, **fields}]}
+
+
+FULL_TICK = equity_tick(
+    "AAPL",
+    BID_PRICE=99.5,
+    ASK_PRICE=100.5,
+    LAST_PRICE=100.0,
+    TOTAL_VOLUME=1000,
+    QUOTE_TIME_MILLIS=QUOTE_TIME.timestamp() * 1000,
+)
+
+
+class TestQuoteStream:
+    def test_ticks_are_merged(self):
+        now = [0.0]
+        stream = QuoteStream(None, clock=lambda: now[0])
+        stream.subscribe(["AAPL"], [])
+        assert stream.stock_data("AAPL") is None
+
+        stream._on_quote(FULL_TICK)
+        stream._on_quote(equity_tick("AAPL", LAST_PRICE=100.25))
+        stream._on_quote(equity_tick("MSFT", LAST_PRICE=1.0))  # not watched
+        quote = stream.stock_data("AAPL")
+        assert quote.data == StockData(100.5, 99.5, 100.25, 1000)
+        assert quote.quote_time == QUOTE_TIME
+        assert stream.stock_data("MSFT") is None
+
+        now[0] = STREAM_MAX_AGE + 1
+        assert stream.stale()
+        assert stream.stock_data("AAPL") is None
+
+    def test_next_group_drops_old_symbols(self):
+        stream = QuoteStream(None)
+        stream.subscribe(["AAPL"], [])
+        stream._on_quote(FULL_TICK)
+        stream.subscribe(["MSFT"], [])
+        assert stream.stock_data("AAPL") is None
+
+
+class TestSchwabStreamedQuotes:
+    def test_streamed_quote_and_rest_fallback(self):
+        now = [0.0]
+        with FakeSchwabServer() as server:
+            schwab = Schwab(Path(""), BrokerNames.SB, base_url=server.base_url)
+            schwab.login()
+            schwab._quote_stream = QuoteStream(None, clock=lambda: now[0])
+            schwab.watch_quotes([StockOrder("AAPL", 1), OPTION])
+            assert schwab._quote_stream._options == ["AAPL  261120P00150000"]
+            schwab._quote_stream._on_quote(FULL_TICK)
+
+            requests = server.request_count
+            assert schwab._get_stock_data("AAPL") == StockData(100.5, 99.5, 100.0, 1000)
+            assert server.request_count == requests
+
+            now[0] = STREAM_MAX_AGE + 1
+            assert schwab._get_stock_data("AAPL") != StockData(100.5, 99.5, 100.0, 1000)
+            assert server.request_count == requests + 1
+
+    def test_streamed_quote_skips_rate_limiter(self, monkeypatch):
+        acquired = []
+
+        class RecordingLimiter(RateLimiter):
+            def acquire_phase(self, api, phase):
+                acquired.append(phase)
+
+        monkeypatch.setattr(broker, "RATE_LIMITER", RecordingLimiter({}))
+        now = [0.0]
+        with FakeSchwabServer() as server:
+            schwab = Schwab(Path(""), BrokerNames.SB, base_url=server.base_url)
+            schwab.login()
+            schwab._quote_stream = QuoteStream(None, clock=lambda: now[0])
+            schwab.watch_quotes([StockOrder("AAPL", 1)])
+            schwab._quote_stream._on_quote(FULL_TICK)
+            schwab._get_stock_data("AAPL")
+            assert acquired == []
+
+            now[0] = STREAM_MAX_AGE + 1
+            schwab._get_stock_data("AAPL")
+            assert len(acquired) == 1
+
+    def test_streamed_option_quote(self):
+        stream = QuoteStream(None)
+        schwab = Schwab(Path(""), BrokerNames.SB)
+        schwab._quote_stream = stream
+        schwab.watch_quotes([OPTION])
+        greeks = dict(VOLATILITY=30.0, DELTA=-0.4, THETA=-0.1, GAMMA=0.02)
+        stream._on_quote(
+            {
+                "service": "LEVELONE_OPTIONS",
+                "content": [
+                    {
+                        "key": "AAPL  261120P00150000",
+                        "BID_PRICE": 2.5,
+                        "ASK_PRICE": 2.6,
+                        "LAST_PRICE": 2.55,
+                        "TOTAL_VOLUME": 10,
+                        "VEGA": 0.1,
+                        "RHO": -0.05,
+                        "UNDERLYING_PRICE": 148.12345,
+                        "MONEY_INTRINSIC_VALUE": 1.88,
+                        "QUOTE_TIME_MILLIS": QUOTE_TIME.timestamp() * 1000,
+                        **greeks,
+                    }
+                ],
+            }
+        )
+        assert schwab._get_option_data(OPTION) == OptionData(
+            2.6, 2.5, 2.55, 10, 30.0, -0.4, -0.1, 0.02, 0.1, -0.05, 148.1234, True
+        )
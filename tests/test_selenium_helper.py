@@ -0,0 +1,432 @@
+import base64
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from selenium.common import (
+    NoSuchElementException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.common.by import By
+
+import brokers  # noqa: F401  (utils.selenium_helper is imported through brokers)
+from utils import selenium_helper
+from utils.metrics import LATENCY
+from utils.selenium_helper import CustomChromeInstance
+
+
+class FakeElement:
+    def __init__(self, texts):
+        self._texts = iter(texts)
+
+    @property
+    def text(self):
+        return next(self._texts)
+
+
+class FakeDriver:
+    def __init__(self, element=None, script_results=()):
+        self._element = element
+        self._script_results = iter(script_results)
+        self.scripts = []
+
+    def find_element(self, by, value):
+        if self._element is None:
+            raise NoSuchElementException(value)
+        return self._element
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        return next(self._script_results)
+
+
+class RedirectDriver(FakeDriver):
+    """current_url goes through `urls` one read at a time and stays on the last"""
+
+    def __init__(self, urls):
+        super().__init__()
+        self._urls = list(urls)
+
+    @property
+    def current_url(self):
+        return self._urls.pop(0) if len(self._urls) > 1 else self._urls[0]
+
+
+class CookieDriver:
+    def __init__(self, cookies=(), logged_in=False):
+        self.cookies = list(cookies)
+        self.logged_in = logged_in
+        self.opened = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        if cmd == "Network.getAllCookies":
+            return {"cookies": self.cookies}
+        assert cmd == "Network.setCookies"
+        self.cookies = params["cookies"]
+        self.logged_in = any(cookie["name"] == "session" for cookie in self.cookies)
+        return {}
+
+    def get(self, url):
+        self.opened.append(url)
+
+    def find_element(self, by, value):
+        if not self.logged_in:
+            raise NoSuchElementException(value)
+        return object()
+
+
+def make_chrome(driver, profile="FD"):
+    """a CustomChromeInstance on a fake driver, without starting chrome"""
+    chrome = CustomChromeInstance.__new__(CustomChromeInstance)
+    chrome._driver = driver
+    chrome._name = "FD"
+    chrome._profile = profile
+    chrome._cookies_from = None
+    return chrome
+
+
+class TestWaits:
+    @pytest.fixture(autouse=True)
+    def reset_latency(self, monkeypatch):
+        monkeypatch.setattr(selenium_helper, "POLL_INTERVAL", 0.001)
+        LATENCY.reset()
+        yield
+        LATENCY.reset()
+
+    def test_wait_until_records_latency(self):
+        chrome = make_chrome(FakeDriver())
+        calls = itertools.count()
+        assert chrome.wait_until(lambda driver: next(calls) >= 3, "preview") is True
+        assert LATENCY.get("FD", "wait_preview").count == 1
+
+    def test_timeout_is_recorded(self):
+        chrome = make_chrome(FakeDriver())
+        with pytest.raises(TimeoutException):
+            chrome.wait_until(lambda driver: False, "preview", timeout=0.01)
+        hist = LATENCY.get("FD", "wait_preview")
+        assert hist.count == 1
+        assert hist.max >= 10_000  # micros
+
+    def test_missing_element_is_polled(self):
+        chrome = make_chrome(FakeDriver())
+        with pytest.raises(TimeoutException):
+            chrome.wait_text_stable(By.ID, "bid", timeout=0.01)
+
+    def test_text_stable(self):
+        texts = ["", "1.00", "1.05"] + ["1.10"] * 1000
+        chrome = make_chrome(FakeDriver(FakeElement(texts)))
+        assert chrome.wait_text_stable(By.ID, "bid", stable_for=0.01) == "1.10"
+        assert LATENCY.get("FD", "wait_text_stable").count == 1
+
+    def test_text_stable_waits_for_change(self):
+        # the previous symbol's bid holds before the new quote arrives
+        texts = ["1.10"] * 50 + ["2.20"] * 1000
+        chrome = make_chrome(FakeDriver(FakeElement(texts)))
+        bid = chrome.wait_text_stable(
+            By.ID, "bid", stable_for=0.001, changed_from="1.10"
+        )
+        assert bid == "2.20"
+
+    def test_url_change(self):
+        chrome = make_chrome(RedirectDriver(["/login"] * 3 + ["/home"]))
+        assert chrome.url == "/login"
+        assert chrome.wait_url_change("/login", step="login")
+        assert LATENCY.get("FD", "wait_login").count == 1
+        assert not chrome.wait_url_change("/home", timeout=0.01)
+
+    def test_network_idle_and_dom_quiet(self):
+        driver = FakeDriver(script_results=[False, False, True, True])
+        chrome = make_chrome(driver)
+        chrome.wait_network_idle(idle_for=0.2, step="order_page")
+        chrome.wait_dom_quiet(quiet_for=0.1)
+        assert [args for _, args in driver.scripts] == [(200,)] * 3 + [(100,)]
+        assert driver.scripts[0][0] == selenium_helper.NETWORK_IDLE_JS
+        assert driver.scripts[-1][0] == selenium_helper.DOM_QUIET_JS
+        assert LATENCY.get("FD", "wait_order_page").count == 1
+        assert LATENCY.get("FD", "wait_dom_quiet").count == 1
+
+
+class TestSessionReuse:
+    @pytest.fixture(autouse=True)
+    def profiles_dir(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(selenium_helper, "PROFILES_DIR", tmp_path)
+        monkeypatch.setattr(selenium_helper, "POLL_INTERVAL", 0.001)
+        return tmp_path
+
+    def test_cookies_round_trip(self, profiles_dir):
+        session = {
+            "name": "session",
+            "value": "abc",
+            "domain": ".fidelity.com",
+            "path": "/",
+            "expires": -1,
+            "size": 10,
+            "session": True,
+        }
+        remember = dict(session, name="remember", expires=2e9, session=False)
+        make_chrome(CookieDriver([session, remember])).save_cookies()
+        assert oct(os.stat(profiles_dir / "FD_cookies.json").st_mode & 0o777) == "0o600"
+        assert list(profiles_dir.glob("*.tmp")) == []
+
+        driver = CookieDriver()
+        assert make_chrome(driver).restore_cookies()
+        assert driver.cookies == [
+            {"name": "session", "value": "abc", "domain": ".fidelity.com", "path": "/"},
+            {
+                "name": "remember",
+                "value": "abc",
+                "domain": ".fidelity.com",
+                "path": "/",
+                "expires": 2e9,
+            },
+        ]
+
+    def test_expired_cookies_not_restored(self, monkeypatch):
+        make_chrome(CookieDriver([{"name": "session"}])).save_cookies()
+        later = datetime.now() + selenium_helper.SESSION_LIFETIME + timedelta(1)
+        monkeypatch.setattr(
+            selenium_helper, "datetime", type("Later", (datetime,), {"now": lambda: later})
+        )
+        assert not make_chrome(CookieDriver()).restore_cookies()
+
+    def test_resume_session(self):
+        url = "https://digital.fidelity.com/ticket"
+        profile_session = CookieDriver(logged_in=True)
+        assert make_chrome(profile_session).resume_session(url, By.ID, "t", 0.01)
+        assert profile_session.opened == [url]
+
+        make_chrome(CookieDriver([{"name": "session"}])).save_cookies()
+        cookies_only = CookieDriver()
+        assert make_chrome(cookies_only).resume_session(url, By.ID, "t", 0.01)
+        assert cookies_only.opened == [url, url]
+
+        assert not make_chrome(CookieDriver(), "VD").resume_session(
+            url, By.ID, "t", 0.01
+        )
+        assert not make_chrome(CookieDriver(), None).resume_session(
+            url, By.ID, "t", 0.01
+        )
+
+    def test_restart_needs_session_check(self):
+        driver = CookieDriver()
+        driver.quit = lambda: pytest.fail("browser closed")
+        chrome = make_chrome(driver)
+        chrome._session_check = None
+        assert not chrome.can_restart()
+        assert not chrome.restart()
+
+        # a manual login follows a failed resume, restart can check that session
+        url = "https://digital.fidelity.com/ticket"
+        assert not chrome.resume_session(url, By.ID, "t", 0.01)
+        assert chrome.can_restart()
+
+
+class TestLightweight:
+    def test_blocked_urls_respect_allowlist(self):
+        driver = CookieDriver()
+        commands = []
+        driver.execute_cdp_cmd = lambda cmd, params: commands.append((cmd, params))
+        chrome = make_chrome(driver)
+        chrome._block_urls(["*.svg"])
+        assert commands[0] == ("Network.enable", {})
+        blocked = commands[1][1]["urls"]
+        assert "*.svg" not in blocked
+        assert "*.png" in blocked and "*google-analytics.com*" in blocked
+
+    def test_open_records_page_load(self):
+        LATENCY.reset()
+        driver = CookieDriver()
+        chrome = make_chrome(driver)
+        chrome.open("https://robinhood.com/stocks/SPY", "stock_page")
+        assert driver.opened == ["https://robinhood.com/stocks/SPY"]
+        assert LATENCY.get("FD", "stock_page").count == 1
+        LATENCY.reset()
+
+
+class NetworkDriver:
+    def __init__(self, responses, bodies):
+        self._log = [
+            {
+                "message": json.dumps(
+                    {
+                        "message": {
+                            "method": "Network.responseReceived",
+                            "params": {"requestId": request_id, "response": response},
+                        }
+                    }
+                )
+            }
+            for request_id, response in responses
+        ]
+        self._log.append(
+            {"message": json.dumps({"message": {"method": "Page.loadEventFired"}})}
+        )
+        self._bodies = bodies
+
+    def get_log(self, kind):
+        assert kind == "performance"
+        log, self._log = self._log, []
+        return log
+
+    def execute_cdp_cmd(self, cmd, params):
+        assert cmd == "Network.getResponseBody"
+        if params["requestId"] not in self._bodies:
+            raise WebDriverException("No resource with given identifier found")
+        return self._bodies[params["requestId"]]
+
+
+class TestCapturedJson:
+    def test_matching_json_bodies(self):
+        json_type = "application/json"
+        driver = NetworkDriver(
+            [
+                ("1", {"url": "https://x.com/api/activity", "mimeType": json_type}),
+                ("2", {"url": "https://x.com/api/activity/more", "mimeType": json_type}),
+                ("3", {"url": "https://x.com/api/quote", "mimeType": json_type}),
+                ("4", {"url": "https://x.com/activity.css", "mimeType": "text/css"}),
+                ("5", {"url": "https://x.com/api/activity/gone", "mimeType": json_type}),
+            ],
+            {
+                "1": {"body": '{"page": 1}', "base64Encoded": False},
+                "2": {
+                    "body": base64.b64encode(b'{"page": 2}').decode(),
+                    "base64Encoded": True,
+                },
+                "3": {"body": '{"quote": 1}', "base64Encoded": False},
+            },
+        )
+        chrome = make_chrome(driver)
+        assert chrome.captured_json(r"/api/activity") == [{"page": 1}, {"page": 2}]
+        assert chrome.captured_json(r"/api/activity") == []
+
+
+class TestBrowserPool:
+    def make_pool(self):
+        created = []
+
+        def factory(category):
+            created.append(category)
+            return object()
+
+        return selenium_helper.BrowserPool(factory, ["STOCKS", "OPTIONS"]), created
+
+    def test_sessions_bind_the_thread(self):
+        pool, created = self.make_pool()
+        primary = pool.current()
+        assert created == ["STOCKS"]
+        with pool.session("OPTIONS") as browser:
+            assert pool.current() is browser is not primary
+            assert pool.category() == "OPTIONS"
+            # unknown categories share the primary
+            with pool.session("FRACTIONALS") as shared:
+                assert shared is primary
+            assert pool.current() is browser
+        assert pool.current() is primary
+
+        pool.share("OPTIONS")
+        with pool.session("OPTIONS") as browser:
+            assert browser is primary
+
+    def test_categories_overlap(self):
+        pool, _ = self.make_pool()
+        overlapping = threading.Barrier(2, timeout=1)
+
+        def trade(category):
+            with pool.session(category):
+                overlapping.wait()
+
+        threads = [
+            threading.Thread(target=trade, args=(category,))
+            for category in ("STOCKS", "OPTIONS")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not overlapping.broken
+
+
+class TestDownloads:
+    @pytest.fixture(autouse=True)
+    def watcher(self, monkeypatch, tmp_path):
+        watcher = selenium_helper.DownloadWatcher(tmp_path)
+        monkeypatch.setattr(selenium_helper, "DOWNLOADS", watcher)
+        monkeypatch.setattr(selenium_helper, "POLL_INTERVAL", 0.005)
+        return watcher
+
+    def download(self, path, delay):
+        def write():
+            partial = path.with_name(path.name + ".crdownload")
+            partial.write_text("Symbol,Quantity\n")
+            time.sleep(delay)
+            partial.rename(path)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        return thread
+
+    def test_parallel_downloads(self, tmp_path):
+        (tmp_path / "old.csv").write_text("old")
+        chrome = make_chrome(CookieDriver())
+        first = chrome.expect_download("*.csv", timeout=1)
+        second = chrome.expect_download("*.csv", timeout=1)
+        threads = [
+            self.download(tmp_path / "a.csv", 0.1),
+            self.download(tmp_path / "b.csv", 0.05),
+        ]
+        # the first finished file goes to whichever pending asks first
+        assert first.result() == tmp_path / "b.csv"
+        assert second.result() == tmp_path / "a.csv"
+        assert first.result() == tmp_path / "b.csv"
+        for thread in threads:
+            thread.join()
+
+    def test_timeout(self, tmp_path):
+        chrome = make_chrome(CookieDriver())
+        pending = chrome.expect_download("Portfolio_*.csv", timeout=0.05)
+        thread = self.download(tmp_path / "Portfolio_Positions.csv", 0.2)
+        with pytest.raises(TimeoutException):
+            pending.result()
+        thread.join()
+
+
+class FetchDriver:
+    def __init__(self, responses):
+        self._responses = responses
+        self.calls = []
+
+    def set_script_timeout(self, timeout):
+        self.timeout = timeout
+
+    def execute_async_script(self, script, urls, headers, timeout):
+        self.calls.append((urls, headers, timeout))
+        if isinstance(self._responses, str):
+            return {"error": self._responses}
+        return {
+            "results": [
+                {"url": url, "status": status, "body": body}
+                for url, (status, body) in zip(urls, map(self._responses.get, urls))
+            ]
+        }
+
+
+class TestFetchJson:
+    def test_bodies_in_order(self):
+        driver = FetchDriver({"/a": (200, '{"a": 1}'), "/b": (200, "[2]")})
+        chrome = make_chrome(driver)
+        assert chrome.fetch_json(["/b", "/a"], {"X": "1"}, timeout=2) == [[2], {"a": 1}]
+        assert driver.calls == [(["/b", "/a"], {"X": "1"}, 2000)]
+        assert driver.timeout == 3
+
+    def test_errors(self):
+        chrome = make_chrome(FetchDriver({"/a": (401, "{}")}))
+        with pytest.raises(WebDriverException, match="401"):
+            chrome.fetch_json(["/a"])
+        chrome = make_chrome(FetchDriver("AbortError"))
+        with pytest.raises(WebDriverException, match="AbortError"):
+            chrome.fetch_json(["/a"])
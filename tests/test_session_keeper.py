@@ -0,0 +1,111 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from brokers import ETrade
+from brokers.etrade import ETRADE_TIMEZONE, token_expiry
+from tests.fake_brokers import FakeETradeServer
+from utils.report.report import BrokerNames
+from utils.session_keeper import MIN_IDLE_GAP, SessionKeeper
+
+NOW = datetime(2026, 10, 19, 15, 0, tzinfo=timezone.utc)
+
+
+class FakeBroker:
+    SESSION_REFRESH_INTERVAL = 60
+    REAUTH_WARNING = timedelta(hours=12)
+
+    def __init__(self, name, expires=None):
+        self._broker_name = name
+        self.expires = expires
+        self.refreshed = 0
+        self.failing = False
+
+    def name(self):
+        return self._broker_name
+
+    def session(self, category):
+        return nullcontext()
+
+    def refresh_session(self):
+        if self.failing:
+            raise ConnectionError("token endpoint down")
+        self.refreshed += 1
+
+    def session_expires(self):
+        return self.expires
+
+
+class TestSessionKeeper:
+    def test_refreshes_overdue_broker_between_jobs(self):
+        now = [0.0]
+        browser = FakeBroker("FD")
+        browser.SESSION_REFRESH_INTERVAL = None
+        etrade, schwab = FakeBroker("ET"), FakeBroker("SB")
+        schwab.SESSION_REFRESH_INTERVAL = 30
+        keeper = SessionKeeper([browser, etrade, schwab], clock=lambda: now[0])
+
+        keeper.maintain(None)
+        assert etrade.refreshed == schwab.refreshed == 0
+
+        now[0] = 100
+        keeper.maintain(MIN_IDLE_GAP - 1)  # next job too close
+        assert etrade.refreshed == schwab.refreshed == 0
+        # one per call, the most overdue first
+        keeper.maintain(MIN_IDLE_GAP)
+        assert (etrade.refreshed, schwab.refreshed) == (0, 1)
+        keeper.maintain(None)
+        assert (etrade.refreshed, schwab.refreshed) == (1, 1)
+        keeper.maintain(None)
+        assert (etrade.refreshed, schwab.refreshed) == (1, 1)
+        assert browser.refreshed == 0
+
+    def test_failed_refresh_waits_for_next_interval(self):
+        now = [100.0]
+        broker = FakeBroker("ET")
+        broker.failing = True
+        keeper = SessionKeeper([broker], clock=lambda: now[0])
+        now[0] = 200
+        keeper.maintain(None)
+        broker.failing = False
+        keeper.maintain(None)
+        assert broker.refreshed == 0
+        now[0] = 260
+        keeper.maintain(None)
+        assert broker.refreshed == 1
+
+    def test_expiring_sessions(self):
+        soon = FakeBroker("ET", NOW + timedelta(hours=9))
+        later = FakeBroker("SB", NOW + timedelta(days=3))
+        keeper = SessionKeeper([soon, later, FakeBroker("E2")], now=lambda: NOW)
+        assert keeper.check_expiry() == ["ET"]
+
+    def test_etrade_daily_expiry_warns_late(self):
+        broker = FakeBroker("ET", NOW + timedelta(hours=9))
+        broker.REAUTH_WARNING = ETrade.REAUTH_WARNING
+        keeper = SessionKeeper([broker], now=lambda: NOW)
+        assert keeper.check_expiry() == []
+        broker.expires = NOW + timedelta(minutes=30)
+        assert keeper.check_expiry() == ["ET"]
+
+
+class TestETradeSession:
+    def test_token_expiry(self):
+        issued = datetime(2026, 10, 19, 23, 30, tzinfo=ETRADE_TIMEZONE)
+        assert token_expiry(issued) == datetime(
+            2026, 10, 20, tzinfo=ETRADE_TIMEZONE
+        )
+        # 03:30 UTC is still the previous day in New York
+        issued = datetime(2026, 10, 20, 3, 30, tzinfo=timezone.utc)
+        assert token_expiry(issued) == datetime(
+            2026, 10, 20, tzinfo=ETRADE_TIMEZONE
+        )
+
+    def test_refresh_keeps_connection_busy(self):
+        with FakeETradeServer() as server:
+            broker = ETrade(Path("report.csv"), BrokerNames.ET, base_url=server.base_url)
+            broker.login()
+            requests = server.request_count
+            broker.refresh_session()
+            assert server.request_count == requests + 1
+            assert broker.session_expires() is None
@@ -0,0 +1,108 @@
+import stat
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from brokers import ETrade
+from brokers import etrade
+from brokers.etrade import ETRADE_TIMEZONE
+from utils.report.report import BrokerNames
+from utils.token_cache import TokenCache
+
+
+class FakeOAuth:
+    logins = 0
+
+    def __init__(self, key, secret):
+        pass
+
+    def get_request_token(self):
+        return "https://us.etrade.com/e/t/etws/authorize"
+
+    def get_access_token(self, verifier):
+        FakeOAuth.logins += 1
+        return {"oauth_token": "new", "oauth_token_secret": "new-secret"}
+
+
+class FakeAccessManager:
+    renewed = []
+
+    def __init__(self, key, secret, token, token_secret):
+        self._token = token
+
+    def renew_access_token(self):
+        FakeAccessManager.renewed.append(self._token)
+        return True
+
+
+class TestTokenCache:
+    def test_owner_only_file(self, tmp_path):
+        path = tmp_path / "tokens.json"
+        cache = TokenCache(path)
+        cache.save("ET", {"oauth_token": "a"})
+        cache.save("E2", {"oauth_token": "b"})
+        assert stat.S_IMODE(path.stat().st_mode) == 0o600
+        assert cache.load("ET") == {"oauth_token": "a"}
+        cache.clear("ET")
+        assert cache.load("ET") is None and cache.load("E2") is not None
+
+    def test_unreadable_cache_is_empty(self, tmp_path):
+        path = tmp_path / "tokens.json"
+        path.write_text("{not json")
+        assert TokenCache(path).load("ET") is None
+
+
+class TestETradeTokenCache:
+    @pytest.fixture(autouse=True)
+    def fake_oauth(self, monkeypatch):
+        FakeOAuth.logins = 0
+        FakeAccessManager.renewed = []
+        monkeypatch.setattr(etrade.pyetrade, "ETradeOAuth", FakeOAuth)
+        monkeypatch.setattr(etrade.pyetrade, "ETradeAccessManager", FakeAccessManager)
+        monkeypatch.setattr("builtins.input", lambda prompt: "12345")
+        monkeypatch.setattr(ETrade, "warm_up", lambda self: None)
+
+    def make_broker(self, tmp_path):
+        return ETrade(
+            Path("report.csv"),
+            BrokerNames.ET,
+            base_url="",
+            token_path=str(tmp_path / "tokens.json"),
+        )
+
+    def test_failed_login_is_not_cached(self, tmp_path, monkeypatch):
+        def rejected(self, verifier):
+            raise ValueError("verifier rejected")
+
+        monkeypatch.setattr(FakeOAuth, "get_access_token", rejected)
+        with pytest.raises(ValueError, match="verifier rejected"):
+            self.make_broker(tmp_path).login()
+        assert not (tmp_path / "tokens.json").exists()
+
+    def test_restart_reuses_token(self, tmp_path):
+        self.make_broker(tmp_path).login()
+        assert FakeOAuth.logins == 1
+
+        broker = self.make_broker(tmp_path)
+        broker.login()
+        assert FakeOAuth.logins == 1
+        assert FakeAccessManager.renewed == ["new"]
+        assert broker._tokens["oauth_token_secret"] == "new-secret"
+
+    def test_expired_token_logs_in_again(self, tmp_path):
+        yesterday = datetime.now(ETRADE_TIMEZONE) - timedelta(days=1)
+        TokenCache(tmp_path / "tokens.json").save(
+            "ET",
+            {
+                "consumer_key": self.make_broker(tmp_path)._consumer_key,
+                "oauth_token": "old",
+                "oauth_token_secret": "old-secret",
+                "issued": yesterday.isoformat(),
+            },
+        )
+        broker = self.make_broker(tmp_path)
+        broker.login()
+        assert FakeOAuth.logins == 1
+        assert FakeAccessManager.renewed == []
+        assert broker._tokens["oauth_token"] == "new"
@@ -0,0 +1,85 @@
+import shutil
+from pathlib import Path
+
+import pytest
+import ujson as json  # type: ignore[import-untyped]
+
+from utils.tracing import Tracer, trace_methods, traced
+
+
+class TestTracer:
+    @pytest.fixture(autouse=True)
+    def pre_post_script(self):
+        curr_dir = Path(__file__).parent / "tmp"
+        curr_dir.mkdir(parents=True, exist_ok=True)
+        yield curr_dir
+        shutil.rmtree(curr_dir)
+
+    def read_events(self, curr_dir):
+        trace_file = next((curr_dir / "traces").glob("trace_*.json"))
+        # viewers accept the array without the closing bracket, json does not
+        content = trace_file.read_text().rstrip().rstrip(",") + "]"
+        return json.loads(content)
+
+    def test_disabled_tracer_writes_nothing(self, pre_post_script):
+        tracer = Tracer()
+        with tracer.span("job"):
+            pass
+        tracer.flush()
+        assert not (pre_post_script / "traces").exists()
+
+    def test_nested_spans_flush_on_outermost(self, pre_post_script):
+        tracer = Tracer()
+        tracer.enable(pre_post_script)
+        with tracer.span("job", "job"):
+            with tracer.span("FD.buy", "broker", phase="buy"):
+                pass
+            assert not (pre_post_script / "traces").exists()
+
+        events = self.read_events(pre_post_script)
+        assert [event["name"] for event in events] == ["FD.buy", "job"]
+        assert all(event["ph"] == "X" for event in events)
+        assert events[0]["args"] == {"phase": "buy"}
+        assert events[1]["ts"] <= events[0]["ts"]
+        assert events[1]["dur"] >= events[0]["dur"]
+
+    def test_runs_append_to_same_file(self, pre_post_script, monkeypatch):
+        tracer = Tracer()
+        tracer.enable(pre_post_script)
+        monkeypatch.setattr("utils.tracing.TRACER", tracer)
+
+        @traced(cat="selenium")
+        def find(by, elem):
+            return elem
+
+        assert find("xpath", '//*[@id="USER"]') == '//*[@id="USER"]'
+        with tracer.span("second run"):
+            pass
+
+        events = self.read_events(pre_post_script)
+        assert len(events) == 2
+        assert events[0]["args"] == {"by": "xpath", "elem": '//*[@id="USER"]'}
+
+    def test_typed_text_is_not_recorded(self, pre_post_script, monkeypatch):
+        tracer = Tracer()
+        tracer.enable(pre_post_script)
+        monkeypatch.setattr("utils.tracing.TRACER", tracer)
+
+        @trace_methods("selenium")
+        class Browser:
+            def sendKeyboardInput(self, elem, input):
+                pass
+
+            def login(self, username, password):
+                pass
+
+        Browser().sendKeyboardInput("USER", "hunter2-secret")
+        Browser().login("user", password="hunter2-secret")
+
+        events = self.read_events(pre_post_script)
+        assert [event["name"] for event in events] == [
+            "Browser.sendKeyboardInput",
+            "Browser.login",
+        ]
+        assert "hunter2-secret" not in json.dumps(events)
+        assert all("args" not in event for event in events)
@@ -0,0 +1,206 @@
+import asyncio
+import csv
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import schedule
+
+from brokers import trading
+from utils.async_broker import ThreadedAsyncBroker
+from utils.broker import StagedOrder, StockOrder
+from utils.circuit_breaker import CircuitBreaker, CircuitState, SkippedOrders
+from utils.report.report import ActionType
+
+
+class FakeBroker:
+    MAIN_THREAD_ONLY = False
+
+    def __init__(self, name, delay=0.0):
+        self._broker_name = name
+        self._delay = delay
+        self.traded = []
+        self.threads = set()
+        self.failing = False
+        self._lock = threading.RLock()
+
+    def name(self):
+        return self._broker_name
+
+    def session(self, category):
+        return self._lock
+
+    def warm_up(self):
+        time.sleep(self._delay)
+        self.threads.add(threading.current_thread().name)
+
+    def stage(self, order, action):
+        time.sleep(self._delay)
+        return StagedOrder(order, action, {"ticket": True})
+
+    def buy(self, order):
+        if self.failing:
+            raise ConnectionError(f"{self._broker_name} is down")
+        time.sleep(self._delay)
+        self.threads.add(threading.current_thread().name)
+        self.traded.append(order.sym)
+
+
+class FakeAsyncBroker:
+    def __init__(self, name, delay=0.0):
+        self._broker_name = name
+        self._delay = delay
+        self.traded = []
+
+    def name(self):
+        return self._broker_name
+
+    async def buy(self, order):
+        await asyncio.sleep(self._delay)
+        self.traded.append(order.sym)
+
+
+class FakeManager:
+    def __init__(self):
+        self.values = {"COMPLETED": 0}
+
+    def set(self, key, value):
+        self.values[key] = value
+
+    def get(self, key):
+        return self.values[key]
+
+    def increment(self, key, amount=1):
+        self.values[key] += amount
+
+
+class TestLegs:
+    def make_trader(self, brokers):
+        trader = trading.AutomatedTrading.__new__(trading.AutomatedTrading)
+        trader._brokers = brokers
+        trader._manager = FakeManager()
+        trader._staged = {}
+        trader._leg_workers = trading.ThreadPoolExecutor(3)
+        trader._prep_workers = trading.ThreadPoolExecutor(3)
+        trader._breakers = {}
+        trader._skipped = SkippedOrders(self.base_path)
+        trader._loop = None
+        return trader
+
+    @pytest.fixture(autouse=True)
+    def base_path(self, tmp_path):
+        self.base_path = tmp_path
+
+    def test_legs_run_concurrently(self, monkeypatch):
+        monkeypatch.setattr(trading.time, "sleep", lambda _: None)
+        stocks, fractionals = FakeBroker("SB", 0.2), FakeBroker("FD", 0.2)
+        main = FakeBroker("IF")
+        main.MAIN_THREAD_ONLY = True
+        trader = self.make_trader([stocks, fractionals, main])
+
+        start = time.perf_counter()
+        trader._perform_legs(
+            [
+                (["SB"], [StockOrder("AAPL", 1)], "STOCKS", ActionType.BUY),
+                (["FD"], [StockOrder("AAPL", 0.5)], "FRACTIONALS", ActionType.BUY),
+                (["IF"], [StockOrder("MSFT", 1)], "OPTIONS", ActionType.BUY),
+            ]
+        )
+        assert time.perf_counter() - start < 0.35
+        assert stocks.traded == fractionals.traded == ["AAPL"]
+        assert main.threads == {threading.current_thread().name}
+        assert trader._manager.get("COMPLETED") == 3
+
+    def test_async_orders_run_concurrently(self):
+        native, threaded = FakeAsyncBroker("SB", 0.2), FakeBroker("FD", 0.2)
+        trader = self.make_trader([FakeBroker("SB"), threaded])
+        trader._loop = asyncio.new_event_loop()
+        trader._async_brokers = {
+            "SB": native,
+            "FD": ThreadedAsyncBroker(threaded),
+        }
+        orders = [StockOrder(sym, 1) for sym in ["AAPL", "MSFT", "GME"]]
+
+        start = time.perf_counter()
+        trader._perform_legs(
+            [
+                (["SB"], orders, "STOCKS", ActionType.BUY),
+                (["FD"], [StockOrder("AAPL", 0.5)], "FRACTIONALS", ActionType.BUY),
+            ]
+        )
+        assert time.perf_counter() - start < 0.35
+        assert sorted(native.traded) == ["AAPL", "GME", "MSFT"]
+        assert threaded.threads == {"FD-FRACTIONALS_0"}
+        assert trader._manager.get("COMPLETED") == 4
+        trader._loop.close()
+
+    def test_slow_prep_doesnt_hold_up_the_trigger(self, monkeypatch):
+        monkeypatch.setattr(trading, "WARM_UP_TIMEOUT", 0.05)
+        monkeypatch.setattr(trading, "STAGE_TIMEOUT", 0.05)
+        slow, fast = FakeBroker("SB", 0.5), FakeBroker("E2")
+        trader = self.make_trader([slow, fast])
+
+        start = time.perf_counter()
+        trader._warm_up_brokers()
+        order = StockOrder("AAPL", 1)
+        trader._stage_legs([(["SB", "E2"], [order], "STOCKS", ActionType.BUY)])
+        assert time.perf_counter() - start < 0.3
+        assert fast.threads and threading.current_thread().name not in fast.threads
+        # the late stage is dropped, that order is placed in full
+        assert list(trader._staged) == [("E2", ActionType.BUY, str(order))]
+
+    def test_open_circuit_skips_broker(self, monkeypatch):
+        monkeypatch.setattr(trading.time, "sleep", lambda _: None)
+        down, healthy = FakeBroker("SB"), FakeBroker("E2")
+        down.failing = True
+        trader = self.make_trader([down, healthy])
+        orders = [StockOrder(sym, 1) for sym in ["AAPL", "MSFT", "GME", "TSLA"]]
+
+        trader._perform_action([down, healthy], orders, ActionType.BUY)
+        assert healthy.traded == ["AAPL", "MSFT", "GME", "TSLA"]
+        assert trader._breakers["SB"].state == CircuitState.OPEN
+        skipped = next((self.base_path / "reports" / "skipped").iterdir())
+        with open(skipped) as file:
+            rows = list(csv.DictReader(file))
+        assert [(row["Broker"], row["Symbol"]) for row in rows] == [("SB", "TSLA")]
+
+
+class TestSchedule:
+    def test_passed_lead_jobs_are_skipped(self):
+        trader = trading.AutomatedTrading.__new__(trading.AutomatedTrading)
+        schedule.clear()
+        try:
+            now = datetime.now()
+            trader._schedule_ahead(now - timedelta(seconds=1), trader._stage_sell)
+            assert schedule.get_jobs() == []
+            trader._schedule_ahead(now + timedelta(minutes=1), trader._stage_sell)
+            assert schedule.idle_seconds() < 120
+        finally:
+            schedule.clear()
+
+
+class TestCircuitBreaker:
+    def test_half_open_probe(self):
+        now = [0.0]
+        breaker = CircuitBreaker(
+            "SB", threshold=2, window=10, cooldown=30, clock=lambda: now[0]
+        )
+        breaker.record_failure()
+        now[0] = 20  # outside the window, the first failure no longer counts
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+
+        now[0] = 51
+        assert breaker.allow() and breaker.state == CircuitState.HALF_OPEN
+        # only one probe at a time
+        assert not breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN and not breaker.allow()
+
+        now[0] = 82
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitState.CLOSED and breaker.allow()
@@ -0,0 +1,186 @@
+"""
+asyncio counterpart of utils.broker.Broker. Brokers with an async client (Schwab,
+IBKR) implement it natively, every other broker is wrapped in ThreadedAsyncBroker, so
+AutomatedTrading can keep all of a group's orders in flight on one event loop.
+"""
+
+import asyncio
+import contextvars
+import functools
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, cast
+
+from utils.broker import (
+    ACTION_PHASES,
+    PHASES,
+    Broker,
+    OptionOrder,
+    StagedOrder,
+    StockOrder,
+)
+from utils.metrics import LATENCY
+from utils.rate_limit import PHASE_PRIORITY, RATE_LIMITER
+from utils.report.report import ActionType, StockData
+
+# order category (STOCKS, FRACTIONALS, OPTIONS) of the running task, threaded brokers
+# enter broker.session(<category>) with it
+ORDER_CATEGORY: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "order_category", default="STOCKS"
+)
+# per task, each order runs in its own task so overlapping orders don't mix them up
+_submitted: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "submitted", default=False
+)
+
+
+def _timed_async_phase(
+    phase: str, func: Callable[..., Awaitable[Any]]
+) -> Callable[..., Awaitable[Any]]:
+    @functools.wraps(func)
+    async def wrapper(self: "AsyncBroker", *args: Any, **kwargs: Any) -> Any:
+        return await self._run_phase(phase, func, *args, **kwargs)
+
+    wrapper._phase = phase  # type: ignore[attr-defined]
+    return wrapper
+
+
+class AsyncBroker(ABC):
+    """
+    phases are timed into LATENCY like Broker's (not traced, the tracer's spans are
+    per thread). Subclasses that only delegate to a Broker, which times its own
+    phases, are declared with `timed=False`
+    """
+
+    def __init_subclass__(cls, timed: bool = True, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if not timed:
+            return
+        for method_name, phase in PHASES.items():
+            method = cls.__dict__.get(method_name)
+            if asyncio.iscoroutinefunction(method) and not hasattr(method, "_phase"):
+                setattr(cls, method_name, _timed_async_phase(phase, method))
+
+    async def _run_phase(
+        self, phase: str, func: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any
+    ) -> Any:
+        if phase in ACTION_PHASES:
+            _submitted.set(False)
+        elif phase == "quote":
+            phase = "post_quote" if _submitted.get() else "pre_quote"
+
+        # queueing for quota is not part of the phase's latency
+        if phase in PHASE_PRIORITY and self._rate_limited(phase, *args):
+            await asyncio.to_thread(RATE_LIMITER.acquire_phase, self.name(), phase)
+        start = time.perf_counter()
+        try:
+            return await func(self, *args, **kwargs)
+        finally:
+            LATENCY.record(self.name(), phase, time.perf_counter() - start)
+            if phase == "submit":
+                _submitted.set(True)
+
+    async def warm_up(self) -> None:
+        """see Broker.warm_up"""
+
+    def _rate_limited(self, phase: str, *args: Any) -> bool:
+        """see Broker._rate_limited"""
+        return True
+
+    async def commit(self, staged: StagedOrder) -> None:
+        """see Broker.commit"""
+        order = staged.order
+        if staged.action == ActionType.BUY:
+            await self.buy(cast(StockOrder, order))
+        elif staged.action == ActionType.SELL:
+            await self.sell(cast(StockOrder, order))
+        elif staged.action == ActionType.OPEN:
+            await self.buy_option(cast(OptionOrder, order))
+        else:
+            await self.sell_option(cast(OptionOrder, order))
+
+    @abstractmethod
+    def name(self) -> str:
+        pass
+
+    @abstractmethod
+    async def login(self) -> None:
+        pass
+
+    @abstractmethod
+    async def buy(self, order: StockOrder) -> None:
+        pass
+
+    @abstractmethod
+    async def sell(self, order: StockOrder) -> None:
+        pass
+
+    @abstractmethod
+    async def buy_option(self, order: OptionOrder) -> None:
+        pass
+
+    @abstractmethod
+    async def sell_option(self, order: OptionOrder) -> None:
+        pass
+
+    @abstractmethod
+    async def _get_stock_data(self, sym: str) -> StockData:
+        pass
+
+
+class ThreadedAsyncBroker(AsyncBroker, timed=False):
+    """
+    runs a synchronous broker's calls off the event loop, one worker thread per order
+    category so a browser broker only overlaps the categories it has sessions for
+    """
+
+    def __init__(self, broker: Broker) -> None:
+        if broker.MAIN_THREAD_ONLY:
+            raise ValueError(f"{broker.name()} can only be called on the main thread")
+        self._broker = broker
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+
+    def name(self) -> str:
+        return self._broker.name()
+
+    async def _call(self, func: Callable[..., Any], *args: Any) -> Any:
+        category = ORDER_CATEGORY.get()
+        executor = self._executors.get(category)
+        if executor is None:
+            executor = ThreadPoolExecutor(1, f"{self.name()}-{category}")
+            self._executors[category] = executor
+
+        def run() -> Any:
+            with self._broker.session(category):
+                return func(*args)
+
+        return await asyncio.get_running_loop().run_in_executor(executor, run)
+
+    async def login(self) -> None:
+        await self._call(self._broker.login)
+
+    async def warm_up(self) -> None:
+        await self._call(self._broker.warm_up)
+
+    async def commit(self, staged: StagedOrder) -> None:
+        await self._call(self._broker.commit, staged)
+
+    async def buy(self, order: StockOrder) -> None:
+        await self._call(self._broker.buy, order)
+
+    async def sell(self, order: StockOrder) -> None:
+        await self._call(self._broker.sell, order)
+
+    async def buy_option(self, order: OptionOrder) -> None:
+        await self._call(self._broker.buy_option, order)
+
+    async def sell_option(self, order: OptionOrder) -> None:
+        await self._call(self._broker.sell_option, order)
+
+    async def _get_stock_data(self, sym: str) -> StockData:
+        return cast(StockData, await self._call(self._broker._get_stock_data, sym))
+
+    def shutdown(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=False)
@@ -0,0 +1,67 @@
+"""
+The broker client libraries hardcode their API hosts, these helpers send their requests to
+another base url instead (e.g. the fake broker servers in tests/fake_brokers) while
+leaving the path and query untouched.
+"""
+
+from typing import Any
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+
+
+def rewrite_url(url: str, base_url: str) -> str:
+    target = urlsplit(base_url)
+    parts = urlsplit(url)
+    return urlunsplit(
+        (
+            target.scheme,
+            target.netloc,
+            target.path.rstrip("/") + parts.path,
+            parts.query,
+            parts.fragment,
+        )
+    )
+
+
+class RedirectAdapter(HTTPAdapter):
+    """
+    requests adapter, mount it on a session for the host being replaced:
+    session.mount("https://api.robinhood.com/", RedirectAdapter(base_url))
+    """
+
+    def __init__(self, base_url: str, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._base_url = base_url
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:  # type: ignore[override]
+        request.url = rewrite_url(str(request.url), self._base_url)
+        return super().send(request, **kwargs)
+
+
+class RedirectTransport(httpx.HTTPTransport):
+    """httpx transport, used as httpx.Client(transport=RedirectTransport(base_url))"""
+
+    def __init__(self, base_url: str, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._base_url = base_url
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = httpx.URL(rewrite_url(str(request.url), self._base_url))
+        request.headers["Host"] = request.url.netloc.decode()
+        return super().handle_request(request)
+
+
+class AsyncRedirectTransport(httpx.AsyncHTTPTransport):
+    """RedirectTransport for httpx.AsyncClient"""
+
+    def __init__(self, base_url: str, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._base_url = base_url
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = httpx.URL(rewrite_url(str(request.url), self._base_url))
+        request.headers["Host"] = request.url.netloc.decode()
+        return await super().handle_async_request(request)
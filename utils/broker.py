@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from datetime import datetime
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import functools
 import math
 from pathlib import Path
-from typing import Optional, Union
+import threading
+import time
+from types import FunctionType
+from typing import Any, Callable, Iterator, Optional, Union, cast
 
 import pandas as pd
 
@@ -17,6 +22,9 @@ from utils.report.report import (
     ActionType,
     BrokerNames,
 )
+from utils.metrics import LATENCY
+from utils.rate_limit import RATE_LIMITER
+from utils.tracing import TRACER
 
 # add columns here as well
 NULL_ENTRY = pd.Series(
@@ -46,6 +54,47 @@ NULL_ENTRY = pd.Series(
     ]
 )
 
+# hot path methods that get timed for every broker (see Broker.__init_subclass__)
+# quotes are reported as pre_quote / post_quote depending on whether the order has been
+# submitted yet, and nested phases (ex: Schwab confirms inside _save_report) are inclusive
+PHASES = {
+    "buy": "buy",
+    "sell": "sell",
+    "buy_option": "buy_option",
+    "sell_option": "sell_option",
+    "stage": "stage",
+    "warm_up": "warm_up",
+    "refresh_session": "refresh",
+    "_get_stock_data": "quote",
+    "_get_option_data": "quote",
+    "_market_buy": "submit",
+    "_market_sell": "submit",
+    "_limit_buy": "submit",
+    "_limit_sell": "submit",
+    "_buy_call_option": "submit",
+    "_sell_call_option": "submit",
+    "_buy_put_option": "submit",
+    "_sell_put_option": "submit",
+    "_get_latest_order": "confirm",
+    "_get_order_data": "confirm",
+    "_save_report": "save",
+    "_save_option_report": "save",
+}
+ACTION_PHASES = {"buy", "sell", "buy_option", "sell_option"}
+
+_phase_state = threading.local()
+# brokers can run on worker threads and share the report files
+REPORT_LOCK = threading.Lock()
+
+
+def _timed_phase(phase: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(func)
+    def wrapper(self: "Broker", *args: Any, **kwargs: Any) -> Any:
+        return self._run_phase(phase, func, *args, **kwargs)
+
+    wrapper._phase = phase  # type: ignore[attr-defined]
+    return wrapper
+
 
 @dataclass
 class StockOrder:
@@ -82,8 +131,36 @@ class OptionOrder:
         return f"{self.sym}-{self.option_type}-{self.strike}-{self.formatted_expiration()}"
 
 
+@dataclass
+class StagedOrder:
+    """
+    an order prepared ahead of its trigger by Broker.stage and submitted by
+    Broker.commit, `data` keeps what the broker needs for the final step (preview id,
+    qualified contract, ...) and is empty when nothing could be staged
+    """
+
+    order: Union[StockOrder, OptionOrder]
+    action: ActionType
+    data: dict[str, Any] = field(default_factory=dict)
+
+
 class Broker(ABC):
     THRESHOLD = 1200
+    # set by brokers whose client is bound to the main thread's event loop, concurrent
+    # runners call them on the main thread instead of a worker
+    MAIN_THREAD_ONLY = False
+    # seconds between SessionKeeper refreshes of the broker's API session, None for
+    # brokers without one
+    SESSION_REFRESH_INTERVAL: Optional[float] = None
+    # how early SessionKeeper reports a session that will need an interactive login
+    REAUTH_WARNING = timedelta(hours=12)
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        for method_name, phase in PHASES.items():
+            method = cls.__dict__.get(method_name)
+            if isinstance(method, FunctionType) and not hasattr(method, "_phase"):
+                setattr(cls, method_name, _timed_phase(phase, method))
 
     def __init__(
         self,
@@ -102,37 +179,131 @@ class Broker(ABC):
         self._option_report_file = option_report_file
 
         self._error_count = 0
+        self._session_lock = threading.RLock()
+
+    def _run_phase(
+        self, phase: str, func: Callable[..., Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        runs one hot path phase and records its latency under this broker's name
+        """
+        if phase in ACTION_PHASES:
+            _phase_state.submitted = False
+        elif phase == "quote":
+            submitted = getattr(_phase_state, "submitted", False)
+            phase = "post_quote" if submitted else "pre_quote"
+
+        # queueing for quota is not part of the phase's latency
+        if self._rate_limited(phase, *args):
+            RATE_LIMITER.acquire_phase(self.name(), phase)
+        start = time.perf_counter()
+        try:
+            with TRACER.span(f"{self.name()}.{func.__name__}", "broker", phase=phase):
+                return func(self, *args, **kwargs)
+        finally:
+            LATENCY.record(self.name(), phase, time.perf_counter() - start)
+            if phase == "submit":
+                _phase_state.submitted = True
+
+    def _rate_limited(self, phase: str, *args: Any) -> bool:
+        """
+        whether a phase call with these arguments waits for RATE_LIMITER, brokers
+        override it for calls that don't reach their API
+        """
+        return True
 
     def _get_current_time(self) -> str:
         return datetime.now().strftime("%X:%f")
 
     def _add_report_to_file(self, report_entry: ReportEntry) -> None:
-        self._executed_trades.append(report_entry)
+        with REPORT_LOCK:
+            self._executed_trades.append(report_entry)
 
     def _add_option_report_to_file(
         self, option_report_entry: OptionReportEntry
     ) -> None:
-        self._executed_option_trades.append(option_report_entry)
+        with REPORT_LOCK:
+            self._executed_option_trades.append(option_report_entry)
 
     def _save_report_to_file(self) -> None:
-        with self._report_file.open("a") as file:
-            for report in self._executed_trades:
-                file.write(str(report))
-
-        self._executed_trades.clear()
-
-    def _save_option_report_to_file(self) -> None:
-        if self._option_report_file:
-            with self._option_report_file.open("a") as file:
-                for report in self._executed_option_trades:
-                    # print(f"Adding to to report: {report.broker}")
+        # a broker's legs run on separate threads, the rows are taken under the lock so
+        # a row added by the other leg is neither lost nor written twice
+        with REPORT_LOCK:
+            rows, self._executed_trades = self._executed_trades, []
+            with self._report_file.open("a") as file:
+                for report in rows:
                     file.write(str(report))
 
-        self._executed_option_trades.clear()
+    def _save_option_report_to_file(self) -> None:
+        with REPORT_LOCK:
+            rows, self._executed_option_trades = self._executed_option_trades, []
+            if self._option_report_file:
+                with self._option_report_file.open("a") as file:
+                    for report in rows:
+                        # print(f"Adding to to report: {report.broker}")
+                        file.write(str(report))
 
     def name(self) -> str:
         return self._broker_name.value if self._broker_name else self.__class__.__name__
 
+    @contextmanager
+    def session(self, category: str) -> Iterator[None]:
+        """
+        runs the calls in the block on the broker's session for an order category
+        (STOCKS, FRACTIONALS, OPTIONS). Brokers with a single session run one category
+        at a time, browser brokers keep a session per category so they can overlap.
+        """
+        with self._session_lock:
+            yield
+
+    def warm_up(self) -> None:
+        """
+        sends a cheap request shortly before a trigger so the order finds an open,
+        pooled connection, brokers without an API connection have nothing to warm
+        """
+
+    def refresh_session(self) -> None:
+        """
+        renews the broker's API token / session while nothing is trading, so the next
+        order doesn't find it expired (see utils.session_keeper)
+        """
+
+    def session_expires(self) -> Optional[datetime]:
+        """
+        when the session can't be renewed anymore and an interactive login is needed,
+        None if it never expires or the broker doesn't know
+        """
+        return None
+
+    def watch_quotes(self, orders: list[Union[StockOrder, OptionOrder]]) -> None:
+        """
+        called ahead of a group's buy with its orders so quotes for them can be
+        streamed, brokers without a quote stream poll at order time
+        """
+
+    def stage(
+        self, order: Union[StockOrder, OptionOrder], action: ActionType
+    ) -> StagedOrder:
+        """
+        does the part of an order that can run seconds before its trigger (prefilled
+        ticket, preview, ...), brokers without such a step stage nothing
+        """
+        return StagedOrder(order, action)
+
+    def commit(self, staged: StagedOrder) -> None:
+        """
+        submits a staged order, brokers without a staging step run the whole order here
+        """
+        order = staged.order
+        if staged.action == ActionType.BUY:
+            self.buy(cast(StockOrder, order))
+        elif staged.action == ActionType.SELL:
+            self.sell(cast(StockOrder, order))
+        elif staged.action == ActionType.OPEN:
+            self.buy_option(cast(OptionOrder, order))
+        else:
+            self.sell_option(cast(OptionOrder, order))
+
     @abstractmethod
     def buy(self, order: StockOrder) -> None:
         pass
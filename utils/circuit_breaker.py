@@ -0,0 +1,139 @@
+import csv
+import threading
+import time
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Union
+
+from loguru import logger
+
+from utils.broker import OptionOrder, StockOrder
+from utils.report.report import ActionType
+
+# consecutive failures within FAILURE_WINDOW seconds that open a broker's circuit
+FAILURE_THRESHOLD = 3
+FAILURE_WINDOW = 300
+# seconds an open circuit skips its broker before letting one probe order through
+COOLDOWN = 120
+
+SKIPPED_COLUMNS = ["Date", "Time", "Broker", "Symbol", "Action", "Size", "Reason"]
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    stops calling a broker that keeps failing: `threshold` failures in a row, all
+    within `window` seconds, open the circuit and allow() turns False. After
+    `cooldown` seconds a single probe is allowed (half open), its success closes the
+    circuit and its failure opens it for another cooldown
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: int = FAILURE_THRESHOLD,
+        window: float = FAILURE_WINDOW,
+        cooldown: float = COOLDOWN,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._name = name
+        self._threshold = threshold
+        self._window = window
+        self._cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._failures: list[float] = []
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == CircuitState.CLOSED:
+                return True
+            if self._state == CircuitState.OPEN:
+                if self._clock() - self._opened_at < self._cooldown:
+                    return False
+                logger.info(f"{self._name} circuit half open, probing")
+                self._state = CircuitState.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CircuitState.CLOSED:
+                logger.info(f"{self._name} circuit closed")
+            self._state = CircuitState.CLOSED
+            self._failures.clear()
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = self._clock()
+            self._probing = False
+            if self._state == CircuitState.HALF_OPEN:
+                self._open(now)
+                return
+            self._failures = [t for t in self._failures if now - t <= self._window]
+            self._failures.append(now)
+            if len(self._failures) >= self._threshold:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        logger.error(f"{self._name} circuit open, skipping for {self._cooldown}s")
+        self._state = CircuitState.OPEN
+        self._opened_at = now
+        self._failures.clear()
+
+
+class SkippedOrders:
+    """
+    orders not sent because their broker's circuit was open, one csv per day in
+    <base_path>/reports/skipped
+    """
+
+    def __init__(self, base_path: Path) -> None:
+        self._directory = base_path / "reports" / "skipped"
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        broker: str,
+        order: Union[StockOrder, OptionOrder],
+        action: ActionType,
+        reason: str,
+    ) -> None:
+        now = datetime.now()
+        path = self._directory / f"skipped_{now.strftime('%m_%d')}.csv"
+        symbol = order.sym if isinstance(order, StockOrder) else str(order)
+        with self._lock:
+            self._directory.mkdir(parents=True, exist_ok=True)
+            new_file = not path.exists()
+            with open(path, "a", newline="") as file:
+                writer = csv.writer(file)
+                if new_file:
+                    writer.writerow(SKIPPED_COLUMNS)
+                writer.writerow(
+                    [
+                        now.strftime("%x"),
+                        now.strftime("%X"),
+                        broker,
+                        symbol,
+                        action.value,
+                        order.quantity,
+                        reason,
+                    ]
+                )
+        logger.warning(f"{broker} skipped {action.value} {symbol}: {reason}")
@@ -0,0 +1,58 @@
+"""
+Connection pooling for the broker API clients. Every adapter keeps its connections
+alive between orders and the sessions talking to the same API share one pool, so after
+Broker.warm_up only the warm-up request pays for the TCP / TLS setup.
+"""
+
+from typing import Iterable, Optional, Union
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# hosts kept per requests adapter
+POOL_CONNECTIONS = 4
+# connections kept per host, the order legs can call one broker concurrently
+POOL_MAXSIZE = 8
+# seconds httpx keeps an idle connection, its default of 5 closes them between groups
+KEEPALIVE_EXPIRY = 60
+# quoted by Broker.warm_up, any liquid symbol works
+WARM_UP_SYMBOL = "SPY"
+
+POOL_KWARGS = {"pool_connections": POOL_CONNECTIONS, "pool_maxsize": POOL_MAXSIZE}
+
+
+def pool_sessions(
+    sessions: Iterable[requests.Session], adapter: Optional[HTTPAdapter] = None
+) -> HTTPAdapter:
+    """
+    mounts one pooled adapter on all `sessions` (ex: the three pyetrade clients) so a
+    connection opened by one of them is reused by the others
+    """
+    adapter = adapter or HTTPAdapter(**POOL_KWARGS)
+    for session in sessions:
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return adapter
+
+
+def httpx_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_MAXSIZE,
+        max_keepalive_connections=POOL_MAXSIZE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+def pool_httpx(client: Union[httpx.Client, httpx.AsyncClient]) -> None:
+    """
+    replaces the default transport of a client some library built for us (schwab-py
+    creates its own oauth client) with one that keeps connections alive longer
+    """
+    if isinstance(client, httpx.AsyncClient):
+        # closing is a coroutine, the unused transport holds no connections anyway
+        client._transport = httpx.AsyncHTTPTransport(limits=httpx_limits())
+        return
+    old = client._transport
+    client._transport = httpx.HTTPTransport(limits=httpx_limits())
+    old.close()
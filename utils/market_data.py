@@ -4,6 +4,7 @@ from typing import Any, cast
 import robin_stocks.robinhood as rh  # type: ignore [import-untyped]
 from brokers.robinhood import Robinhood
 from utils.broker import OptionOrder
+from utils.rate_limit import RATE_LIMITER, Priority
 from utils.report.report import (
     NULL_OPTION_DATA,
     BrokerNames,
@@ -30,12 +31,21 @@ class MarketData:
         Robinhood.login_custom("RH")
         SIGNED_IN = True
 
+    @staticmethod
+    def _throttle(requests: int = 1) -> None:
+        """
+        shares the Robinhood rate limit with the Robinhood broker, market data is
+        quote traffic but never outranks order submission
+        """
+        RATE_LIMITER.acquire(BrokerNames.RH.value, Priority.PRE_QUOTE, requests)
+
     @staticmethod
     def validate_stock(sym: str) -> bool:
         """
         checks if symbol is valid
         """
         MarketData.sign_in()
+        MarketData._throttle()
         return rh.get_quotes(sym)[0] is not None
 
     @staticmethod
@@ -45,6 +55,7 @@ class MarketData:
         :returns (quantity, price)
         """
         MarketData.sign_in()
+        MarketData._throttle()
         price = float(rh.get_quotes(sym)[0]["last_trade_price"])
         return calculate_num_stocks_to_buy(100, price), price
 
@@ -54,6 +65,7 @@ class MarketData:
         gets the bid, ask, last price, and volume of a stock
         """
         MarketData.sign_in()
+        MarketData._throttle(3)
         stock_data: Any = cast(dict, rh.stocks.get_quotes(sym))[0]
         return StockData(
             stock_data["ask_price"],
@@ -70,6 +82,8 @@ class MarketData:
         MarketData.sign_in()
         if option.sym == "SPX":
             return NULL_OPTION_DATA
+        # the chain lookup is an instruments request plus a market data request
+        MarketData._throttle(2)
         option_data: list = cast(
             list,
             rh.find_options_by_expiration_and_strike(
@@ -0,0 +1,103 @@
+from collections import deque
+from datetime import datetime
+from typing import Iterable, Protocol
+
+import psutil
+from loguru import logger
+
+MB = 1024 * 1024
+# browsers (driver and every chrome process under it) above this are restarted
+BROWSER_RSS_LIMIT = 1500 * MB
+# samples kept per process for the trend, a day of 5 minute checks
+TREND_SAMPLES = 288
+
+
+class Browser(Protocol):
+    @property
+    def label(self) -> str: ...
+
+    def memory_rss(self) -> int: ...
+
+    def can_restart(self) -> bool: ...
+
+    def restart(self) -> bool: ...
+
+
+def process_tree_rss(pids: Iterable[int]) -> int:
+    """
+    resident memory of the processes in `pids` and all of their children, in bytes,
+    processes that exit while being sampled are skipped
+    """
+    seen: set[int] = set()
+    total = 0
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            processes = [root, *root.children(recursive=True)]
+        except psutil.Error:
+            continue
+        for process in processes:
+            if process.pid in seen:
+                continue
+            seen.add(process.pid)
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+    return total
+
+
+class MemoryWatchdog:
+    """
+    samples the RSS of this process and of each browser, logs how much each grew since
+    its first sample and restarts browsers above `browser_limit` when allowed to
+    """
+
+    def __init__(self, browser_limit: int = BROWSER_RSS_LIMIT) -> None:
+        self._browser_limit = browser_limit
+        self._history: dict[str, deque[tuple[datetime, int]]] = {}
+
+    def _record(self, name: str, rss: int) -> None:
+        history = self._history.setdefault(name, deque(maxlen=TREND_SAMPLES))
+        history.append((datetime.now(), rss))
+        since, first = history[0]
+        logger.info(
+            f"memory {name}: {rss / MB:.0f}MB "
+            f"({(rss - first) / MB:+.0f}MB since {since.strftime('%X')})"
+        )
+
+    def trend(self, name: str) -> int:
+        """bytes gained between the oldest and newest sample of `name`"""
+        history = self._history.get(name)
+        if not history:
+            return 0
+        return history[-1][1] - history[0][1]
+
+    def check(self, browsers: Iterable[Browser], can_recycle: bool) -> dict[str, int]:
+        """
+        samples everything once, `can_recycle` is False while the browsers are in use
+        (over the limit browsers are then only reported)
+        """
+        samples = {"python": psutil.Process().memory_info().rss}
+        self._record("python", samples["python"])
+        for browser in list(browsers):
+            rss = browser.memory_rss()
+            samples[browser.label] = rss
+            self._record(browser.label, rss)
+            if rss <= self._browser_limit:
+                continue
+            if not can_recycle:
+                logger.warning(f"{browser.label} browser over the limit, still in use")
+                continue
+            if not browser.can_restart():
+                logger.warning(
+                    f"{browser.label} browser over the limit, a restart would lose "
+                    "its session"
+                )
+                continue
+            logger.warning(f"restarting {browser.label} browser at {rss / MB:.0f}MB")
+            if not browser.restart():
+                logger.error(f"{browser.label} browser lost its session on restart")
+            # the trend starts over with the new browser
+            self._history.pop(browser.label, None)
+        return samples
@@ -0,0 +1,182 @@
+import csv
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from loguru import logger
+
+METRICS_DIR = "metrics"
+QUANTILES = [0.5, 0.9, 0.99, 0.999]
+
+SUMMARY_COLUMNS = [
+    "Time", "Job", "Broker", "Phase", "Count", "Min", "P50", "P90", "P99", "P999",
+    "Max", "Mean",
+]  # fmt: skip
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies recorded in microseconds.
+    Values below 2^SUB_BUCKET_BITS are stored exactly, larger values are grouped into
+    log-linear buckets (128 sub-buckets per power of two) so the relative error of any
+    reported percentile stays under 1% no matter the magnitude
+    """
+
+    SUB_BUCKET_BITS = 7
+
+    def __init__(self) -> None:
+        self._counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def _bucket(self, value: int) -> int:
+        shift = max(value.bit_length() - self.SUB_BUCKET_BITS, 0)
+        return (shift << self.SUB_BUCKET_BITS) + (value >> shift)
+
+    def _highest_equivalent(self, bucket: int) -> int:
+        shift = bucket >> self.SUB_BUCKET_BITS
+        sub_bucket = bucket & ((1 << self.SUB_BUCKET_BITS) - 1)
+        if shift == 0:
+            return sub_bucket
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, micros: int) -> None:
+        micros = max(int(micros), 0)
+        bucket = self._bucket(micros)
+        self._counts[bucket] = self._counts.get(bucket, 0) + 1
+        self.min = micros if self.count == 0 else min(self.min, micros)
+        self.max = max(self.max, micros)
+        self.count += 1
+        self.total += micros
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        if other.count == 0:
+            return
+        for bucket, count in other._counts.items():
+            self._counts[bucket] = self._counts.get(bucket, 0) + count
+        self.min = other.min if self.count == 0 else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, percent: float) -> int:
+        """
+        :param percent: 0 - 100
+        :return: value (microseconds) at or below which `percent` of recordings fall
+        """
+        if self.count == 0:
+            return 0
+        rank = max(math.ceil(percent / 100 * self.count), 1)
+        seen = 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen >= rank:
+                return min(self._highest_equivalent(bucket), self.max)
+        return self.max
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+class LatencyRecorder:
+    """
+    Per-broker, per-phase latency histograms.
+    Keeps a cumulative set (exported as a Prometheus textfile) and an interval set that is
+    summarized to CSV and cleared at the end of every scheduled job
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cumulative: dict[tuple[str, str], LatencyHistogram] = {}
+        self._interval: dict[tuple[str, str], LatencyHistogram] = {}
+
+    def record(self, broker: str, phase: str, seconds: float) -> None:
+        micros = int(seconds * 1_000_000)
+        with self._lock:
+            for histograms in (self._cumulative, self._interval):
+                histograms.setdefault((broker, phase), LatencyHistogram()).record(
+                    micros
+                )
+
+    @contextmanager
+    def time(self, broker: str, phase: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(broker, phase, time.perf_counter() - start)
+
+    def get(self, broker: str, phase: str) -> Optional[LatencyHistogram]:
+        return self._cumulative.get((broker, phase))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._cumulative.clear()
+            self._interval.clear()
+
+    def export_prometheus(self, path: Path) -> None:
+        """
+        writes the cumulative histograms as a summary metric for the node exporter
+        textfile collector (written to a temp file and renamed so scrapes never see a
+        partial file)
+        """
+        name = "trading_broker_phase_latency_seconds"
+        lines = [
+            f"# HELP {name} Latency of each broker hot-path phase",
+            f"# TYPE {name} summary",
+        ]
+        with self._lock:
+            for (broker, phase), hist in sorted(self._cumulative.items()):
+                labels = f'broker="{broker}",phase="{phase}"'
+                for quantile in QUANTILES:
+                    value = hist.percentile(quantile * 100) / 1_000_000
+                    lines.append(f'{name}{{{labels},quantile="{quantile}"}} {value}')
+                lines.append(f"{name}_sum{{{labels}}} {hist.total / 1_000_000}")
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def export_csv(self, path: Path, job: str) -> None:
+        """
+        appends one summary row (milliseconds) per broker/phase recorded since the last
+        export and clears the interval histograms
+        """
+        with self._lock:
+            interval = self._interval
+            self._interval = {}
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not path.exists()
+        now = datetime.now().strftime("%X")
+        with open(path, "a", newline="") as file:
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(SUMMARY_COLUMNS)
+            for (broker, phase), hist in sorted(interval.items()):
+                writer.writerow(
+                    [now, job, broker, phase, hist.count, hist.min / 1000]
+                    + [hist.percentile(q * 100) / 1000 for q in QUANTILES]
+                    + [hist.max / 1000, round(hist.mean() / 1000, 3)]
+                )
+
+    def export(self, job: str, base_path: Path) -> None:
+        date = datetime.now().strftime("%m_%d")
+        try:
+            self.export_prometheus(base_path / METRICS_DIR / "latency.prom")
+            self.export_csv(base_path / METRICS_DIR / f"latency_{date}.csv", job)
+        except OSError as e:
+            logger.error(f"Unable to export latency metrics: {e}")
+
+
+LATENCY = LatencyRecorder()
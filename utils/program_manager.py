@@ -1,6 +1,7 @@
 import ujson as json  # type: ignore[import-untyped]
 from pathlib import Path
 import sys
+import threading
 from datetime import datetime
 import random
 from typing import Any, Union
@@ -55,6 +56,8 @@ OPTION_REPORT_COLUMNS = [
 class ProgramManager:
     def __init__(self, base_path: Path = BASE_PATH, *, enable_stdout: bool = False):
         self._enable_stdout = enable_stdout
+        # order categories trade on separate threads and share the program file
+        self._lock = threading.RLock()
 
         self._program_info_path = base_path / "program_info.json"
         date = datetime.now().strftime("%m_%d")
@@ -133,18 +136,23 @@ class ProgramManager:
 
     def set(self, key: str, value: Union[str, list, int]) -> None:
         self._check_valid_key(key)
-        with open(self._program_info_path, "r") as file:
-            data = json.load(file)
-            data[key] = value
+        with self._lock:
+            with open(self._program_info_path, "r") as file:
+                data = json.load(file)
+                data[key] = value
 
-        with open(self._program_info_path, "w") as file:
-            json.dump(data, file, indent=4)
+            with open(self._program_info_path, "w") as file:
+                json.dump(data, file, indent=4)
 
     def get(self, key: str) -> Any:
         self._check_valid_key(key)
-        with open(self._program_info_path, "r") as file:
+        with self._lock, open(self._program_info_path, "r") as file:
             return json.load(file)[key]
 
+    def increment(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.set(key, self.get(key) + amount)
+
 
 if __name__ == "__main__":
     manager = ProgramManager()
@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import threading
+import time
+from enum import IntEnum
+from typing import Optional
+
+from loguru import logger
+
+from utils.metrics import LATENCY
+
+
+class Priority(IntEnum):
+    """lower values are served first"""
+
+    SUBMIT = 0
+    PRE_QUOTE = 1
+    POST_QUOTE = 2
+    CONFIRM = 3
+
+
+# broker phases (see utils.broker.PHASES) that send a request to the broker's API,
+# enclosing phases like buy or save are left alone so nested calls aren't counted twice
+PHASE_PRIORITY = {
+    "submit": Priority.SUBMIT,
+    "pre_quote": Priority.PRE_QUOTE,
+    "post_quote": Priority.POST_QUOTE,
+    "confirm": Priority.CONFIRM,
+    "warm_up": Priority.CONFIRM,
+    "refresh": Priority.CONFIRM,
+}
+
+# (requests per second, burst) per broker API, kept under the documented / observed
+# limits. The Robinhood bucket is shared by the broker and MarketData since both use
+# the same robin_stocks session. Brokers without an entry are not limited
+RATE_LIMITS = {
+    "RH": (2.0, 5),
+    "E2": (4.0, 8),
+    "ET": (4.0, 8),
+    "SB": (2.0, 4),
+}
+# tokens only order submission may use, so a submit never waits on bookkeeping calls
+SUBMIT_RESERVE = 1
+# waits shorter than this are not recorded
+MIN_RECORDED_WAIT = 0.001
+
+
+class PriorityTokenBucket:
+    """
+    token bucket refilled at `rate` tokens per second up to `burst`. Callers queue by
+    priority (then arrival), only the head of the queue takes tokens, and anything
+    below SUBMIT has to leave `reserve` tokens in the bucket
+    """
+
+    def __init__(self, rate: float, burst: int, reserve: int = SUBMIT_RESERVE) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._reserve = min(reserve, burst - 1)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiting: list[tuple[int, int]] = []
+        self._arrivals = itertools.count()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(
+        self, priority: Priority, count: int = 1, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        blocks until `count` tokens are taken, False if `timeout` ran out first
+        """
+        needed = count if priority == Priority.SUBMIT else count + self._reserve
+        needed = min(needed, self._burst)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        entry = (int(priority), next(self._arrivals))
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    self._refill()
+                    wait = None
+                    if self._waiting[0] == entry:
+                        if self._tokens >= needed:
+                            self._tokens -= count
+                            return True
+                        wait = (needed - self._tokens) / self._rate
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    one PriorityTokenBucket per broker API, queue time is recorded in LATENCY as
+    rate_limit_<priority>
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, int]]) -> None:
+        self._buckets = {
+            api: PriorityTokenBucket(rate, burst) for api, (rate, burst) in limits.items()
+        }
+
+    def acquire(self, api: str, priority: Priority, count: int = 1) -> None:
+        bucket = self._buckets.get(api)
+        if bucket is None:
+            return
+        start = time.perf_counter()
+        bucket.acquire(priority, count)
+        waited = time.perf_counter() - start
+        if waited >= MIN_RECORDED_WAIT:
+            LATENCY.record(api, f"rate_limit_{priority.name.lower()}", waited)
+            if priority == Priority.SUBMIT:
+                logger.warning(f"{api} order submission waited {waited:.3f}s for quota")
+
+    def acquire_phase(self, api: str, phase: str) -> None:
+        priority = PHASE_PRIORITY.get(phase)
+        if priority is not None:
+            self.acquire(api, priority)
+
+
+RATE_LIMITER = RateLimiter(RATE_LIMITS)
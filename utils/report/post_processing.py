@@ -1,3 +1,4 @@
+import json
 import time
 from datetime import datetime
 from pathlib import Path
@@ -10,6 +11,7 @@ from loguru import logger
 from brokers import BASE_PATH
 from brokers.etrade import ETrade
 from brokers.robinhood import Robinhood
+from brokers.schwab2 import Schwab
 from utils.broker import Broker
 from utils.report.report import BrokerNames
 from utils.report.report_utils import (
@@ -17,14 +19,14 @@ from utils.report.report_utils import (
     create_datetime_from_string,
     get_fidelity_report,
     get_ibkr_report,
-    get_schwab_report,
     combine_ibkr_data,
-    combine_schwab_data,
+    combine_schwab_orders,
     combine_fidelity_data,
     combine_robinhood_data,
     perform_equity_analysis,
     perform_option_analysis,
     check_file_existence,
+    schwab_executions,
 )
 
 
@@ -78,7 +80,6 @@ class PostProcessing:
         fidelity_file = (
             BASE_PATH / f"data/fidelity/fd_splits_{date.strftime('%m_%d')}.csv"
         )
-        schwab_file = BASE_PATH / f"data/schwab/schwab_{date.strftime('%m_%d')}.csv"
         ibkr_df = (
             get_ibkr_report(ibkr_file) if check_file_existence(ibkr_file) else None
         )
@@ -87,13 +88,45 @@ class PostProcessing:
             if check_file_existence(fidelity_file)
             else None
         )
-        schwab_df = (
-            get_schwab_report(schwab_file)
-            if check_file_existence(schwab_file)
-            else None
+
+        return ibkr_df, fidelity_df
+
+    def _schwab(self) -> Schwab:
+        # only logged in for reports with SB rows whose orders aren't saved yet
+        if "SB" not in self._brokers:
+            schwab = Schwab(Path(""), BrokerNames.SB)
+            schwab.login()
+            self._brokers["SB"] = schwab
+        return cast(Schwab, self._brokers["SB"])
+
+    def _get_schwab_orders(self, date: datetime) -> list[dict]:
+        """
+        the day's Schwab orders from the api, saved to data/schwab so finished days
+        are only fetched once
+        """
+        orders_file = (
+            BASE_PATH / f"data/schwab/schwab_orders_{date.strftime('%m_%d')}.json"
         )
+        # today's orders can still change
+        if date.date() < datetime.now().date() and check_file_existence(orders_file):
+            return cast(list[dict], json.loads(orders_file.read_text()))
 
-        return ibkr_df, fidelity_df, schwab_df
+        orders = self._schwab().get_day_orders(date)
+        orders_file.parent.mkdir(parents=True, exist_ok=True)
+        orders_file.write_text(json.dumps(orders))
+        return orders
+
+    def _combine_schwab_data(
+        self, df: pd.DataFrame, date: datetime, option: bool = False
+    ) -> pd.DataFrame:
+        if not (df["Broker"] == "SB").any():
+            return df
+        try:
+            orders = self._get_schwab_orders(date)
+        except Exception as e:
+            logger.error(f"Unable to get Schwab orders, SB rows are left as is: {e}")
+            return df
+        return combine_schwab_orders(df, schwab_executions(orders), option)
 
     def _combine_etrade_data(
         self, df: pd.DataFrame, option: bool = False
@@ -140,7 +173,7 @@ class PostProcessing:
         start = time.perf_counter()
 
         formatted_date = create_datetime_from_string(report_file)
-        ibkr_df, fidelity_df, schwab_df = self._get_broker_data(formatted_date)
+        ibkr_df, fidelity_df = self._get_broker_data(formatted_date)
 
         
         df = self._read_report(report_file, option)
@@ -150,7 +183,7 @@ class PostProcessing:
             df = combine_ibkr_data(df, option)
         # df.to_csv(BASE_PATH / f"reports/tests/after_ibkr.csv", index=False)
 
-        df = combine_schwab_data(df, schwab_df, option)
+        df = self._combine_schwab_data(df, formatted_date, option)
         
 
         # if there's no fidelity data, this will raise an exception
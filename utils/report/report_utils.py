@@ -342,6 +342,86 @@ def combine_schwab_data(
     return df
 
 
+def schwab_executions(orders: list[dict]) -> pd.DataFrame:
+    """
+    one row per execution activity of the orders from Schwab.get_day_orders, the legs
+    of an activity are summed (price weighted by quantity)
+    """
+    rows = []
+    for order in orders:
+        for activity in order.get("orderActivityCollection", []):
+            if activity.get("activityType") != "EXECUTION":
+                continue
+            for leg in activity["executionLegs"]:
+                rows.append(
+                    (
+                        order["orderId"],
+                        activity["activityId"],
+                        leg["time"],
+                        leg["price"],
+                        leg["quantity"],
+                    )
+                )
+    df = pd.DataFrame(
+        rows, columns=["Order ID", "Activity ID", "Broker Executed", "Price", "Size"]
+    )
+    df["Cost"] = df["Price"] * df["Size"]
+    df = df.groupby(["Order ID", "Activity ID"]).agg(
+        {"Broker Executed": "min", "Cost": "sum", "Size": "sum"}
+    )
+    df["Price"] = df["Cost"] / df["Size"]
+    df["Broker Executed"] = (
+        pd.to_datetime(df["Broker Executed"], utc=True)
+        .dt.tz_convert("US/Pacific")
+        .dt.strftime("%X")
+    )
+    df.index = df.index.set_levels(
+        [level.astype(str) for level in df.index.levels]
+    )
+    return df.drop(columns="Cost")
+
+
+def _id_key(ids: pd.Series) -> pd.Index:
+    # report ids are read back as floats when a column has gaps
+    return pd.Index(pd.to_numeric(ids, errors="coerce").astype("Int64").astype(str))
+
+
+def combine_schwab_orders(
+    df: pd.DataFrame, executions: pd.DataFrame, option: bool = False
+) -> pd.DataFrame:
+    """
+    fills the SB rows from the executions of schwab_executions, matched on the
+    Order ID and Activity ID the report recorded at order time
+    """
+    logger.info("Combining Schwab")
+    sb = df.index[df["Broker"] == "SB"]
+    if sb.empty or executions.empty:
+        return df
+
+    keys = pd.MultiIndex.from_arrays(
+        [_id_key(df.loc[sb, "Order ID"]), _id_key(df.loc[sb, "Activity ID"])]
+    )
+    matched = executions.reindex(keys)
+    found = matched["Price"].notna().to_numpy()
+    rows, matched = sb[found], matched[found]
+    if not found.all():
+        logger.warning(f"{(~found).sum()} SB rows without a Schwab execution")
+
+    df.loc[rows, "Price"] = matched["Price"].to_numpy()
+    df.loc[rows, "Broker Executed"] = pd.to_datetime(
+        matched["Broker Executed"], format="%X"
+    ).to_numpy()
+    if option:
+        # option prices are per share, a contract covers 100
+        dollar_amt = matched["Price"] * matched["Size"] * 100
+        df.loc[rows, "Dollar Amt"] = dollar_amt.to_numpy()
+    else:
+        df.loc[rows, "Size"] = matched["Size"].to_numpy()
+        df.loc[rows, "Dollar Amt"] = (matched["Price"] * matched["Size"]).to_numpy()
+    logger.info("Done Schwab")
+    return df
+
+
 def combine_robinhood_data(df: pd.DataFrame, option: bool = False) -> pd.DataFrame:
     logger.info("Combining Robinhood")
 
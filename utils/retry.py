@@ -0,0 +1,236 @@
+import asyncio
+import functools
+import inspect
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, TypeVar, cast
+
+import httpx
+import requests
+from loguru import logger
+from selenium.common import TimeoutException as SeleniumTimeout
+
+from utils.metrics import METRICS_DIR
+
+T = TypeVar("T")
+
+# statuses worth another attempt, every other 4xx means the request itself is wrong
+RETRYABLE_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+TRANSIENT_ERRORS: tuple[type[BaseException], ...] = (
+    TimeoutError,
+    ConnectionError,
+    requests.Timeout,
+    requests.ConnectionError,
+    httpx.TimeoutException,
+    httpx.NetworkError,
+    SeleniumTimeout,
+)
+
+
+class RetryableError(Exception):
+    """
+    raised inside a retried call for a condition that may clear up on its own, like an
+    order the broker hasn't reported executions for yet
+    """
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """status of the HTTP response an exception carries (requests and httpx errors)"""
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """seconds the server asked to wait in its Retry-After header, if any"""
+    # requests responses are falsy for error statuses, compare against None
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    value = getattr(response, "headers", {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class RetryStats:
+    """
+    per broker, per operation counters of calls, attempts, retries, calls that gave up
+    after retrying and calls that failed on an error not worth retrying
+    """
+
+    FIELDS = ["calls", "attempts", "retries", "exhausted", "fatal"]
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counts: dict[tuple[str, str], dict[str, int]] = {}
+
+    def add(self, broker: str, op: str, field: str, amount: int = 1) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(
+                (broker, op), dict.fromkeys(self.FIELDS, 0)
+            )
+            counts[field] += amount
+
+    def get(self, broker: str, op: str) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts.get((broker, op), dict.fromkeys(self.FIELDS, 0)))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+    def export_prometheus(self, path: Path) -> None:
+        name = "trading_broker_retry_total"
+        lines = [
+            f"# HELP {name} Attempts and outcomes of retried broker calls",
+            f"# TYPE {name} counter",
+        ]
+        with self._lock:
+            for (broker, op), counts in sorted(self._counts.items()):
+                for field, value in counts.items():
+                    labels = f'broker="{broker}",op="{op}",kind="{field}"'
+                    lines.append(f"{name}{{{labels}}} {value}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def export(self, base_path: Path) -> None:
+        try:
+            self.export_prometheus(base_path / METRICS_DIR / "retry.prom")
+        except OSError as e:
+            logger.error(f"Unable to export retry metrics: {e}")
+
+
+RETRIES = RetryStats()
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    exponential backoff with full jitter: the wait before retry n is uniform between 0
+    and min(max_delay, base_delay * 2^n), a Retry-After header overrides it.
+    Gives up after `attempts` calls or once the next wait would end past `deadline`
+    seconds from the first call, re-raising the last error
+
+    :param retry_on: extra exception types that are transient for this call (eg.
+        KeyError while an order isn't listed yet), on top of RETRYABLE_STATUS,
+        TRANSIENT_ERRORS and RetryableError
+    """
+
+    attempts: int = 5
+    base_delay: float = 0.2
+    max_delay: float = 5.0
+    deadline: Optional[float] = 15.0
+    retry_on: tuple[type[BaseException], ...] = ()
+
+    def retryable(self, exc: BaseException) -> bool:
+        status = status_code(exc)
+        if status is not None:
+            return status in RETRYABLE_STATUS
+        return isinstance(exc, (RetryableError, *TRANSIENT_ERRORS, *self.retry_on))
+
+    def backoff(self, retry: int, exc: Optional[BaseException] = None) -> float:
+        server_wait = retry_after(exc) if exc else None
+        if server_wait is not None:
+            return min(server_wait, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+    def run(self, func: Callable[[], T], broker: str, op: str) -> T:
+        start = time.monotonic()
+        RETRIES.add(broker, op, "calls")
+        retry = 0
+        while True:
+            RETRIES.add(broker, op, "attempts")
+            try:
+                return func()
+            except Exception as e:
+                retry += 1
+                time.sleep(self._on_failure(e, retry, start, broker, op))
+
+    async def run_async(
+        self, func: Callable[[], Awaitable[T]], broker: str, op: str
+    ) -> T:
+        """run for coroutines, the wait between attempts doesn't block the loop"""
+        start = time.monotonic()
+        RETRIES.add(broker, op, "calls")
+        retry = 0
+        while True:
+            RETRIES.add(broker, op, "attempts")
+            try:
+                return await func()
+            except Exception as e:
+                retry += 1
+                await asyncio.sleep(self._on_failure(e, retry, start, broker, op))
+
+    def _on_failure(
+        self, exc: Exception, retry: int, start: float, broker: str, op: str
+    ) -> float:
+        """
+        the wait before retry number `retry`, re-raises `exc` when it's fatal or
+        the policy is used up
+        """
+        if not self.retryable(exc):
+            RETRIES.add(broker, op, "fatal")
+            raise exc
+        wait = self.backoff(retry - 1, exc)
+        elapsed = time.monotonic() - start
+        out_of_time = self.deadline is not None and elapsed + wait > self.deadline
+        if retry >= self.attempts or out_of_time:
+            RETRIES.add(broker, op, "exhausted")
+            logger.error(
+                f"{broker} {op} failed after {retry} attempts "
+                f"({elapsed:.2f}s): {exc!r}"
+            )
+            raise exc
+        RETRIES.add(broker, op, "retries")
+        logger.bind(broker=broker, op=op, attempt=retry, wait=wait).warning(
+            f"{broker} {op} attempt {retry} failed, retrying in {wait:.2f}s: {exc!r}"
+        )
+        return wait
+
+
+def retry(policy: RetryPolicy, op: Optional[str] = None) -> Callable:
+    """
+    decorator for broker methods (the broker name labels the stats), only for calls
+    that are safe to repeat: never wrap anything that submits an order
+    """
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        name = op or func.__name__.lstrip("_")
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(self: Any, *args: Any, **kwargs: Any) -> Any:
+                return await policy.run_async(
+                    lambda: func(self, *args, **kwargs), self.name(), name
+                )
+
+            return cast(Callable[..., T], async_wrapper)
+
+        @functools.wraps(func)
+        def wrapper(self: Any, *args: Any, **kwargs: Any) -> T:
+            return policy.run(lambda: func(self, *args, **kwargs), self.name(), name)
+
+        return wrapper
+
+    return decorator
+
+
+# quotes sit on the order hot path, fail fast
+QUOTE_RETRY = RetryPolicy(attempts=3, base_delay=0.1, max_delay=0.5, deadline=2.0)
+# a just placed order can be missing from the order list for a moment
+ORDER_LOOKUP_RETRY = RetryPolicy(base_delay=0.5, retry_on=(KeyError, IndexError))
@@ -1,4 +1,24 @@
+import base64
+import os
+import re
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional, Sequence, TypeVar, Union, cast
+
+import ujson as json  # type: ignore[import-untyped]
+from loguru import logger
+
 from selenium import webdriver
+from selenium.common import (
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
 from selenium.webdriver import ActionChains
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webelement import WebElement
@@ -8,8 +28,252 @@ from selenium.webdriver.chrome.service import Service
 import undetected_chromedriver as uc  # type: ignore[import-untyped]
 
 from brokers import BASE_PATH
+from utils.memory import process_tree_rss
+from utils.metrics import LATENCY
+from utils.tracing import trace_methods
+
+T = TypeVar("T")
+
+PROFILES_DIR = BASE_PATH / "chrome_profiles"
+DOWNLOAD_DIR = BASE_PATH / "data"
+DOWNLOAD_TIMEOUT = 30
+# suffixes chrome writes a download under until it is complete
+PARTIAL_SUFFIXES = (".crdownload", ".tmp")
+# saved cookies older than this are not restored, brokers log idle sessions out anyway
+SESSION_LIFETIME = timedelta(hours=8)
+# url patterns blocked in lightweight mode, brokers allowlist the ones their pages need
+BLOCKED_URLS = [
+    # images, fonts and media
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.mp4",
+    "*.webm",
+    # third party analytics, ads and session recording
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*bing.com*",
+    "*hotjar.com*",
+    "*mouseflow.com*",
+    "*quantummetric.com*",
+    "*newrelic.com*",
+    "*nr-data.net*",
+    "*optimizely.com*",
+    "*demdex.net*",
+    "*omtrdc.net*",
+    "*adobedtm.com*",
+    "*tiqcdn.com*",
+    "*segment.io*",
+    "*branch.io*",
+    "*sentry.io*",
+]
+# Network.getAllCookies fields accepted back by Network.setCookies
+COOKIE_FIELDS = ["name", "value", "domain", "path", "secure", "httpOnly", "sameSite"]
+
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+FETCH_TIMEOUT = 5
+# how long a condition has to hold before the page counts as settled
+TEXT_STABLE_FOR = 0.3
+NETWORK_IDLE_FOR = 0.5
+DOM_QUIET_FOR = 0.3
+
+# counts in flight fetch / XHR requests (installed once per page) and reports whether
+# nothing has been requested or finished loading for `arguments[0]` ms
+NETWORK_IDLE_JS = """
+if (!window.__trackedRequests) {
+    const tracked = {pending: 0, last: performance.now()};
+    const done = () => { tracked.pending--; tracked.last = performance.now(); };
+    const fetch = window.fetch;
+    window.fetch = function () {
+        tracked.pending++;
+        tracked.last = performance.now();
+        return fetch.apply(this, arguments).finally(done);
+    };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        tracked.pending++;
+        tracked.last = performance.now();
+        this.addEventListener("loadend", done);
+        return send.apply(this, arguments);
+    };
+    performance.setResourceTimingBufferSize(10000);
+    window.__trackedRequests = tracked;
+}
+let last = window.__trackedRequests.last;
+for (const entry of performance.getEntriesByType("resource")) {
+    last = Math.max(last, entry.responseEnd);
+}
+return document.readyState === "complete"
+    && window.__trackedRequests.pending === 0
+    && performance.now() - last >= arguments[0];
+"""
+
+# records the time of the latest DOM mutation (installed once per page) and reports
+# whether the DOM has been unchanged for `arguments[0]` ms
+DOM_QUIET_JS = """
+if (!window.__domObserver) {
+    window.__lastMutation = performance.now();
+    window.__domObserver = new MutationObserver(() => {
+        window.__lastMutation = performance.now();
+    });
+    window.__domObserver.observe(document, {
+        subtree: true, childList: true, attributes: true, characterData: true
+    });
+}
+return performance.now() - window.__lastMutation >= arguments[0];
+"""
+
+
+# fetches every url in `arguments[0]` at once from inside the page, so the requests
+# carry the logged in session, and hands back each status and body
+FETCH_JSON_JS = """
+const [urls, headers, timeout, done] = arguments;
+const controller = new AbortController();
+const timer = setTimeout(() => controller.abort(), timeout);
+Promise.all(urls.map(url =>
+    fetch(url, {headers: headers, credentials: "include", signal: controller.signal})
+        .then(res => res.text().then(body => ({url: url, status: res.status, body: body})))
+)).then(
+    results => done({results: results}),
+    error => done({error: String(error)}),
+).finally(() => clearTimeout(timer));
+"""
+
+
+class DownloadWatcher:
+    """
+    hands out files as chrome finishes downloading them into `directory`. A file is
+    claimed by the first PendingDownload that sees it complete, so several downloads
+    can be in flight at once (also from different browsers) without two callers
+    getting the same file.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._claimed: set[Path] = set()
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> set[Path]:
+        if not self.directory.exists():
+            return set()
+        return set(self.directory.iterdir())
+
+    def _in_progress(self, path: Path) -> bool:
+        if path.name.endswith(PARTIAL_SUFFIXES):
+            return True
+        return any(
+            path.with_name(path.name + suffix).exists() for suffix in PARTIAL_SUFFIXES
+        )
+
+    def claim(
+        self, before: set[Path], pattern: str, sizes: dict[Path, int]
+    ) -> Optional[Path]:
+        """
+        claims a new completed file matching `pattern`, a file counts as complete once
+        its partial file is gone and its size held between two polls (`sizes`)
+        """
+        with self._lock:
+            for path in sorted(self.directory.glob(pattern)):
+                if path in before or path in self._claimed or self._in_progress(path):
+                    continue
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:  # renamed between glob and stat
+                    continue
+                if sizes.get(path) == size:
+                    self._claimed.add(path)
+                    return path
+                sizes[path] = size
+        return None
+
 
+DOWNLOADS = DownloadWatcher(DOWNLOAD_DIR)
+# every browser started by this process, read by the memory watchdog
+BROWSERS: "weakref.WeakSet[CustomChromeInstance]" = weakref.WeakSet()
 
+
+class PendingDownload:
+    """a download started after expect_download, result() waits for its file"""
+
+    def __init__(
+        self,
+        watcher: DownloadWatcher,
+        pattern: str,
+        timeout: float,
+        name: str,
+        step: str,
+    ) -> None:
+        self._watcher = watcher
+        self._pattern = pattern
+        self._timeout = timeout
+        self._name = name
+        self._step = step
+        self._before = watcher.snapshot()
+        self._started = time.perf_counter()
+        self._path: Optional[Path] = None
+
+    def result(self) -> Path:
+        """
+        the completed file, raises TimeoutException when it isn't done within the
+        timeout (counted from expect_download)
+        """
+        if self._path:
+            return self._path
+        sizes: dict[Path, int] = {}
+        deadline = self._started + self._timeout
+        try:
+            while True:
+                self._path = self._watcher.claim(self._before, self._pattern, sizes)
+                if self._path:
+                    return self._path
+                if time.perf_counter() > deadline:
+                    raise TimeoutException(
+                        f"no {self._pattern} download in {self._watcher.directory} "
+                        f"after {self._timeout}s"
+                    )
+                time.sleep(POLL_INTERVAL)
+        finally:
+            LATENCY.record(self._name, self._step, time.perf_counter() - self._started)
+
+
+class _TextStable:
+    """
+    condition: element text is non empty, differs from `changed_from` and unchanged for
+    `stable_for` seconds
+    """
+
+    def __init__(
+        self, by: str, elem: str, stable_for: float, changed_from: Optional[str] = None
+    ) -> None:
+        self._locator = (by, elem)
+        self._stable_for = stable_for
+        self._changed_from = changed_from
+        self._text: Optional[str] = None
+        self._since = 0.0
+
+    def __call__(self, driver: webdriver.Chrome) -> Union[str, bool]:
+        text = driver.find_element(*self._locator).text
+        now = time.perf_counter()
+        if text == self._changed_from:
+            return False
+        if text != self._text:
+            self._text, self._since = text, now
+            return False
+        return text if text and now - self._since >= self._stable_for else False
+
+
+@trace_methods("selenium")
 class CustomChromeInstance:
 
     @staticmethod
@@ -33,9 +297,50 @@ class CustomChromeInstance:
         # options.add_experimental_option("useAutomationExtension", False)
         return webdriver.Chrome(options=options)
 
-    def __init__(self, undetected: bool = False) -> None:
+    def __init__(
+        self,
+        undetected: bool = False,
+        name: str = "selenium",
+        profile: Optional[str] = None,
+        lightweight: bool = False,
+        allowlist: Sequence[str] = (),
+        capture_network: bool = False,
+        cookies_from: Optional[str] = None,
+    ) -> None:
+        """
+        :param name: broker the browser belongs to, used to label the recorded waits
+        :param profile: keep the browser profile in PROFILES_DIR/<profile> so logins
+            survive restarts, None uses a throwaway profile
+        :param cookies_from: profile whose saved cookies are shared (defaults to
+            `profile`), lets extra browsers of a BrowserPool reuse the primary's login
+        :param lightweight: return from open() once the DOM is ready and block the
+            BLOCKED_URLS patterns that are not in `allowlist`
+        :param capture_network: keep the performance log so responses the pages load
+            can be read back with captured_json
+        """
+        self._name = name
+        self._profile = profile
+        self._cookies_from = cookies_from
+        # kept so restart() can bring up the same browser again
+        self._options = {
+            "undetected": undetected,
+            "name": name,
+            "profile": profile,
+            "lightweight": lightweight,
+            "allowlist": allowlist,
+            "capture_network": capture_network,
+            "cookies_from": cookies_from,
+        }
+        self._session_check: Optional[tuple[str, str, str, float]] = None
         # Create Chromeoptions instance
         options = webdriver.ChromeOptions()
+        if profile:
+            PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+            options.add_argument(f"--user-data-dir={PROFILES_DIR / profile}")
+        if lightweight:
+            options.page_load_strategy = "eager"
+        if capture_network:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
         options.add_argument("--log-level=3")
         options.add_argument("--start-maximized")
         # Adding argument to disable the AutomationControlled flag
@@ -47,7 +352,7 @@ class CustomChromeInstance:
             prefs = {
                 "credentials_enable_service": False,
                 "profile.password_manager_enabled": False,
-                "download.default_directory": str(BASE_PATH / "data"),
+                "download.default_directory": str(DOWNLOADS.directory),
             }
 
             options.add_experimental_option("prefs", prefs)
@@ -55,10 +360,43 @@ class CustomChromeInstance:
         else:
             self._driver = uc.Chrome(options=options)
 
+        if lightweight:
+            self._block_urls(allowlist)
+        # undetected chrome ignores the download prefs, set the directory for both
+        self._driver.execute_cdp_cmd(
+            "Browser.setDownloadBehavior",
+            {"behavior": "allow", "downloadPath": str(DOWNLOADS.directory)},
+        )
         self._actions = ActionChains(self._driver)
+        BROWSERS.add(self)
+
+    def _block_urls(self, allowlist: Sequence[str]) -> None:
+        blocked = [url for url in BLOCKED_URLS if url not in allowlist]
+        self._driver.execute_cdp_cmd("Network.enable", {})
+        self._driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": blocked})
+
+    def open(self, page: str, step: str = "page_load") -> None:
+        """
+        navigates to `page`, the load time is recorded as the `step` phase so full and
+        lightweight loads of the same flow can be compared
+        """
+        start = time.perf_counter()
+        try:
+            self._driver.get(page)
+        finally:
+            LATENCY.record(self._name, step, time.perf_counter() - start)
 
-    def open(self, page: str) -> None:
-        self._driver.get(page)
+    def expect_download(
+        self,
+        pattern: str = "*",
+        timeout: float = DOWNLOAD_TIMEOUT,
+        step: str = "download",
+    ) -> PendingDownload:
+        """
+        call before clicking a download, the returned PendingDownload's result() is the
+        file once chrome has finished writing it
+        """
+        return PendingDownload(DOWNLOADS, pattern, timeout, self._name, step)
 
     def _findInElem(self, by: str, id: str) -> WebElement:
         return self._driver.find_element(by, id)
@@ -84,6 +422,280 @@ class CustomChromeInstance:
         )
         return res
 
+    def wait_until(
+        self,
+        condition: Callable[[webdriver.Chrome], T],
+        step: str,
+        timeout: float = WAIT_TIMEOUT,
+    ) -> T:
+        """
+        polls `condition` until it returns something truthy (raises TimeoutException
+        after `timeout` seconds), the time spent is recorded as the `wait_<step>` phase
+        """
+        start = time.perf_counter()
+        try:
+            return WebDriverWait(
+                self._driver,
+                timeout,
+                POLL_INTERVAL,
+                (NoSuchElementException, StaleElementReferenceException),
+            ).until(condition)
+        finally:
+            LATENCY.record(self._name, f"wait_{step}", time.perf_counter() - start)
+
+    def wait_clickable(
+        self, by: str, elem: str, timeout: float = WAIT_TIMEOUT, step: str = "clickable"
+    ) -> WebElement:
+        return self.wait_until(EC.element_to_be_clickable((by, elem)), step, timeout)
+
+    def wait_visible(
+        self, by: str, elem: str, timeout: float = WAIT_TIMEOUT, step: str = "visible"
+    ) -> WebElement:
+        return self.wait_until(
+            EC.visibility_of_element_located((by, elem)), step, timeout
+        )
+
+    def wait_text_stable(
+        self,
+        by: str,
+        elem: str,
+        stable_for: float = TEXT_STABLE_FOR,
+        timeout: float = WAIT_TIMEOUT,
+        step: str = "text_stable",
+        changed_from: Optional[str] = None,
+    ) -> str:
+        """
+        `changed_from` is text the element still shows from before (ex: the previous
+        symbol's quote), it never counts as stable
+        """
+        return self.wait_until(
+            _TextStable(by, elem, stable_for, changed_from), step, timeout
+        )
+
+    def wait_url_change(
+        self, url: str, timeout: float = WAIT_TIMEOUT, step: str = "navigation"
+    ) -> bool:
+        """
+        waits for the browser to leave `url` (ex: a submitted login form redirecting),
+        False if it is still there after `timeout`
+        """
+        try:
+            self.wait_until(EC.url_changes(url), step, timeout)
+            return True
+        except TimeoutException:
+            return False
+
+    def wait_network_idle(
+        self,
+        idle_for: float = NETWORK_IDLE_FOR,
+        timeout: float = WAIT_TIMEOUT,
+        step: str = "network_idle",
+    ) -> None:
+        self.wait_until(
+            lambda driver: driver.execute_script(NETWORK_IDLE_JS, idle_for * 1000),
+            step,
+            timeout,
+        )
+
+    def wait_dom_quiet(
+        self,
+        quiet_for: float = DOM_QUIET_FOR,
+        timeout: float = WAIT_TIMEOUT,
+        step: str = "dom_quiet",
+    ) -> None:
+        self.wait_until(
+            lambda driver: driver.execute_script(DOM_QUIET_JS, quiet_for * 1000),
+            step,
+            timeout,
+        )
+
+    def fetch_json(
+        self,
+        urls: Sequence[str],
+        headers: Optional[dict[str, str]] = None,
+        timeout: float = FETCH_TIMEOUT,
+        step: str = "fetch",
+    ) -> list[Any]:
+        """
+        requests `urls` concurrently with the page's fetch (same cookies and origin as
+        the site itself) and returns the JSON bodies in order, raises
+        WebDriverException when a request fails or comes back with an error status
+        """
+        start = time.perf_counter()
+        try:
+            self._driver.set_script_timeout(timeout + 1)
+            res = self._driver.execute_async_script(
+                FETCH_JSON_JS, list(urls), headers or {}, timeout * 1000
+            )
+        finally:
+            LATENCY.record(self._name, step, time.perf_counter() - start)
+        if "error" in res:
+            raise WebDriverException(f"fetch failed: {res['error']}")
+        bodies = []
+        for result in res["results"]:
+            if result["status"] >= 400:
+                raise WebDriverException(f"{result['url']} returned {result['status']}")
+            bodies.append(json.loads(result["body"]))
+        return bodies
+
+    def local_storage(self, key: str) -> Optional[str]:
+        return self._driver.execute_script(
+            "return window.localStorage.getItem(arguments[0]);", key
+        )
+
+    def captured_json(self, url_pattern: str) -> list[Any]:
+        """
+        bodies of the JSON responses received since the last call whose url matches
+        `url_pattern` (needs capture_network), the performance log is drained
+        """
+        pattern = re.compile(url_pattern)
+        payloads = []
+        for entry in self._driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            if message["method"] != "Network.responseReceived":
+                continue
+            response = message["params"]["response"]
+            if "json" not in response.get("mimeType", "") or not pattern.search(
+                response["url"]
+            ):
+                continue
+            try:
+                body = self._driver.execute_cdp_cmd(
+                    "Network.getResponseBody",
+                    {"requestId": message["params"]["requestId"]},
+                )
+            except WebDriverException:
+                # evicted from the buffer or still loading
+                logger.warning(f"{self._name}: no body for {response['url']}")
+                continue
+            text = body["body"]
+            if body.get("base64Encoded"):
+                text = base64.b64decode(text).decode()
+            payloads.append(json.loads(text))
+        return payloads
+
+    @property
+    def _cookie_file(self) -> Path:
+        profile = self._cookies_from or self._profile
+        return PROFILES_DIR / f"{profile}_cookies.json"
+
+    def save_cookies(self) -> None:
+        """
+        chrome drops session cookies (no expiry) on exit even with a persistent profile,
+        so all cookies of the browser are saved next to the profile
+        """
+        if not self._profile:
+            return
+        cookies = self._driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        # written to a private temp file and swapped in, so the cookies are never
+        # readable by other users or half written
+        tmp_path = self._cookie_file.with_suffix(".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as file:
+            json.dump({"saved": datetime.now().isoformat(), "cookies": cookies}, file)
+        # the mode of open only applies when it creates the file
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self._cookie_file)
+
+    def restore_cookies(self) -> bool:
+        """
+        loads the cookies saved within SESSION_LIFETIME back into the browser, returns
+        whether there was anything to restore
+        """
+        if not self._profile or not self._cookie_file.exists():
+            return False
+        with self._cookie_file.open() as file:
+            data = json.load(file)
+        if datetime.now() - datetime.fromisoformat(data["saved"]) > SESSION_LIFETIME:
+            return False
+        cookies = []
+        for cookie in data["cookies"]:
+            param = {key: cookie[key] for key in COOKIE_FIELDS if key in cookie}
+            if not cookie.get("session", True):
+                param["expires"] = cookie["expires"]
+            cookies.append(param)
+        self._driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+        return True
+
+    def session_valid(self, url: str, by: str, elem: str, timeout: float = 10) -> bool:
+        """
+        opens `url` and checks for an element only shown to a logged in user
+        """
+        self.open(url, "session_page")
+        try:
+            self.wait_until(EC.presence_of_element_located((by, elem)), "session", timeout)
+            return True
+        except TimeoutException:
+            return False
+
+    def resume_session(self, url: str, by: str, elem: str, timeout: float = 10) -> bool:
+        """
+        tries the session kept in the profile first and the saved cookies second,
+        returns True when `url` is usable without logging in
+        """
+        # kept even when no session is found, a manual login follows and restart
+        # checks for that same page
+        self._session_check = (url, by, elem, timeout)
+        if not self._profile:
+            return False
+        if self.session_valid(url, by, elem, timeout):
+            logger.info(f"{self._name}: reusing browser session from profile")
+        elif self.restore_cookies() and self.session_valid(url, by, elem, timeout):
+            logger.info(f"{self._name}: restored browser session from saved cookies")
+        else:
+            return False
+        return True
+
+    @property
+    def label(self) -> str:
+        return self._profile or self._name
+
+    @property
+    def url(self) -> str:
+        return self._driver.current_url
+
+    def pids(self) -> list[int]:
+        """
+        chromedriver and, for undetected chrome which starts the browser itself, the
+        browser process, the chrome renderers are children of these
+        """
+        pids = []
+        process = getattr(self._driver.service, "process", None)
+        if process:
+            pids.append(process.pid)
+        if getattr(self._driver, "browser_pid", None):
+            pids.append(self._driver.browser_pid)
+        return pids
+
+    def memory_rss(self) -> int:
+        return process_tree_rss(self.pids())
+
+    def can_restart(self) -> bool:
+        """
+        a restart keeps the login only with a profile and a page to check the
+        session on (see resume_session)
+        """
+        return bool(self._profile) and self._session_check is not None
+
+    def restart(self) -> bool:
+        """
+        replaces the browser with a fresh one on the same profile and resumes its
+        session, returns False when the new browser needs a manual login (callers
+        can't wait for one). Refuses, keeping the running browser, when can_restart
+        is False
+        """
+        if not self.can_restart():
+            logger.error(f"{self._name}: can't restart without losing the session")
+            return False
+        self.save_cookies()
+        try:
+            self._driver.quit()
+        except WebDriverException as e:
+            logger.warning(f"{self._name}: closing browser failed {e}")
+        session_check = cast(tuple[str, str, str, float], self._session_check)
+        self.__init__(**self._options)  # type: ignore[misc]
+        return self.resume_session(*session_check)
+
     def sendKeyboardInput(self, elem: WebElement, input: str) -> None:
         elem.clear()
         elem.send_keys(input)
@@ -100,10 +712,90 @@ class CustomChromeInstance:
     def get_page_source(self) -> str:
         return self._driver.page_source
 
+    def quit(self) -> None:
+        try:
+            self._driver.quit()
+        except WebDriverException as e:
+            logger.warning(f"{self._name}: closing browser failed {e}")
+
     def refresh(self) -> None:
         self._driver.refresh()
 
 
+class BrowserPool:
+    """
+    one logged in browser per order category (STOCKS, FRACTIONALS, OPTIONS) so the
+    categories of one broker can trade at the same time. The first category's browser
+    is the primary, it is used outside of session() and by categories without a
+    browser of their own.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], CustomChromeInstance],
+        categories: Sequence[str],
+    ) -> None:
+        self._factory = factory
+        self.categories = list(categories)
+        self._browsers: dict[str, CustomChromeInstance] = {}
+        self._shared: set[str] = set()
+        # reentrant, a session can be entered again for a category sharing its browser
+        self._locks = {category: threading.RLock() for category in self.categories}
+        self._create_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _resolve(self, category: str) -> str:
+        if category not in self._locks or category in self._shared:
+            return self.categories[0]
+        return category
+
+    def browser(self, category: str) -> CustomChromeInstance:
+        """
+        the browser of `category`, started the first time it is asked for
+        """
+        category = self._resolve(category)
+        with self._create_lock:
+            if category not in self._browsers:
+                self._browsers[category] = self._factory(category)
+            return self._browsers[category]
+
+    @property
+    def primary(self) -> CustomChromeInstance:
+        return self.browser(self.categories[0])
+
+    def share(self, category: str) -> None:
+        """
+        lets `category` use the primary browser, ex: when its own could not log in
+        """
+        if category != self.categories[0]:
+            self._shared.add(category)
+
+    def current(self) -> CustomChromeInstance:
+        """
+        the browser of the session this thread is in, the primary outside of one
+        """
+        return getattr(self._local, "browser", None) or self.primary
+
+    def category(self) -> str:
+        return getattr(self._local, "category", None) or self.categories[0]
+
+    @contextmanager
+    def session(self, category: str) -> Iterator[CustomChromeInstance]:
+        """
+        binds the calling thread to the browser of `category` until the block exits,
+        only one thread drives a browser at a time
+        """
+        category = self._resolve(category)
+        browser = self.browser(category)
+        with self._locks[category]:
+            previous = (self.category(), getattr(self._local, "browser", None))
+            self._local.category, self._local.browser = category, browser
+            try:
+                yield browser
+            finally:
+                self._local.category, self._local.browser = previous
+
+
 if __name__ == "__main__":
     c = CustomChromeInstance(undetected=False)
     print(f"ChromeDriver path: {c._driver.service._path}")
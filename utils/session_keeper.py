@@ -0,0 +1,87 @@
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional, cast
+
+from loguru import logger
+
+from utils.broker import Broker
+
+# seconds that have to be left before the next scheduled job to refresh a session, a
+# refresh is a request or two but must never delay a trigger
+MIN_IDLE_GAP = 30
+
+
+class SessionKeeper:
+    """
+    renews the brokers' API sessions (Broker.refresh_session) every
+    SESSION_REFRESH_INTERVAL seconds, but only in gaps between scheduled jobs, so
+    token renewal stays off the trading path. Sessions that will need a human to
+    log in again are reported their REAUTH_WARNING ahead
+    """
+
+    def __init__(
+        self,
+        brokers: list[Broker],
+        clock: Callable[[], float] = time.monotonic,
+        now: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ) -> None:
+        self._brokers = [
+            broker for broker in brokers if broker.SESSION_REFRESH_INTERVAL is not None
+        ]
+        self._clock = clock
+        self._now = now
+        # brokers log in right before the keeper is created
+        self._refreshed = {broker.name(): clock() for broker in self._brokers}
+        self._warned: dict[str, datetime] = {}
+
+    def _overdue(self) -> Optional[Broker]:
+        overdue, most = None, 0.0
+        for broker in self._brokers:
+            interval = cast(float, broker.SESSION_REFRESH_INTERVAL)
+            late = self._clock() - self._refreshed[broker.name()] - interval
+            if late >= 0 and (overdue is None or late > most):
+                overdue, most = broker, late
+        return overdue
+
+    def maintain(self, idle_seconds: Optional[float]) -> None:
+        """
+        called between jobs with schedule.idle_seconds(), refreshes at most one
+        broker per call so a slow refresh can't run into the next job
+        """
+        if idle_seconds is not None and idle_seconds < MIN_IDLE_GAP:
+            return
+        broker = self._overdue()
+        if broker is not None:
+            self.refresh(broker)
+        self.check_expiry()
+
+    def refresh(self, broker: Broker) -> None:
+        # a failed refresh is retried after another interval, the order path still
+        # logs in again on its own if it has to
+        self._refreshed[broker.name()] = self._clock()
+        try:
+            with broker.session("STOCKS"):
+                broker.refresh_session()
+            logger.info(f"{broker.name()} session refreshed")
+        except Exception as e:
+            logger.error(f"{broker.name()} session refresh failed: {e}")
+
+    def check_expiry(self) -> list[str]:
+        """
+        names of the brokers whose session ends within their REAUTH_WARNING, each expiry
+        is logged once
+        """
+        expiring = []
+        now = self._now()
+        for broker in self._brokers:
+            expires = broker.session_expires()
+            if expires is None or expires - now > broker.REAUTH_WARNING:
+                continue
+            expiring.append(broker.name())
+            if self._warned.get(broker.name()) != expires:
+                self._warned[broker.name()] = expires
+                logger.warning(
+                    f"{broker.name()} session expires at {expires:%x %X %Z}, "
+                    "an interactive login will be needed"
+                )
+        return expiring
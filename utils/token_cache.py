@@ -0,0 +1,58 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from loguru import logger
+
+
+class TokenCache:
+    """
+    oauth tokens kept across restarts, one json file with an entry per account that
+    only its owner can read (0600). A missing or unreadable file is an empty cache
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict[str, Any]:
+        try:
+            with open(self._path) as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable token cache {self._path}: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def load(self, key: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            return self._read().get(key)
+
+    def save(self, key: str, entry: dict[str, Any]) -> None:
+        with self._lock:
+            data = self._read()
+            data[key] = entry
+            self._write(data)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            data = self._read()
+            if data.pop(key, None) is not None:
+                self._write(data)
+
+    def _write(self, data: dict[str, Any]) -> None:
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path.with_suffix(".tmp")
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as file:
+                json.dump(data, file)
+            # the mode of open only applies when it creates the file
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            logger.error(f"Unable to save token cache {self._path}: {e}")
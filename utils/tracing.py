@@ -0,0 +1,167 @@
+import atexit
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from types import FunctionType
+from typing import Any, Callable, Iterator, Optional, TypeVar, no_type_check
+
+import ujson as json  # type: ignore[import-untyped]
+from loguru import logger
+
+TRACES_DIR = "traces"
+MAX_ARG_LENGTH = 120
+# parameters recorded as span args, locators only so text typed into a page (logins,
+# passwords) never ends up in the trace files
+TRACED_ARGS = frozenset({"by", "id", "elem"})
+# methods that type into the page, none of their arguments are recorded
+UNTRACED_ARGS = frozenset({"sendKeyboardInput", "sendKeys"})
+
+T = TypeVar("T")
+
+
+class Tracer:
+    """
+    Records spans as Chrome trace-event "complete" events, one file per day
+    (traces/trace_MM_DD.json) that can be opened in chrome://tracing or Perfetto.
+
+    The file uses the JSON array format without the closing bracket, which trace viewers
+    accept, so spans from several runs on the same day can simply be appended.
+    Events are buffered and flushed whenever an outermost span closes.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._base_path: Optional[Path] = None
+        self._events: list[dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def enable(self, base_path: Path) -> None:
+        self._base_path = base_path
+        self.enabled = True
+        atexit.register(self.flush)
+        logger.info(f"Tracing enabled, writing to {base_path / TRACES_DIR}")
+
+    def disable(self) -> None:
+        self.flush()
+        self.enabled = False
+
+    @contextmanager
+    def span(self, name: str, cat: str = "", **args: Any) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = time.time_ns() // 1000
+        try:
+            yield
+        finally:
+            end = time.time_ns() // 1000
+            self._local.depth = depth
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start,
+                "dur": end - start,
+                "pid": self._pid,
+                "tid": threading.get_native_id(),
+            }
+            if args:
+                event["args"] = {k: str(v)[:MAX_ARG_LENGTH] for k, v in args.items()}
+            with self._lock:
+                self._events.append(event)
+            if depth == 0:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            events, self._events = self._events, []
+        if not events or self._base_path is None:
+            return
+
+        date = datetime.now().strftime("%m_%d")
+        path = self._base_path / TRACES_DIR / f"trace_{date}.json"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            new_file = not path.exists()
+            with open(path, "a") as file:
+                if new_file:
+                    file.write("[\n")
+                for event in events:
+                    file.write(json.dumps(event) + ",\n")
+        except OSError as e:
+            logger.error(f"Unable to write trace file: {e}")
+
+
+TRACER = Tracer()
+
+
+def traced(
+    name: Optional[str] = None, cat: str = "", record_args: bool = True
+) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    wraps a function in a span (the function's qualified name by default), string
+    locator arguments (TRACED_ARGS) are attached so selenium steps show which element
+    they touched
+    """
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        span_name = name or func.__qualname__
+        params = list(inspect.signature(func).parameters)
+        recorded = {
+            i: param
+            for i, param in enumerate(params)
+            if record_args and param in TRACED_ARGS
+        }
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            span_args = {
+                recorded[i]: arg
+                for i, arg in enumerate(args)
+                if i in recorded and isinstance(arg, str)
+            }
+            span_args.update(
+                (param, arg)
+                for param, arg in kwargs.items()
+                if param in recorded.values() and isinstance(arg, str)
+            )
+            with TRACER.span(span_name, cat, **span_args):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@no_type_check
+def trace_methods(cat: str):
+    """
+    class decorator that traces every method defined on the class (used for the
+    selenium steps of the browser based brokers), methods already timed as a broker
+    phase are skipped since Broker._run_phase opens their span
+    """
+
+    def decorator(cls):
+        for attr, method in list(cls.__dict__.items()):
+            if attr.startswith("__") or not isinstance(method, FunctionType):
+                continue
+            if hasattr(method, "_phase"):
+                continue
+            record_args = attr not in UNTRACED_ARGS
+            wrapped = traced(f"{cls.__name__}.{attr}", cat, record_args)(method)
+            setattr(cls, attr, wrapped)
+        return cls
+
+    return decorator
@@ -5,26 +5,6 @@ from utils.broker import OptionOrder, StockOrder
 from utils.report.report import OptionType, OrderType
 
 
-@no_type_check
-def repeat_on_fail(times: int = 5, default_return=False):
-    def _repeat(func):
-        def wrapper(*args, **kwargs):
-            _times = times
-            while _times != 0:
-                try:
-                    res = func(*args, **kwargs)
-                    return res
-                except Exception as e:
-                    if e:
-                        print(e)
-                    _times -= 1
-            return default_return
-
-        return wrapper
-
-    return _repeat
-
-
 @no_type_check
 def repeat(times: int = 5):
     def _repeat(func):